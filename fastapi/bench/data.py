@@ -0,0 +1,227 @@
+"""
+Seeded synthetic leads and interaction histories for load tests
+
+Run from the fastapi directory:
+
+    python -m bench.data seed --scale 1m --seed 42 --drop
+    python -m bench.data ndjson --scale 10k --seed 42 > leads.ndjson
+
+`seed` writes stored lead documents, their interaction buckets and indexes straight into the
+MONGO_URI database, the same shape the API leaves behind. `ndjson` writes create payloads
+for POST /leads/bulk instead. The same seed always produces the same leads in the same order.
+"""
+import argparse
+import asyncio
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+from src.database import DatabaseManager, get_leads_collection
+from src.leads.interactions import bucket_documents, interactions_collection, summary_fields
+from src.leads.rules import current_rules
+from src.leads.scorer import LeadScorer
+from src.leads.search import build_search_keys
+from src.leads.stats import rebuild_stats
+from src.markers import bump_marker
+from src.serialization import dumps
+
+SCALES = {
+    "10k": 10_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Chinedu", "Ngozi",
+    "Oluwaseun", "Amara", "Wei", "Mei", "Hiroshi", "Yuki", "Carlos", "Sofia", "Ahmed", "Fatima",
+    "Ivan", "Olga", "Lukas", "Emma", "Mateo", "Valentina", "Arjun", "Priya", "Kwame", "Ama",
+]
+
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Okafor", "Adeyemi",
+    "Okonkwo", "Mensah", "Chen", "Wang", "Tanaka", "Sato", "Silva", "Rossi", "Haddad", "Khan",
+    "Petrov", "Novak", "Muller", "Schmidt", "Dubois", "Moreau", "Patel", "Sharma", "Boateng", "Owusu",
+]
+
+COMPANY_WORDS = [
+    "Tech", "Data", "Cloud", "Health", "Fin", "Logi", "Agri", "Green", "Blue", "Smart",
+    "Net", "Micro", "Quantum", "Solar", "Urban", "Prime", "Nova", "Apex", "Vertex", "Bright",
+]
+
+COMPANY_SUFFIXES = ["Corp", "Labs", "Systems", "Solutions", "Works", "Group", "Holdings", "Partners", "Ltd", "Inc"]
+
+JOB_TITLES = [
+    "CTO", "CEO", "VP of Sales", "Head of Marketing", "Director of Engineering", "Founder", "Chief Revenue Officer",
+    "Software Engineer", "Account Manager", "Sales Representative", "Product Manager", "Marketing Specialist",
+    "Operations Manager", "Analyst", "Consultant", "Office Manager", None,
+]
+
+# Weighted the way a real pipeline looks: most leads are early stage and arrive through the website
+STATUSES = (["new", "contacted", "qualified", "negotiation", "closed_won", "closed_lost"], [40, 25, 15, 8, 5, 7])
+SOURCES = (["website", "linkedin", "conference", "cold_email", "referral", "Other"], [35, 25, 10, 15, 10, 5])
+
+INTERACTION_TYPES = ["email", "call", "meeting", "demo", "follow-up"]
+INTERACTION_NOTES = [
+    "Sent the intro deck.",
+    "Discussed pricing and rollout timeline.",
+    "Reviewed the proposal and discussed next steps.",
+    "Left a voicemail.",
+    "Demo of the reporting dashboard.",
+    None,
+]
+OWNERS = [f"rep{i}@saltra.io" for i in range(25)]
+
+# Fixed end of the generated history, so runs on different days produce the same data
+HISTORY_END = datetime(2024, 12, 1, tzinfo=timezone.utc)
+HISTORY_DAYS = 730
+
+
+class LeadGenerator:
+    """Deterministic stream of realistic leads, the i-th lead only depends on the seed"""
+    def __init__(self, seed: int = 42, max_interactions: int = 1000):
+        self.seed = seed
+        self.max_interactions = max_interactions
+
+    def interaction_count(self, rng: random.Random) -> int:
+        # heavy tailed: a third of the leads were never contacted, a few hundred per million have long histories
+        roll = rng.random()
+        if roll < 0.3:
+            return 0
+        if roll < 0.999:
+            return min(int(rng.expovariate(1 / 6)) + 1, self.max_interactions)
+        return rng.randint(min(100, self.max_interactions), self.max_interactions)
+
+    def interactions(self, rng: random.Random, count: int) -> List[Dict[str, Any]]:
+        return [
+            {
+                "date": HISTORY_END - timedelta(seconds=rng.randrange(HISTORY_DAYS * 86400)),
+                "type": rng.choice(INTERACTION_TYPES),
+                "notes": rng.choice(INTERACTION_NOTES),
+                "owner": rng.choice(OWNERS),
+            }
+            for _ in range(count)
+        ]
+
+    def payload(self, index: int) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Create payload of the lead at `index` and its full interaction history"""
+        rng = random.Random(self.seed * 1_000_003 + index)
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        company = f"{rng.choice(COMPANY_WORDS)}{rng.choice(COMPANY_WORDS).lower()} {rng.choice(COMPANY_SUFFIXES)}"
+        lead = {
+            "first_name": first_name,
+            "last_name": last_name,
+            "company": company,
+            # log-normal company sizes, from a handful of people to tens of thousands
+            "company_size": max(1, min(int(rng.lognormvariate(4, 1.6)), 100_000)),
+            # index keeps email and phone unique, both carry unique indexes
+            "email": f"{first_name}.{last_name}.{index}@{company.split()[0]}.example.com".lower(),
+            "job_title": rng.choice(JOB_TITLES),
+            "phone": f"+1{self.seed % 100:02d}{index:010d}",
+            "source": rng.choices(*SOURCES)[0],
+            "status": rng.choices(*STATUSES)[0],
+        }
+        return lead, self.interactions(rng, self.interaction_count(rng))
+
+    def payloads(self, count: int, start: int = 0) -> Iterator[Dict[str, Any]]:
+        for index in range(start, start + count):
+            lead, interactions = self.payload(index)
+            if interactions:
+                lead["interactions"] = sorted(interactions, key=lambda interaction: interaction["date"])
+            yield lead
+
+    def documents(self, count: int, start: int = 0) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Stored lead documents, without score, and the interactions that go into their buckets"""
+        for index in range(start, start + count):
+            lead, interactions = self.payload(index)
+            created_at = HISTORY_END - timedelta(days=HISTORY_DAYS) + timedelta(seconds=index % (HISTORY_DAYS * 86400))
+            last_interaction_at = max((interaction["date"] for interaction in interactions), default=None)
+            lead.update(summary_fields(interactions))
+            lead["search_keys"] = build_search_keys(lead)
+            lead["created_at"] = created_at
+            lead["updated_at"] = max(created_at, last_interaction_at) if last_interaction_at else created_at
+            lead["version"] = 1
+            yield lead, interactions
+
+
+async def seed(generator: LeadGenerator, count: int, batch_size: int, drop: bool):
+    await DatabaseManager.connect()
+    try:
+        leads_collection = get_leads_collection()
+        buckets_collection = interactions_collection(leads_collection)
+        if drop:
+            await leads_collection.drop()
+            await buckets_collection.drop()
+            await DatabaseManager.create_leads_indexes()
+            await DatabaseManager.create_lead_interactions_indexes()
+
+        rules = current_rules()
+        now = datetime.now(timezone.utc)
+        written = 0
+        documents = generator.documents(count)
+        while written < count:
+            batch = [document for _, document in zip(range(batch_size), documents)]
+            leads = [lead for lead, _ in batch]
+            scores, categories = LeadScorer.calculate_scores_batch(**LeadScorer.to_columns(leads, rules), now=now, rules=rules)
+            for lead, score, category in zip(leads, scores.tolist(), categories.tolist()):
+                lead.update(score=score, category=category, score_version=rules.version)
+
+            result = await leads_collection.insert_many(leads, ordered=False)
+            buckets = [
+                bucket
+                for lead_id, (_, interactions) in zip(result.inserted_ids, batch)
+                for bucket in bucket_documents(lead_id, interactions)
+            ]
+            if buckets:
+                await buckets_collection.insert_many(buckets, ordered=False)
+
+            written += len(batch)
+            print(f"seeded {written}/{count} leads", file=sys.stderr)
+        await rebuild_stats(leads_collection)
+        await bump_marker(leads_collection)
+    finally:
+        await DatabaseManager.close()
+
+
+def write_ndjson(generator: LeadGenerator, count: int, output):
+    for lead in generator.payloads(count):
+        output.write(dumps(lead) + b"\n")
+
+
+def parse_scale(value: str) -> int:
+    if value.lower() in SCALES:
+        return SCALES[value.lower()]
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"scale must be one of {', '.join(SCALES)} or a lead count")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic lead data for load tests")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, help_text in (
+        ("seed", "Insert stored leads, interaction buckets and indexes into MONGO_URI"),
+        ("ndjson", "Write lead create payloads to stdout, for POST /leads/bulk"),
+    ):
+        command_parser = subparsers.add_parser(command, help=help_text)
+        command_parser.add_argument("--scale", type=parse_scale, default=SCALES["10k"], help="10k, 1m, 10m or a lead count")
+        command_parser.add_argument("--seed", type=int, default=42)
+        command_parser.add_argument("--max-interactions", type=int, default=1000, help="Longest generated interaction history")
+        if command == "seed":
+            command_parser.add_argument("--batch-size", type=int, default=5000)
+            command_parser.add_argument("--drop", action="store_true", help="Delete existing leads and interaction buckets first")
+
+    args = parser.parse_args()
+    generator = LeadGenerator(seed=args.seed, max_interactions=args.max_interactions)
+    if args.command == "seed":
+        asyncio.run(seed(generator, args.scale, args.batch_size, args.drop))
+    else:
+        write_ndjson(generator, args.scale, sys.stdout.buffer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Drive a mixed lead workload against the API and report throughput and latency per operation
+
+Seed a database with `python -m bench.data seed` first, then from the fastapi directory:
+
+    python -m bench.load run --base-url http://localhost:8000 --duration 60 --concurrency 32 --output run.json
+    python -m bench.load run --in-process --duration 30 --output run.json
+    python -m bench.load run --workload read --bulk-concurrency 1 --bulk-rows 5000 --output during-bulk.json
+    python -m bench.load compare before.json after.json
+
+`--in-process` serves the app through httpx's ASGI transport inside the driver, against the
+MONGO_URI database, so no uvicorn is needed; the driver then shares the event loop and CPU
+with the app, so compare in-process runs with each other only. Reports are JSON with sorted
+keys, one entry per operation, so two runs can be diffed or compared.
+
+`--bulk-concurrency` keeps that many POST /leads/bulk uploads running back to back next to the
+workload, reported as the `bulk` operation and left out of the total, which shows what a bulk
+job does to the latency of the small requests served alongside it.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+import numpy as np
+from bench.data import INTERACTION_NOTES, INTERACTION_TYPES, OWNERS, STATUSES, SOURCES, LAST_NAMES, COMPANY_WORDS, LeadGenerator
+from src.serialization import dumps
+
+API_PREFIX = "/api/v1/leads"
+
+# Relative weights of each operation, picked independently for every request
+WORKLOADS = {
+    "mixed": {"list": 30, "list_filtered": 20, "deep_page": 10, "get": 15, "create": 10, "interaction": 10, "update": 5},
+    "read": {"list": 40, "list_filtered": 30, "deep_page": 10, "get": 20},
+    "write": {"create": 40, "interaction": 40, "update": 20},
+}
+
+SORTS = ["_id", "updated_at", "-updated_at", "score", "-score"]
+
+# Create payloads start far past the seeded leads so they insert new leads instead of merging
+CREATE_OFFSET = 100_000_000
+
+# Bulk uploads take their rows from past the created leads, each bulk worker its own range
+BULK_OFFSET = 200_000_000
+
+
+class Recorder:
+    """Latency samples and error counts per operation"""
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.recording = False
+
+    def record(self, operation: str, started: float, status: Optional[int]):
+        if not self.recording:
+            return
+        self.latencies.setdefault(operation, []).append((time.perf_counter() - started) * 1000)
+        statuses = self.statuses.setdefault(operation, {})
+        key = str(status) if status is not None else "error"
+        statuses[key] = statuses.get(key, 0) + 1
+        if status is None or status >= 400:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, args: argparse.Namespace):
+        self.client = client
+        self.recorder = recorder
+        self.rng = random.Random(args.seed)
+        self.generator = LeadGenerator(seed=args.seed)
+        self.weights = WORKLOADS[args.workload]
+        self.page_size = args.page_size
+        self.deep_pages = args.deep_pages
+        # passed to every write, `async` leaves scoring to the rescore queue
+        self.write_params = {"consistency": args.consistency}
+        self.lead_ids: List[str] = []
+        self.next_create = CREATE_OFFSET + args.seed * 1_000_000
+
+    async def request(self, operation: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(operation, started, None)
+            return None
+        self.recorder.record(operation, started, response.status_code)
+        return response
+
+    async def load_lead_ids(self, count: int):
+        """Sample existing lead ids for the detail and write operations"""
+        cursor = None
+        while len(self.lead_ids) < count:
+            params = {"fields": "id", "limit": min(1000, count - len(self.lead_ids)), "count": "none"}
+            if cursor:
+                params["cursor"] = cursor
+            response = await self.client.get(f"{API_PREFIX}/", params=params)
+            response.raise_for_status()
+            page = response.json()
+            self.lead_ids += [lead["id"] for lead in page["leads"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        if not self.lead_ids:
+            raise SystemExit("No leads found, seed the database with `python -m bench.data seed` first")
+
+    async def list(self):
+        await self.request("list", "GET", f"{API_PREFIX}/", params={"limit": self.page_size, "view": "table", "count": "none"})
+
+    async def list_filtered(self):
+        params = {"limit": self.page_size, "view": "table", "sort": self.rng.choice(SORTS)}
+        kind = self.rng.choice(["status", "source", "q", "company"])
+        if kind == "status":
+            params["status"] = self.rng.choice(STATUSES[0])
+        elif kind == "source":
+            params["source"] = self.rng.choice(SOURCES[0])
+        elif kind == "q":
+            params["q"] = self.rng.choice(LAST_NAMES)
+            params.pop("sort")
+        else:
+            params["company"] = self.rng.choice(COMPANY_WORDS)
+        await self.request("list_filtered", "GET", f"{API_PREFIX}/", params=params)
+
+    async def deep_page(self):
+        # walks the keyset cursor, every page is one deep_page request
+        params = {"limit": self.page_size, "view": "table", "count": "none", "sort": self.rng.choice(SORTS)}
+        for _ in range(self.deep_pages):
+            response = await self.request("deep_page", "GET", f"{API_PREFIX}/", params=params)
+            if response is None or response.status_code != 200 or not response.json()["next_cursor"]:
+                return
+            params["cursor"] = response.json()["next_cursor"]
+
+    async def get(self):
+        await self.request("get", "GET", f"{API_PREFIX}/{self.rng.choice(self.lead_ids)}")
+
+    async def create(self):
+        lead = next(self.generator.payloads(1, start=self.next_create))
+        self.next_create += 1
+        response = await self.request("create", "POST", f"{API_PREFIX}/", content=dumps(lead), headers={"Content-Type": "application/json"}, params=self.write_params)
+        if response is not None and response.status_code == 201:
+            self.lead_ids.append(response.json()["id"])
+
+    async def interaction(self):
+        interaction = {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "type": self.rng.choice(INTERACTION_TYPES),
+            "notes": self.rng.choice(INTERACTION_NOTES),
+            "owner": self.rng.choice(OWNERS),
+        }
+        await self.request("interaction", "POST", f"{API_PREFIX}/{self.rng.choice(self.lead_ids)}/interactions", json=interaction, params=self.write_params)
+
+    async def update(self):
+        await self.request("update", "PUT", f"{API_PREFIX}/{self.rng.choice(self.lead_ids)}", json={"status": self.rng.choice(STATUSES[0])}, params=self.write_params)
+
+    async def worker(self, deadline: float):
+        operations = list(self.weights)
+        weights = list(self.weights.values())
+        while time.perf_counter() < deadline:
+            operation = self.rng.choices(operations, weights)[0]
+            await getattr(self, operation)()
+
+    async def bulk_worker(self, deadline: float, index: int, rows: int):
+        """Upload the same NDJSON body until the deadline, inserting its leads once and updating them after"""
+        body = b"".join(dumps(lead) + b"\n" for lead in self.generator.payloads(rows, start=BULK_OFFSET + index * rows))
+        while time.perf_counter() < deadline:
+            await self.request("bulk", "POST", f"{API_PREFIX}/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}, params=self.write_params)
+
+
+def summarize(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    samples = np.asarray(latencies)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) if len(samples) else (0.0, 0.0, 0.0)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / duration, 2),
+        "latency_ms": {
+            "mean": round(float(samples.mean()), 3) if len(samples) else 0.0,
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(samples.max()), 3) if len(samples) else 0.0,
+        },
+    }
+
+
+def build_report(recorder: Recorder, duration: float, args: argparse.Namespace) -> Dict[str, Any]:
+    operations = {
+        operation: {
+            **summarize(latencies, recorder.errors.get(operation, 0), duration),
+            "statuses": recorder.statuses[operation],
+        }
+        for operation, latencies in sorted(recorder.latencies.items())
+    }
+    # the total stands for the interactive requests, whatever the background uploads take
+    all_latencies = [
+        latency for operation, latencies in recorder.latencies.items() if operation != "bulk" for latency in latencies
+    ]
+    errors = sum(count for operation, count in recorder.errors.items() if operation != "bulk")
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "target": "in-process" if args.in_process else args.base_url,
+            "workload": args.workload,
+            "weights": WORKLOADS[args.workload],
+            "concurrency": args.concurrency,
+            "bulk_concurrency": args.bulk_concurrency,
+            "bulk_rows": args.bulk_rows,
+            "consistency": args.consistency,
+            "duration_s": round(duration, 3),
+            "warmup_s": args.warmup,
+            "page_size": args.page_size,
+            "seed": args.seed,
+            "python": platform.python_version(),
+        },
+        "total": summarize(all_latencies, errors, duration),
+        "operations": operations,
+    }
+
+
+@asynccontextmanager
+async def open_client(args: argparse.Namespace) -> AsyncIterator[httpx.AsyncClient]:
+    connections = args.concurrency + args.bulk_concurrency
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    if not args.in_process:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout, follow_redirects=True) as client:
+            yield client
+        return
+
+    from src.main import app
+    # runs the app's own lifespan, connecting to MONGO_URI and creating the indexes
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout, follow_redirects=True) as client:
+            yield client
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    recorder = Recorder()
+    async with open_client(args) as client:
+        workload = Workload(client, recorder, args)
+        await workload.load_lead_ids(args.lead_sample)
+
+        started = time.perf_counter()
+        deadline = started + args.warmup + args.duration
+        workers = [asyncio.create_task(workload.worker(deadline)) for _ in range(args.concurrency)]
+        workers += [asyncio.create_task(workload.bulk_worker(deadline, index, args.bulk_rows)) for index in range(args.bulk_concurrency)]
+        # samples taken while connection pools and caches warm up are dropped
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        measured_from = time.perf_counter()
+        await asyncio.gather(*workers)
+        duration = time.perf_counter() - measured_from
+
+    return build_report(recorder, duration, args)
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{'operation':<14} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=sys.stderr)
+    for operation, stats in [*report["operations"].items(), ("total", report["total"])]:
+        latency = stats["latency_ms"]
+        print(
+            f"{operation:<14} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>9.1f} "
+            f"{latency['p50']:>9.2f} {latency['p95']:>9.2f} {latency['p99']:>9.2f}",
+            file=sys.stderr,
+        )
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]):
+    """Print the change of throughput and latency percentiles per operation between two reports"""
+    def change(old: float, new: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"{'operation':<14} {'req/s':>10} {'p50':>10} {'p95':>10} {'p99':>10}")
+    operations = sorted(set(before["operations"]) | set(after["operations"]))
+    for operation in [*operations, "total"]:
+        old = before["total"] if operation == "total" else before["operations"].get(operation)
+        new = after["total"] if operation == "total" else after["operations"].get(operation)
+        if not old or not new:
+            print(f"{operation:<14} {'only in ' + ('after' if new else 'before'):>10}")
+            continue
+        print(
+            f"{operation:<14} {change(old['throughput_rps'], new['throughput_rps']):>10} "
+            + " ".join(f"{change(old['latency_ms'][p], new['latency_ms'][p]):>10}" for p in ("p50", "p95", "p99"))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the leads API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a workload and write a JSON report")
+    target = run_parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", default="http://localhost:8000", help="Running API server to drive")
+    target.add_argument("--in-process", action="store_true", help="Serve the app inside the driver through the ASGI transport")
+    run_parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    run_parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5.0, help="Seconds run before measuring")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--bulk-concurrency", type=int, default=0, help="Bulk uploads kept running alongside the workload")
+    run_parser.add_argument("--bulk-rows", type=int, default=5000, help="Rows in each bulk upload")
+    run_parser.add_argument("--consistency", choices=["sync", "async"], default="sync", help="Whether writes score inline or through the rescore queue")
+    run_parser.add_argument("--page-size", type=int, default=50)
+    run_parser.add_argument("--deep-pages", type=int, default=20, help="Pages walked by each deep_page operation")
+    run_parser.add_argument("--lead-sample", type=int, default=5000, help="Existing lead ids sampled for detail and write operations")
+    run_parser.add_argument("--timeout", type=float, default=30.0)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two JSON reports")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        with open(args.before) as before, open(args.after) as after:
+            compare(json.load(before), json.load(after))
+        return
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    encoded = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(encoded + "\n")
+    else:
+        print(encoded)
+
+
+if __name__ == "__main__":
+    main()
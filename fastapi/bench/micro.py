@@ -0,0 +1,154 @@
+"""
+Micro-benchmarks of the per-request CPU hot paths, with stored baselines
+
+Run from the fastapi directory:
+
+    python -m bench.micro run
+    python -m bench.micro save
+    python -m bench.micro compare --tolerance 0.15
+
+`save` writes bench/baselines/micro.json and `compare` exits with status 1 when any case got
+slower than its baseline by more than the tolerance. Timings are the best of several repeats,
+which is the most stable figure on a shared machine, but baselines are still only comparable
+on the hardware and Python version they were saved with, both recorded next to them.
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+from bench.serialization import make_documents
+from src.leads.models import LeadModel, LeadListSchema
+from src.leads.schemas import LeadCreateSchema
+from src.leads.scorer import LeadScorer
+from src.leads.rules import current_rules
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "micro.json"
+
+INTERACTION_SIZES = [0, 10, 1000]
+PAGE_SIZES = [10, 100]
+
+# Evaluated with a fixed instant so recency points do not drift between runs
+NOW = datetime(2024, 12, 1, tzinfo=timezone.utc)
+
+
+def _payload(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Create payload of a stored document, as a request body would carry it"""
+    payload = {key: value for key, value in document.items() if key not in ("_id", "score", "category", "created_at", "updated_at")}
+    payload["interactions"] = [{**interaction, "date": interaction["date"].isoformat()} for interaction in document["interactions"]]
+    return payload
+
+
+def build_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """Every benchmark case as (name, zero-argument callable), the name carrying its parameters"""
+    rules = current_rules()
+    cases = []
+    for interaction_count in INTERACTION_SIZES:
+        (document,) = make_documents(1, interaction_count)
+        payload = _payload(document)
+        cases += [
+            (f"scorer.calculate_score[interactions={interaction_count}]",
+             lambda document=document: LeadScorer.calculate_score(document, now=NOW, rules=rules)),
+            (f"LeadCreateSchema.validate[interactions={interaction_count}]",
+             lambda payload=payload: LeadCreateSchema.model_validate(payload)),
+            (f"LeadModel.validate[interactions={interaction_count}]",
+             lambda document=document: LeadModel(**document)),
+        ]
+        for page_size in PAGE_SIZES:
+            documents = make_documents(page_size, interaction_count)
+            cases += [
+                (f"LeadListSchema.from_mongo_cursor[page={page_size},interactions={interaction_count}]",
+                 lambda documents=documents: LeadListSchema.from_mongo_cursor(documents)),
+                (f"LeadListSchema.json_from_mongo_cursor[page={page_size},interactions={interaction_count}]",
+                 lambda documents=documents: LeadListSchema.json_from_mongo_cursor(documents)),
+            ]
+
+    for page_size in PAGE_SIZES:
+        documents = make_documents(page_size, 10)
+        cases.append((
+            f"scorer.calculate_scores_batch[page={page_size},interactions=10]",
+            lambda documents=documents: LeadScorer.calculate_scores_batch(**LeadScorer.to_columns(documents, rules), now=NOW, rules=rules),
+        ))
+    return cases
+
+
+def measure(function: Callable[[], Any], repeat: int, min_time: float) -> float:
+    """Best time of one call in microseconds, each repeat looping long enough to be measurable"""
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def run_cases(pattern: str, repeat: int, min_time: float) -> Dict[str, float]:
+    results = {}
+    for name, function in build_cases():
+        if pattern and pattern not in name:
+            continue
+        results[name] = round(measure(function, repeat, min_time), 3)
+        print(f"{name:<80} {results[name]:>12.1f} us", file=sys.stderr)
+    return results
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, float], tolerance: float) -> List[str]:
+    """Names of the cases slower than their baseline by more than `tolerance`, printing every change"""
+    if baseline.get("environment") != environment():
+        print(f"warning: baseline was saved on {baseline.get('environment')}, this is {environment()}", file=sys.stderr)
+
+    regressions = []
+    print(f"{'case':<80} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, current in results.items():
+        expected = baseline["results"].get(name)
+        if expected is None:
+            print(f"{name:<80} {'new':>12} {current:>12.1f}")
+            continue
+        change = (current - expected) / expected
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<80} {expected:>12.1f} {current:>12.1f} {change:>+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the scorer and model hot paths")
+    parser.add_argument("command", choices=["run", "save", "compare"])
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Seconds each repeat runs for at least")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown, as a fraction of the baseline")
+    args = parser.parse_args()
+
+    results = run_cases(args.filter, args.repeat, args.min_time)
+
+    if args.command == "save":
+        baseline = {"environment": environment(), "results": results}
+        if args.filter and args.baseline.exists():
+            # refreshing some cases keeps the baselines of the others
+            stored = json.loads(args.baseline.read_text())
+            baseline["results"] = {**stored["results"], **results}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+    elif args.command == "compare":
+        regressions = compare(json.loads(args.baseline.read_text()), results, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed more than {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
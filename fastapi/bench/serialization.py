@@ -0,0 +1,70 @@
+"""
+Compare the validating and the trusted read paths for a page of leads
+
+Run from the fastapi directory with `python -m bench.serialization`.
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from src.leads.models import LeadListSchema
+
+
+def make_documents(page_size: int, interaction_count: int):
+    now = datetime(2024, 11, 30, 13, 14, 38)
+    return [
+        {
+            "_id": ObjectId(),
+            "first_name": "Jane",
+            "last_name": "Doe",
+            "company": "TechCorp",
+            "company_size": 250,
+            "email": f"jane.doe{i}@techcorp.com",
+            "job_title": "CTO",
+            "phone": f"20346754{i:04d}",
+            "source": "website",
+            "status": "qualified",
+            "interactions": [
+                {
+                    "date": now - timedelta(days=day),
+                    "type": "call",
+                    "notes": "Reviewed the proposal and discussed next steps.",
+                    "owner": "john.doe@company.com",
+                }
+                for day in range(interaction_count)
+            ],
+            "score": 72.0,
+            "category": "Hot",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(page_size)
+    ]
+
+
+def validated(documents):
+    return LeadListSchema.from_mongo_cursor(documents).model_dump_json()
+
+
+def trusted(documents):
+    return LeadListSchema.json_from_mongo_cursor(documents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--interactions", type=int, nargs="+", default=[0, 10, 100])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'interactions':>12} {'validated us/row':>17} {'trusted us/row':>15} {'speedup':>8}")
+    for interaction_count in args.interactions:
+        documents = make_documents(args.page_size, interaction_count)
+        rows = args.page_size * args.repeat
+        validated_us = timeit.timeit(lambda: validated(documents), number=args.repeat) / rows * 1e6
+        trusted_us = timeit.timeit(lambda: trusted(documents), number=args.repeat) / rows * 1e6
+        print(f"{interaction_count:>12} {validated_us:>17.1f} {trusted_us:>15.1f} {validated_us / trusted_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
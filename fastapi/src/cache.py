@@ -0,0 +1,282 @@
+import asyncio
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+import bson
+from pymongo.errors import PyMongoError
+from src.config import settings
+from src.logger_config import get_logger
+from src.monitoring.metrics import cache_requests_total, registry
+
+logger = get_logger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Small in-process cache whose entries expire after `ttl` seconds
+
+    Holds at most `max_entries` items, evicting the oldest insert first.
+    Not shared between uvicorn workers, so callers must tolerate staleness up to `ttl`.
+    """
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._entries.pop(key, None)
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheBackend(ABC):
+    """
+    Storage behind a ReadThroughCache
+
+    Async so that shared backends such as Redis can be plugged in; values are the cached
+    documents and must not be mutated by callers. `get` returns _MISSING for keys it does not hold.
+    """
+    @abstractmethod
+    async def get(self, key: Hashable) -> Any:
+        pass
+
+    @abstractmethod
+    async def set(self, key: Hashable, value: Any):
+        pass
+
+    @abstractmethod
+    async def delete(self, key: Hashable):
+        pass
+
+    @abstractmethod
+    async def clear(self):
+        pass
+
+    def stats(self) -> Dict[str, float]:
+        return {}
+
+
+class NullCacheBackend(CacheBackend):
+    """Backend that stores nothing, turning the cache off"""
+    async def get(self, key: Hashable) -> Any:
+        return _MISSING
+
+    async def set(self, key: Hashable, value: Any):
+        pass
+
+    async def delete(self, key: Hashable):
+        pass
+
+    async def clear(self):
+        pass
+
+
+def document_size(value: Any) -> int:
+    """Approximate memory held by a cached document, its encoded BSON size"""
+    if isinstance(value, Mapping):
+        return len(bson.encode(value))
+    return sys.getsizeof(value)
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU backend with a TTL and limits on both entry count and approximate bytes
+
+    Least recently used entries are evicted first once either limit is exceeded.
+    """
+    def __init__(self, ttl: float, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, size_of: Callable[[Any], int] = document_size):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    async def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: Hashable, value: Any):
+        size = self.size_of(value)
+        self._remove(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def delete(self, key: Hashable):
+        self._remove(key)
+
+    async def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def stats(self) -> Dict[str, float]:
+        return {"entries": len(self._entries), "bytes": self.bytes, "evictions": self.evictions}
+
+
+def cache_backend(name: str) -> CacheBackend:
+    """Build the backend selected by DETAIL_CACHE_BACKEND"""
+    if name == "memory":
+        return MemoryCacheBackend(
+            ttl=settings.DETAIL_CACHE_TTL,
+            max_entries=settings.DETAIL_CACHE_MAX_ENTRIES,
+            max_bytes=settings.DETAIL_CACHE_MAX_BYTES,
+        )
+    if name == "none":
+        return NullCacheBackend()
+    raise ValueError(f"Unknown cache backend {name}")
+
+
+class ReadThroughCache:
+    """
+    Cache loading missing keys from the database on first read
+
+    A load that overlaps an invalidation is returned but not stored, so a write racing a
+    read can never leave the pre-write document cached.
+    """
+    def __init__(self, name: str, backend: CacheBackend):
+        self.name = name
+        self.backend = backend
+        self._invalidations = 0
+        caches[name] = self
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self.backend.get(key)
+        if value is not _MISSING:
+            cache_requests_total.inc(self.name, "hit")
+            return value
+
+        cache_requests_total.inc(self.name, "miss")
+        invalidations = self._invalidations
+        value = await loader()
+        if value is not None and invalidations == self._invalidations:
+            await self.backend.set(key, value)
+        return value
+
+    async def peek(self, key: Hashable) -> Any:
+        """Cached value of `key`, or None without loading it"""
+        value = await self.backend.get(key)
+        if value is _MISSING:
+            cache_requests_total.inc(self.name, "miss")
+            return None
+        cache_requests_total.inc(self.name, "hit")
+        return value
+
+    async def invalidate(self, *keys: Hashable):
+        self._invalidations += 1
+        for key in keys:
+            await self.backend.delete(key)
+
+    async def clear(self):
+        self._invalidations += 1
+        await self.backend.clear()
+
+
+# Every ReadThroughCache by name, exported as gauges at scrape time
+caches: Dict[str, ReadThroughCache] = {}
+
+
+def _cache_samples() -> List[str]:
+    lines = [
+        "# HELP cache_entries Entries held per cache",
+        "# TYPE cache_entries gauge",
+        "# HELP cache_bytes Approximate bytes held per cache",
+        "# TYPE cache_bytes gauge",
+        "# HELP cache_evictions_total Entries evicted by the size limits per cache",
+        "# TYPE cache_evictions_total counter",
+    ]
+    for name, cache in sorted(caches.items()):
+        stats = cache.backend.stats()
+        if "entries" in stats:
+            lines.append(f'cache_entries{{cache="{name}"}} {stats["entries"]}')
+            lines.append(f'cache_bytes{{cache="{name}"}} {stats["bytes"]}')
+            lines.append(f'cache_evictions_total{{cache="{name}"}} {stats["evictions"]}')
+    return lines
+
+
+registry.add_collector(_cache_samples)
+
+
+class ChangeStreamInvalidator:
+    """
+    Watch a collection's change stream and invalidate every updated, replaced or deleted document
+
+    Keeps per-worker caches consistent with writes made by other uvicorn workers and processes.
+    Change streams need a replica set; the watch is retried with backoff and resumes after the
+    last seen event.
+    """
+    def __init__(self, collection, on_change: Callable[[Any], Awaitable[None]], retry_seconds: float = 5.0):
+        self.collection = collection
+        self.on_change = on_change
+        self.retry_seconds = retry_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_forever(self):
+        resume_token = None
+        pipeline = [{"$match": {"operationType": {"$in": ["update", "replace", "delete"]}}}]
+        while True:
+            try:
+                async with self.collection.watch(pipeline, resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        await self.on_change(change["documentKey"]["_id"])
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.error(f"Change stream on {self.collection.name} failed, retrying: {e}")
+                # the token may have aged out of the oplog, in which case start over from now
+                resume_token = None
+                await asyncio.sleep(self.retry_seconds)
@@ -1,8 +1,52 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional
 
 class Settings(BaseSettings):
     MONGO_URI: str
     PROJECT_NAME: str = "Users Management Project"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGO_CONNECT_TIMEOUT_MS: int = 20000
+    MONGO_COMPRESSORS: Optional[str] = None
+    INTERNAL_API_TOKEN: Optional[str] = None
+    SLOW_QUERY_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 100
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1
+    SLOW_QUERY_MAX_EXAMINED_RATIO: float = 100
+    SLOW_QUERY_LOG_SIZE: int = 200
+    MAX_PAGINATION_SKIP: int = 10000
+    MAX_PAGE_SIZE: int = 1000
+    LEAD_COUNT_CACHE_TTL: float = 30.0
+    LEAD_COUNT_CACHE_MAX_ENTRIES: int = 1024
+    DETAIL_CACHE_BACKEND: str = "memory"
+    DETAIL_CACHE_TTL: float = 60.0
+    DETAIL_CACHE_MAX_ENTRIES: int = 10000
+    DETAIL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_CHANGE_STREAM_ENABLED: bool = False
+    BULK_INGEST_CHUNK_SIZE: int = 1000
+    BULK_INGEST_MAX_ERRORS: int = 1000
+    BULK_INGEST_MAX_RECORD_LENGTH: int = 1_000_000
+    BULK_INGEST_MAX_RECORD_LINES: int = 100
+    EXPORT_BATCH_SIZE: int = 1000
+    INTERACTION_BUCKET_SIZE: int = 100
+    RECENT_INTERACTIONS: int = 10
+    RECENCY_RESCORE_ENABLED: bool = True
+    RECENCY_RESCORE_INTERVAL_SECONDS: float = 3600
+    RECENCY_RESCORE_BATCH_SIZE: int = 500
+    SCORING_RULES_PATH: Optional[str] = None
+    SCORING_RULES_CHECK_SECONDS: float = 5.0
+    PROCESS_POOL_SIZE: int = 2
+    OFFLOAD_MIN_ITEMS: int = 200
+    OFFLOAD_CHUNK_SIZE: int = 250
+    RESCORE_QUEUE_ENABLED: bool = True
+    RESCORE_QUEUE_BACKEND: str = "memory"
+    RESCORE_QUEUE_DEBOUNCE_SECONDS: float = 2.0
+    RESCORE_QUEUE_BATCH_SIZE: int = 500
+    RESCORE_QUEUE_POLL_SECONDS: float = 5.0
+    RESCORE_QUEUE_LEASE_SECONDS: float = 60.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -1,14 +1,42 @@
+import functools
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from src.config import settings
 from src.logger_config import get_logger
-from pymongo import IndexModel, ASCENDING
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from pymongo.errors import PyMongoError
+from src.leads.scheduler import RecencyRescoreScheduler
+from src.leads.service import LeadService
+from src.leads.rescoring import QUEUE_COLLECTION, rescore_queue, rescore_backend
+from src.users.service import user_cache
+from src.cache import ChangeStreamInvalidator
+from src.monitoring.pool import pool_metrics
+from src.monitoring.commands import command_metrics
+from src.monitoring.slow_queries import slow_query_recorder
+from src.offload import process_pool
 from src.exceptions import DatabaseConnectionException, DatabaseCloseError, IndexCreationError
 
 logger = get_logger(__name__)
 
+def client_options():
+    """Pool, timeout and compression options for the Mongo client, one pool per uvicorn worker"""
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "event_listeners": [pool_metrics, command_metrics, slow_query_recorder],
+    }
+    if settings.MONGO_MAX_IDLE_TIME_MS is not None:
+        options["maxIdleTimeMS"] = settings.MONGO_MAX_IDLE_TIME_MS
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGO_COMPRESSORS:
+        # zstd and snappy need the zstandard and python-snappy packages, zlib is always available
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
+
 class DatabaseManager:
     client: AsyncIOMotorClient = None
     db: AsyncIOMotorDatabase = None
@@ -16,12 +44,15 @@ class DatabaseManager:
     @classmethod
     async def connect(cls):
         try:
-            cls.client = AsyncIOMotorClient(settings.MONGO_URI)
+            cls.client = AsyncIOMotorClient(settings.MONGO_URI, **client_options())
             cls.db = cls.client.get_default_database()
             logger.info("Successfully connected to database")
 
             await cls.create_users_indexes()
             await cls.create_leads_indexes()
+            await cls.create_lead_interactions_indexes()
+            if settings.RESCORE_QUEUE_BACKEND == "mongodb":
+                await cls.create_rescore_queue_indexes()
 
         except Exception as e:
             logger.error(f"Database connection error: {e}")
@@ -47,15 +78,69 @@ class DatabaseManager:
             """Create indexes in the leads collection"""
             email_index = IndexModel("email", unique=True, name="unique_email_index_leads", background=True)
             phone_index = IndexModel("phone", unique=True, name="unique_phone_index_leads", background=True)
+            # keyset pagination indexes, one per sort order offered by the leads listing
+            updated_at_index = IndexModel([("updated_at", ASCENDING), ("_id", ASCENDING)], name="updated_at_id_index_leads", background=True)
+            score_index = IndexModel([("score", ASCENDING), ("_id", ASCENDING)], name="score_id_index_leads", background=True)
+            created_at_index = IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_at_id_index_leads", background=True)
+            # top leads per category, source, status, or status and source, without an in-memory sort;
+            # their prefixes also narrow the leading $match of faceted listings filtered the same way
+            category_top_index = IndexModel([("category", ASCENDING), ("score", DESCENDING), ("_id", DESCENDING)], name="category_score_id_index_leads", background=True)
+            source_top_index = IndexModel([("source", ASCENDING), ("score", DESCENDING), ("_id", DESCENDING)], name="source_score_id_index_leads", background=True)
+            status_top_index = IndexModel([("status", ASCENDING), ("score", DESCENDING), ("_id", DESCENDING)], name="status_score_id_index_leads", background=True)
+            status_source_top_index = IndexModel([("status", ASCENDING), ("source", ASCENDING), ("score", DESCENDING), ("_id", DESCENDING)], name="status_source_score_id_index_leads", background=True)
+            # finds the leads whose recency points decay between two scheduler runs
+            last_interaction_index = IndexModel([("last_interaction_at", ASCENDING), ("_id", ASCENDING)], name="last_interaction_at_id_index_leads", background=True)
+            # multikey index over the tagged word prefixes used by search and autocomplete
+            search_index = IndexModel("search_keys", name="search_keys_index_leads", background=True)
+            # finds the leads scored by an older rule set
+            score_version_index = IndexModel("score_version", name="score_version_index_leads", background=True)
             leads_collection = cls.db.get_collection("leads")
-            await leads_collection.create_indexes([email_index, phone_index])
+            await leads_collection.create_indexes([email_index, phone_index, updated_at_index, score_index, last_interaction_index, search_index, score_version_index, created_at_index, category_top_index, source_top_index, status_top_index, status_source_top_index])
             logger.info("Unique indexes created for 'email' and 'phone' fields in 'leads' collection")
+            logger.info("Pagination indexes created for 'updated_at', 'created_at' and 'score' fields in 'leads' collection")
+            logger.info("Recency index created for 'last_interaction_at' field in 'leads' collection")
+            logger.info("Search index created for 'search_keys' field in 'leads' collection")
+            logger.info("Rule set index created for 'score_version' field in 'leads' collection")
+            logger.info("Top leads indexes created for 'category', 'source' and 'status' by 'score' in 'leads' collection")
+
+            # facet indexes whose prefixes the top leads indexes already cover, dropped where an earlier version created them
+            existing = await leads_collection.index_information()
+            for name in ("status_source_category_index_leads", "source_category_index_leads"):
+                if name in existing:
+                    await leads_collection.drop_index(name)
+                    logger.info(f"Dropped redundant index '{name}' from 'leads' collection")
     
         except PyMongoError as index_error:
             logger.error(f"Error creating indexes: {index_error}")
             raise IndexCreationError(f"Error creating unique email and phone index in leads collection: {index_error}")
     
 
+    @classmethod
+    async def create_lead_interactions_indexes(cls):
+        try:
+            """Create indexes in the lead interactions collection"""
+            bucket_index = IndexModel([("lead_id", ASCENDING), ("month", DESCENDING), ("count", ASCENDING)], name="lead_month_count_index_lead_interactions", background=True)
+            interactions_collection = cls.db.get_collection("lead_interactions")
+            await interactions_collection.create_indexes([bucket_index])
+            logger.info("Bucket index created for 'lead_id' and 'month' fields in 'lead_interactions' collection")
+
+        except PyMongoError as index_error:
+            logger.error(f"Error creating indexes: {index_error}")
+            raise IndexCreationError(f"Error creating bucket index in lead interactions collection: {index_error}")
+
+    @classmethod
+    async def create_rescore_queue_indexes(cls):
+        try:
+            """Create indexes in the rescore queue collection"""
+            due_index = IndexModel([("due_at", ASCENDING)], name="due_at_index_rescore_queue", background=True)
+            queue_collection = cls.db.get_collection(QUEUE_COLLECTION)
+            await queue_collection.create_indexes([due_index])
+            logger.info(f"Due index created for 'due_at' field in '{QUEUE_COLLECTION}' collection")
+
+        except PyMongoError as index_error:
+            logger.error(f"Error creating indexes: {index_error}")
+            raise IndexCreationError(f"Error creating due index in rescore queue collection: {index_error}")
+
     @classmethod
     async def close(cls):
         try:
@@ -74,11 +159,43 @@ def get_users_collection():
 
 def get_leads_collection():
     return DatabaseManager.db.get_collection("leads")
-
 @asynccontextmanager
 async def db_lifespan(app: FastAPI):
     await DatabaseManager.connect()
+    process_pool.start(settings.PROCESS_POOL_SIZE, settings.OFFLOAD_MIN_ITEMS, settings.OFFLOAD_CHUNK_SIZE)
+    if settings.RESCORE_QUEUE_ENABLED:
+        leads_collection = get_leads_collection()
+        rescore_queue.start(
+            rescore_backend(settings.RESCORE_QUEUE_BACKEND, leads_collection),
+            functools.partial(LeadService.rescore_queued, leads_collection),
+        )
+    scheduler = None
+    if settings.RECENCY_RESCORE_ENABLED:
+        scheduler = RecencyRescoreScheduler(
+            get_leads_collection(),
+            interval=settings.RECENCY_RESCORE_INTERVAL_SECONDS,
+            batch_size=settings.RECENCY_RESCORE_BATCH_SIZE,
+        )
+        scheduler.start()
+    if settings.SLOW_QUERY_ENABLED:
+        slow_query_recorder.start(DatabaseManager.client)
+    invalidators = []
+    if settings.CACHE_CHANGE_STREAM_ENABLED:
+        # writes made by other workers and jobs reach this worker's caches through change streams
+        invalidators = [
+            ChangeStreamInvalidator(get_leads_collection(), lambda lead_id: LeadService.invalidate_cached([lead_id])),
+            ChangeStreamInvalidator(get_users_collection(), user_cache.invalidate),
+        ]
+        for invalidator in invalidators:
+            invalidator.start()
     try:
         yield
     finally:
+        for invalidator in invalidators:
+            await invalidator.stop()
+        await slow_query_recorder.stop()
+        if scheduler:
+            await scheduler.stop()
+        await rescore_queue.stop()
+        await process_pool.stop()
         await DatabaseManager.close()
\ No newline at end of file
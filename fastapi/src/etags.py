@@ -0,0 +1,51 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+from fastapi import Response
+
+# Responses carrying an ETag must be revalidated before a cached copy is reused
+REVALIDATE = "private, no-cache"
+
+
+def weak_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+# Document fields a document ETag is built from besides _id, read by projected detail reads too
+ETAG_FIELDS = ("version", "updated_at", "score", "score_version")
+
+
+def document_etag(document: Dict[str, Any]) -> str:
+    """
+    Weak ETag of a stored document, from its id, version, last update time and score
+
+    Rescoring changes score and score_version without a new version or update time, so both are
+    part of the tag for a rescored lead to stop matching the copies clients cached before.
+    """
+    updated_at = document.get("updated_at")
+    return weak_etag(
+        document["_id"],
+        document.get("version", 0),
+        updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at,
+        document.get("score"),
+        document.get("score_version"),
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag`"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE})
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": REVALIDATE}
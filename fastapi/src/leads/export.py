@@ -0,0 +1,92 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Dict, Any, List
+from motor.motor_asyncio import AsyncIOMotorCursor
+from src.leads.models import LeadModel
+from src.serialization import dumps, shape_document
+
+# Columns available to exports, in output order; `interactions` only holds the most recent ones,
+# `interaction_count` and `last_interaction_at` summarize the whole history
+EXPORT_FIELDS = [
+    "id",
+    "first_name",
+    "last_name",
+    "company",
+    "company_size",
+    "email",
+    "job_title",
+    "phone",
+    "source",
+    "status",
+    "interactions",
+    "interaction_count",
+    "last_interaction_at",
+    "score",
+    "category",
+    "score_version",
+    "version",
+    "created_at",
+    "updated_at",
+]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def parse_export_fields(fields: str) -> List[str]:
+    """Parse a comma separated column list, raising ValueError on unknown columns"""
+    if not fields:
+        return list(EXPORT_FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown export fields: {', '.join(unknown)}")
+    return selected
+
+
+def export_projection(fields: List[str]) -> Dict[str, int]:
+    projection = {("_id" if field == "id" else field): 1 for field in fields}
+    if "id" not in fields:
+        projection["_id"] = 0
+    return projection
+
+
+async def iter_ndjson(cursor: AsyncIOMotorCursor, fields: List[str], flush_rows: int) -> AsyncIterator[bytes]:
+    lines = []
+    async for document in cursor:
+        lines.append(dumps(shape_document(document, LeadModel, fields)))
+        if len(lines) >= flush_rows:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+async def iter_csv(cursor: AsyncIOMotorCursor, fields: List[str], flush_rows: int) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    async for document in cursor:
+        row = shape_document(document, LeadModel, fields)
+        if row.get("interactions") is not None:
+            row["interactions"] = dumps(row["interactions"]).decode()
+        writer.writerow([_csv_value(row[field]) for field in fields])
+        rows += 1
+        if rows >= flush_rows:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue().encode()
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
@@ -0,0 +1,83 @@
+from typing import Dict, Iterable, List, Optional
+from src.leads.models import LeadModel
+from src.leads.schemas import LeadView
+
+# Every field a lead response can carry, in response order
+LEAD_FIELDS = list(LeadModel.model_fields)
+
+# Columns of the dashboard lead table, leaving out the interaction history
+TABLE_FIELDS = [
+    "id",
+    "first_name",
+    "last_name",
+    "company",
+    "email",
+    "status",
+    "source",
+    "score",
+    "category",
+    "updated_at",
+]
+
+# Field sets selected by `view`, None meaning the whole document
+LEAD_VIEWS: Dict[LeadView, Optional[List[str]]] = {
+    LeadView.FULL: None,
+    LeadView.TABLE: TABLE_FIELDS,
+}
+
+
+# Fields whose value counts a list response can carry next to the page
+FACET_FIELDS = ["status", "source", "category"]
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [field.strip() for field in value.split(",") if field.strip()] if value else []
+
+
+def parse_lead_fields(
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None,
+    view: LeadView = LeadView.FULL,
+) -> Optional[List[str]]:
+    """
+    Resolve the `fields`, `exclude` and `view` query parameters into the response fields
+
+    `fields` replaces the view's field set and `exclude` is removed from the result.
+    Returns None when the whole document is wanted, raises ValueError on unknown fields.
+    """
+    selected = _split(fields)
+    excluded = _split(exclude)
+    unknown = [field for field in selected + excluded if field not in LEAD_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown lead fields: {', '.join(unknown)}")
+
+    if not selected and not excluded:
+        return LEAD_VIEWS[view]
+    base = selected or LEAD_VIEWS[view] or LEAD_FIELDS
+    # keep response order stable whatever order the fields were asked in
+    return [field for field in LEAD_FIELDS if field in base and field not in excluded]
+
+
+def lead_projection(fields: Optional[List[str]], keep: Iterable[str] = ()) -> Optional[Dict[str, int]]:
+    """
+    MongoDB inclusion projection reading only `fields`, plus the document keys in `keep`
+
+    Callers keep whatever they need beyond the response, such as sort keys for the next
+    page cursor or the version and update time an ETag is built from. _id is always read.
+    """
+    if fields is None:
+        return None
+    projection = {LeadModel.model_fields[field].alias or field: 1 for field in fields}
+    for key in keep:
+        projection[key] = 1
+    projection["_id"] = 1
+    return projection
+
+
+def parse_facets(facets: Optional[str]) -> Optional[List[str]]:
+    """Resolve the `facets` query parameter, raising ValueError on fields that cannot be faceted"""
+    selected = _split(facets)
+    unknown = [field for field in selected if field not in FACET_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown facet fields: {', '.join(unknown)}, expected some of {', '.join(FACET_FIELDS)}")
+    return [field for field in FACET_FIELDS if field in selected] or None
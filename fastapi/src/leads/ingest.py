@@ -0,0 +1,251 @@
+import codecs
+import csv
+import json
+from collections import deque
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple, TypeVar, Union
+from pydantic import ValidationError
+from src.config import settings
+from src.leads.schemas import LeadCreateSchema
+from src.offload import process_pool
+
+T = TypeVar("T")
+
+# An upload record before parsing: (row number, raw NDJSON line or CSV record text), None for a line over the length limit
+RawRecord = Tuple[int, Optional[str]]
+
+# A parsed upload row: (row number, field dict) or (row number, parse error message)
+ParsedRow = Tuple[int, Union[Dict[str, Any], str]]
+
+# A validated upload row: (row number, lead fields, None) or (row number, None, error list)
+ValidatedRow = Tuple[int, Optional[Dict[str, Any]], Optional[List[Any]]]
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+
+LINE_TOO_LONG = "Line exceeds the maximum record length"
+
+
+def detect_format(content_type: str) -> str:
+    """Map a request content type to an upload format, or an empty string if unsupported"""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in NDJSON_CONTENT_TYPES:
+        return "ndjson"
+    if media_type in CSV_CONTENT_TYPES:
+        return "csv"
+    return ""
+
+
+async def iter_lines(stream: AsyncIterator[bytes], max_length: int) -> AsyncIterator[Optional[str]]:
+    """
+    Split a streamed request body into text lines without buffering the whole body
+
+    A line longer than `max_length` characters is yielded as None, and no more than that much of it is kept.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending: List[str] = []
+    pending_length = 0
+    too_long = False
+    async for chunk in stream:
+        *ends, rest = decoder.decode(chunk).split("\n")
+        for end in ends:
+            if too_long or pending_length + len(end) > max_length:
+                yield None
+            else:
+                yield ("".join(pending) + end).rstrip("\r")
+            pending, pending_length, too_long = [], 0, False
+        if not too_long:
+            pending.append(rest)
+            pending_length += len(rest)
+            # drop the line as soon as it is too long, the rest of it up to the next newline is skipped
+            if pending_length > max_length:
+                pending, too_long = [], True
+
+    line = "".join(pending) + decoder.decode(b"", final=True)
+    if too_long or len(line) > max_length:
+        yield None
+    elif line:
+        yield line.rstrip("\r")
+
+
+async def iter_ndjson_records(stream: AsyncIterator[bytes], max_length: int) -> AsyncIterator[RawRecord]:
+    row_number = 0
+    async for line in iter_lines(stream, max_length):
+        if line is not None and not line.strip():
+            continue
+        row_number += 1
+        yield row_number, line
+
+
+class CsvRecordSplitter:
+    """
+    Join CSV lines into records, across the line breaks of quoted fields
+
+    Lines are joined until their quotes balance. A record still open after `max_lines` lines or
+    `max_length` characters, or at the end of the upload, is taken to start with a stray quote:
+    its first line becomes a record of its own, which fails to parse as an unterminated quoted
+    field, and the lines after it are split again. Both limits bound the memory held and the lines re-read.
+    """
+    def __init__(self, max_length: int, max_lines: int):
+        self.max_length = max_length
+        self.max_lines = max_lines
+        self.row_number = 0
+        self._reset()
+
+    def _reset(self):
+        self.lines: List[str] = []
+        self.length = 0
+        self.quotes = 0
+
+    def _record(self, text: Optional[str]) -> RawRecord:
+        record = (self.row_number, text)
+        self.row_number += 1
+        return record
+
+    def _split_first(self) -> Tuple[RawRecord, List[str]]:
+        """Close the open record at its first line, returning it and the lines to split again"""
+        first, *rest = self.lines
+        self._reset()
+        return self._record(first), rest
+
+    def feed(self, line: Optional[str]) -> List[RawRecord]:
+        records = []
+        queue = deque([line])
+        while queue:
+            line = queue.popleft()
+            if self.lines and (line is None or len(self.lines) >= self.max_lines or self.length + len(line) > self.max_length):
+                record, rest = self._split_first()
+                records.append(record)
+                queue.extendleft(reversed([*rest, line]))
+                continue
+            if line is None:
+                records.append(self._record(None))
+                continue
+
+            self.lines.append(line)
+            self.length += len(line)
+            self.quotes += line.count('"')
+            if self.quotes % 2:
+                continue
+            text = "\n".join(self.lines)
+            self._reset()
+            if text.strip():
+                records.append(self._record(text))
+        return records
+
+    def finish(self) -> List[RawRecord]:
+        """Records left at the end of the upload, splitting up a record whose quotes never balanced"""
+        records = []
+        while self.lines:
+            record, rest = self._split_first()
+            records.append(record)
+            for line in rest:
+                records += self.feed(line)
+        return records
+
+
+async def iter_csv_records(stream: AsyncIterator[bytes], max_length: int, max_lines: int) -> AsyncIterator[RawRecord]:
+    """CSV records of an upload, the header first as row 0"""
+    splitter = CsvRecordSplitter(max_length, max_lines)
+    async for line in iter_lines(stream, max_length):
+        for record in splitter.feed(line):
+            yield record
+    for record in splitter.finish():
+        yield record
+
+
+def parse_csv_header(text: Optional[str]) -> List[str]:
+    # a header over the length limit has no usable columns, so every row fails its column count
+    return [name.strip() for name in next(csv.reader([text or ""]), [])]
+
+
+def _parse_ndjson_record(row_number: int, text: Optional[str]) -> ParsedRow:
+    if text is None:
+        return row_number, LINE_TOO_LONG
+    try:
+        row = json.loads(text)
+    except ValueError as e:
+        return row_number, f"Invalid JSON: {e}"
+    if not isinstance(row, dict):
+        return row_number, "Each line must be a JSON object"
+    return row_number, row
+
+
+def _parse_csv_record(header: List[str], row_number: int, text: Optional[str]) -> ParsedRow:
+    if text is None:
+        return row_number, LINE_TOO_LONG
+    if text.count('"') % 2:
+        return row_number, "Unterminated quoted field"
+    values = next(csv.reader([text]))
+    if len(values) != len(header):
+        return row_number, f"Expected {len(header)} columns, got {len(values)}"
+    return row_number, _csv_row_to_dict(header, values)
+
+
+def _csv_row_to_dict(header: List[str], values: List[str]) -> Dict[str, Any]:
+    # empty cells fall back to the schema defaults
+    row = {name: value for name, value in zip(header, values) if value != ""}
+    if "interactions" in row:
+        try:
+            row["interactions"] = json.loads(row["interactions"])
+        except ValueError:
+            pass
+    return row
+
+
+def parse_records(records: List[RawRecord], upload_format: str, header: Optional[List[str]] = None) -> List[ParsedRow]:
+    """Parse a chunk of raw NDJSON lines or CSV records, as a process pool task"""
+    if upload_format == "ndjson":
+        return [_parse_ndjson_record(row_number, text) for row_number, text in records]
+    return [_parse_csv_record(header, row_number, text) for row_number, text in records]
+
+
+def validate_rows(rows: List[ParsedRow]) -> List[ValidatedRow]:
+    """Validate parsed rows as lead create payloads, as a process pool task"""
+    validated = []
+    for row_number, row in rows:
+        if isinstance(row, str):
+            validated.append((row_number, None, [row]))
+            continue
+        try:
+            lead = LeadCreateSchema(**row)
+        except ValidationError as e:
+            validated.append((row_number, None, json.loads(e.json(include_url=False, include_input=False))))
+            continue
+        validated.append((row_number, lead.model_dump(exclude="id", exclude_unset=True), None))
+    return validated
+
+
+async def iter_row_chunks(rows: AsyncIterator[T], chunk_size: int) -> AsyncIterator[List[T]]:
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def iter_parsed_chunks(
+    stream: AsyncIterator[bytes],
+    upload_format: str,
+    chunk_size: int,
+    max_record_length: int = settings.BULK_INGEST_MAX_RECORD_LENGTH,
+    max_record_lines: int = settings.BULK_INGEST_MAX_RECORD_LINES,
+) -> AsyncIterator[List[ParsedRow]]:
+    """
+    Parsed rows of an upload, `chunk_size` records at a time
+
+    Only record boundaries are found on the event loop, each chunk is decoded by the process pool.
+    """
+    if upload_format == "ndjson":
+        records = iter_ndjson_records(stream, max_record_length)
+    else:
+        records = iter_csv_records(stream, max_record_length, max_record_lines)
+    header = None
+    async for chunk in iter_row_chunks(records, chunk_size):
+        if upload_format == "csv" and header is None:
+            header = parse_csv_header(chunk.pop(0)[1])
+            if not chunk:
+                continue
+        yield await process_pool.map_chunks(parse_records, chunk, upload_format, header)
@@ -0,0 +1,273 @@
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import InsertOne, UpdateOne
+from src.config import settings
+from src.pagination import encode_cursor, decode_cursor
+from src.markers import bump_marker
+
+# Interactions live in their own collection, one bucket per lead, calendar month and BUCKET_SIZE entries
+INTERACTIONS_COLLECTION = "lead_interactions"
+
+# Keyset order of interaction pages: month buckets newest first, then position within the month
+PAGE_SORT = [("month", -1), ("offset", 1)]
+
+
+def interactions_collection(leads_collection: AsyncIOMotorCollection) -> AsyncIOMotorCollection:
+    return leads_collection.database.get_collection(INTERACTIONS_COLLECTION)
+
+
+def is_bucketed(lead: Dict[str, Any]) -> bool:
+    """Leads written before bucketing keep their full history embedded until migrated"""
+    return "interaction_count" in lead
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # MongoDB hands back naive datetimes that are already in UTC
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def bucket_month(date: datetime) -> str:
+    return as_utc(date).strftime("%Y-%m")
+
+
+def _latest(interactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(interactions, key=lambda interaction: as_utc(interaction["date"]))[-settings.RECENT_INTERACTIONS:]
+
+
+def summary_fields(interactions: List[Dict[str, Any]], existing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Summary fields kept on the lead after appending `interactions` to an `existing` bucketed lead
+
+    Used both to store new leads and to score a lead before its append is written.
+    """
+    existing = existing or {}
+    dates = [as_utc(interaction["date"]) for interaction in interactions]
+    if existing.get("last_interaction_at"):
+        dates.append(as_utc(existing["last_interaction_at"]))
+    return {
+        "interaction_count": existing.get("interaction_count", 0) + len(interactions),
+        "last_interaction_at": max(dates, default=None),
+        "interactions": _latest((existing.get("interactions") or []) + interactions),
+    }
+
+
+def append_update(interactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Update operators appending `interactions` to the summary of a bucketed lead"""
+    if not interactions:
+        return {}
+    return {
+        "$inc": {"interaction_count": len(interactions)},
+        "$max": {"last_interaction_at": max(as_utc(interaction["date"]) for interaction in interactions)},
+        "$push": {"interactions": {
+            "$each": interactions,
+            "$sort": {"date": 1},
+            "$slice": -settings.RECENT_INTERACTIONS,
+        }},
+    }
+
+
+def recent_expression(interactions: Any, new_interactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregation expression adding `new_interactions` to a lead's date ordered summary, keeping the newest
+
+    Every writer stores the summary oldest first, so the stored entries are split around the dates
+    of the new ones, which are already known, rather than sorted with $sortArray, which needs MongoDB 5.2.
+    """
+    parts = []
+    lower = None
+    for interaction in _latest(new_interactions):
+        upper = interaction["date"]
+        parts += [_dated_between(interactions, lower, upper), {"$literal": [interaction]}]
+        lower = upper
+    parts.append(_dated_between(interactions, lower, None))
+    return {"$slice": [{"$concatArrays": parts}, -settings.RECENT_INTERACTIONS]}
+
+
+def _dated_between(interactions: Any, lower: Optional[datetime], upper: Optional[datetime]) -> Any:
+    # stored entries after `lower` and up to `upper`, so they stay ahead of a new entry of the same date
+    conditions = []
+    if lower is not None:
+        conditions.append({"$gt": ["$$this.date", lower]})
+    if upper is not None:
+        conditions.append({"$lte": ["$$this.date", upper]})
+    if not conditions:
+        return interactions
+    return {"$filter": {"input": interactions, "cond": {"$and": conditions}}}
+
+
+def append_stage(interaction: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pipeline update stage appending one interaction to a lead, bucketed or legacy
+
+    Bucketed leads get their summary fields advanced and keep the newest RECENT_INTERACTIONS
+    entries; legacy leads keep growing their embedded history until they are migrated.
+    """
+    bucketed = {"$ne": [{"$type": "$interaction_count"}, "missing"]}
+    existing = {"$ifNull": ["$interactions", []]}
+    appended = {"$concatArrays": [existing, [{"$literal": interaction}]]}
+    return {"$set": {
+        "interactions": {"$cond": [bucketed, recent_expression(existing, [interaction]), appended]},
+        "interaction_count": {"$cond": [bucketed, {"$add": ["$interaction_count", 1]}, "$$REMOVE"]},
+        "last_interaction_at": {"$cond": [bucketed, {"$max": ["$last_interaction_at", interaction["date"]]}, "$$REMOVE"]},
+    }}
+
+
+def merge_stage(interactions: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Pipeline update stage merging the interactions of a create-or-merge upsert
+
+    Must run before the lead's own fields are set, since a document without created_at is the one
+    being inserted. New and bucketed leads append to their summary, legacy leads have their embedded
+    history replaced when interactions are given, as create_lead always did.
+    """
+    new = {"$eq": [{"$type": "$created_at"}, "missing"]}
+    summarized = {"$or": [new, {"$ne": [{"$type": "$interaction_count"}, "missing"]}]}
+    latest = max((as_utc(interaction["date"]) for interaction in interactions or []), default=None)
+    if interactions is None:
+        merged = {"$cond": [new, {"$literal": []}, "$interactions"]}
+    else:
+        merged = {"$cond": [summarized, recent_expression({"$ifNull": ["$interactions", []]}, interactions), {"$literal": interactions}]}
+    return {"$set": {
+        "interactions": merged,
+        "interaction_count": {"$cond": [summarized, {"$add": [{"$ifNull": ["$interaction_count", 0]}, len(interactions or [])]}, "$$REMOVE"]},
+        "last_interaction_at": {"$cond": [summarized, {"$max": ["$last_interaction_at", latest]}, "$$REMOVE"]},
+    }}
+
+
+def bucket_operations(lead_id: Any, interactions: List[Dict[str, Any]]) -> List[UpdateOne]:
+    """Upserts appending `interactions` to the lead's open bucket for each month"""
+    operations = []
+    by_month = groupby(sorted(interactions, key=lambda interaction: as_utc(interaction["date"])), key=lambda interaction: bucket_month(interaction["date"]))
+    for month, month_interactions in by_month:
+        month_interactions = list(month_interactions)
+        operations.append(UpdateOne(
+            {"lead_id": lead_id, "month": month, "count": {"$lt": settings.INTERACTION_BUCKET_SIZE}},
+            {
+                "$push": {"interactions": {"$each": month_interactions}},
+                "$inc": {"count": len(month_interactions)},
+            },
+            upsert=True
+        ))
+    return operations
+
+
+def bucket_documents(lead_id: Any, interactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Full buckets holding a lead's whole interaction history, for leads without any bucket yet"""
+    buckets = []
+    by_month = groupby(sorted(interactions, key=lambda interaction: as_utc(interaction["date"])), key=lambda interaction: bucket_month(interaction["date"]))
+    for month, month_interactions in by_month:
+        month_interactions = list(month_interactions)
+        for start in range(0, len(month_interactions), settings.INTERACTION_BUCKET_SIZE):
+            bucket = month_interactions[start:start + settings.INTERACTION_BUCKET_SIZE]
+            buckets.append({"lead_id": lead_id, "month": month, "count": len(bucket), "interactions": bucket})
+    return buckets
+
+
+async def record_interactions(
+    leads_collection: AsyncIOMotorCollection,
+    interactions_by_lead: Dict[Any, List[Dict[str, Any]]],
+):
+    operations = [
+        operation
+        for lead_id, interactions in interactions_by_lead.items()
+        for operation in bucket_operations(lead_id, interactions)
+    ]
+    if operations:
+        await interactions_collection(leads_collection).bulk_write(operations, ordered=False)
+
+
+def _fill_page(page: list, month: str, interactions: list, offset: int, limit: int) -> Optional[str]:
+    interactions.sort(key=lambda interaction: as_utc(interaction["date"]), reverse=True)
+    taken = interactions[offset:offset + limit - len(page)]
+    page.extend(taken)
+    end = offset + len(taken)
+    if end < len(interactions):
+        return encode_cursor({"month": month, "offset": end}, PAGE_SORT)
+    return None
+
+
+async def list_interactions(
+    leads_collection: AsyncIOMotorCollection,
+    lead_id: Any,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+):
+    """
+    Page through a lead's interactions newest first, reading one month of buckets at a time
+
+    Returns the page and the cursor of the next one. Cursors hold a position inside a month,
+    so interactions logged into an already visited month while paging can shift that month's page.
+    """
+    start_month, start_offset = decode_cursor(cursor, PAGE_SORT) if cursor else (None, 0)
+    query = {"lead_id": lead_id}
+    if start_month:
+        query["month"] = {"$lte": start_month}
+
+    page = []
+    page_cursor = None
+    month = None
+    month_interactions = []
+    buckets = interactions_collection(leads_collection).find(query, {"month": 1, "interactions": 1}).sort("month", -1)
+    async for bucket in buckets:
+        if bucket["month"] != month:
+            if month is not None:
+                page_cursor = _fill_page(page, month, month_interactions, start_offset if month == start_month else 0, limit)
+                if len(page) >= limit:
+                    page_cursor = page_cursor or encode_cursor({"month": bucket["month"], "offset": 0}, PAGE_SORT)
+                    return page, page_cursor
+            month = bucket["month"]
+            month_interactions = []
+        month_interactions.extend(bucket["interactions"])
+
+    if month is not None:
+        page_cursor = _fill_page(page, month, month_interactions, start_offset if month == start_month else 0, limit)
+    return page, page_cursor
+
+
+async def migrate_lead_interactions(leads_collection: AsyncIOMotorCollection, batch_size: int = 500):
+    """
+    Move embedded interaction histories into buckets and leave only the summary on each lead
+
+    Safe to rerun: a lead's buckets are rebuilt from scratch, and a lead that received an interaction
+    while being migrated keeps its embedded history and is picked up by the next run.
+    """
+    migrated = 0
+    batch = []
+    cursor = leads_collection.find({"interaction_count": {"$exists": False}}, {"interactions": 1}, batch_size=batch_size)
+    async for lead in cursor:
+        batch.append(lead)
+        if len(batch) >= batch_size:
+            migrated += await _migrate_batch(leads_collection, batch)
+            batch = []
+    if batch:
+        migrated += await _migrate_batch(leads_collection, batch)
+    return migrated
+
+
+async def _migrate_batch(leads_collection: AsyncIOMotorCollection, leads: List[Dict[str, Any]]) -> int:
+    buckets = interactions_collection(leads_collection)
+    await buckets.delete_many({"lead_id": {"$in": [lead["_id"] for lead in leads]}})
+
+    inserts = []
+    updates = []
+    for lead in leads:
+        interactions = lead.get("interactions") or []
+        inserts += [InsertOne(bucket) for bucket in bucket_documents(lead["_id"], interactions)]
+        # only trim the embedded history if nobody appended to it since it was read
+        unchanged = {"$size": len(interactions)} if interactions else {"$in": [None, []]}
+        updates.append(UpdateOne(
+            {"_id": lead["_id"], "interaction_count": {"$exists": False}, "interactions": unchanged},
+            {"$set": summary_fields(interactions)}
+        ))
+
+    if inserts:
+        await buckets.bulk_write(inserts, ordered=False)
+    migrated = (await leads_collection.bulk_write(updates, ordered=False)).modified_count
+    await bump_marker(leads_collection)
+    return migrated
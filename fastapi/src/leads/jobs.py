@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import sys
+from typing import Optional
+from src.database import DatabaseManager, get_leads_collection
+from src.leads.service import LeadService, LEAD_SORTS, TOP_SORT
+from src.leads.schemas import LeadStatus, LeadSource
+from src.monitoring.slow_queries import assert_index_used
+from src.leads.interactions import migrate_lead_interactions
+from src.leads.stats import rebuild_stats
+from src.leads.scheduler import RecencyRescoreScheduler
+from src.config import settings
+from src.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Maintenance jobs for the leads collection, run with `python -m src.leads.jobs <command>`
+async def rescore(batch_size: int, stale_only: bool):
+    result = await LeadService.rescore_leads(get_leads_collection(), batch_size=batch_size, stale_only=stale_only)
+    logger.info(f"Rescored leads: {result['scanned']} scanned, {result['modified']} modified")
+
+
+async def backfill_search(batch_size: int):
+    updated = await LeadService.backfill_search_keys(get_leads_collection(), batch_size=batch_size)
+    logger.info(f"Backfilled search keys on {updated} leads")
+
+
+async def migrate_interactions(batch_size: int):
+    migrated = await migrate_lead_interactions(get_leads_collection(), batch_size=batch_size)
+    logger.info(f"Moved interaction history of {migrated} leads into buckets")
+
+
+async def recency_worker(once: bool):
+    scheduler = RecencyRescoreScheduler(
+        get_leads_collection(),
+        interval=settings.RECENCY_RESCORE_INTERVAL_SECONDS,
+        batch_size=settings.RECENCY_RESCORE_BATCH_SIZE,
+    )
+    if once:
+        await scheduler.run_once()
+    else:
+        await scheduler.run_forever()
+
+
+async def check_scoring(sample_size: int):
+    result = await LeadService.check_scoring_parity(get_leads_collection(), sample_size=sample_size)
+    for mismatch in result["mismatches"]:
+        logger.error(f"Scoring mismatch: {mismatch}")
+    logger.info(f"Checked server-side scoring on {result['checked']} leads, {len(result['mismatches'])} mismatches")
+    return not result["mismatches"]
+
+
+async def reconcile_stats(interval: Optional[float]):
+    while True:
+        buckets = await rebuild_stats(get_leads_collection())
+        logger.info(f"Rebuilt lead stats rollups, {buckets} buckets")
+        if not interval:
+            return
+        await asyncio.sleep(interval)
+
+
+# Filters offered by GET /leads, each checked against every keyset sort order
+LIST_FILTERS = {
+    "unfiltered": {},
+    "email": {"email": "jane.doe@example.com"},
+    "phone": {"phone": "203467546034"},
+    "status": {"status": LeadStatus.NEW},
+    "source": {"source": LeadSource.WEBSITE},
+    "first_name": {"first_name": "jane"},
+    "company": {"company": "tech"},
+    "q": {"q": "jane tech"},
+}
+
+
+# Filters offered by GET /leads/top, each of which must be read in score order off an index
+TOP_FILTERS = {
+    "all": {},
+    "category": {"category": "Hot"},
+    "source": {"source": LeadSource.REFERRAL},
+    "status": {"status": LeadStatus.QUALIFIED},
+    "status_source": {"status": LeadStatus.QUALIFIED, "source": LeadSource.REFERRAL},
+}
+
+
+async def check_indexes():
+    leads_collection = get_leads_collection()
+    failures = 0
+    for filter_name, filters in TOP_FILTERS.items():
+        query = LeadService.build_top_query(**filters)
+        try:
+            analysis = await assert_index_used(leads_collection, query, TOP_SORT, limit=100, allow_sort=False)
+            logger.info(f"top {filter_name}: {', '.join(analysis['stages'])}")
+        except AssertionError as e:
+            failures += 1
+            logger.error(str(e))
+    for filter_name, filters in LIST_FILTERS.items():
+        query = LeadService.build_leads_query(**filters)
+        for sort_name, sort_spec in LEAD_SORTS.items():
+            try:
+                analysis = await assert_index_used(
+                    leads_collection, query, sort_spec, max_examined_ratio=settings.SLOW_QUERY_MAX_EXAMINED_RATIO
+                )
+                logger.info(f"{filter_name} by {sort_name.value}: {', '.join(analysis['stages'])}")
+            except AssertionError as e:
+                failures += 1
+                logger.error(str(e))
+    return not failures
+
+
+async def run(args: argparse.Namespace):
+    await DatabaseManager.connect()
+    ok = True
+    try:
+        if args.command == "rescore":
+            await rescore(args.batch_size, args.stale_only)
+        elif args.command == "backfill-search":
+            await backfill_search(args.batch_size)
+        elif args.command == "migrate-interactions":
+            await migrate_interactions(args.batch_size)
+        elif args.command == "recency-worker":
+            await recency_worker(args.once)
+        elif args.command == "check-scoring":
+            ok = await check_scoring(args.sample_size)
+        elif args.command == "check-indexes":
+            ok = await check_indexes()
+        elif args.command == "reconcile-stats":
+            await reconcile_stats(args.interval)
+    finally:
+        await DatabaseManager.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leads maintenance jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rescore_parser = subparsers.add_parser("rescore", help="Recompute score and category for every lead")
+    rescore_parser.add_argument("--batch-size", type=int, default=1000)
+    rescore_parser.add_argument("--stale-only", action="store_true", help="Only rescore leads scored by an older rule set version")
+
+    search_parser = subparsers.add_parser("backfill-search", help="Store search keys on leads that have none")
+    search_parser.add_argument("--batch-size", type=int, default=1000)
+
+    migrate_parser = subparsers.add_parser("migrate-interactions", help="Move embedded interaction histories into buckets")
+    migrate_parser.add_argument("--batch-size", type=int, default=500)
+
+    # run with RECENCY_RESCORE_ENABLED=false on the API workers to move the job out of the web process
+    worker_parser = subparsers.add_parser("recency-worker", help="Rescore leads whose interaction recency decayed")
+    worker_parser.add_argument("--once", action="store_true", help="Run a single pass instead of looping")
+
+    parity_parser = subparsers.add_parser("check-scoring", help="Compare server-side pipeline scoring with LeadScorer on a sample")
+    parity_parser.add_argument("--sample-size", type=int, default=1000)
+
+    subparsers.add_parser("check-indexes", help="Explain every leads list query shape and fail on collection scans")
+
+    # run once after deploying the rollups, then periodically to correct drift
+    stats_parser = subparsers.add_parser("reconcile-stats", help="Rebuild the lead stats rollups from the leads")
+    stats_parser.add_argument("--interval", type=float, help="Keep rebuilding every INTERVAL seconds instead of once")
+
+    if not asyncio.run(run(parser.parse_args())):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
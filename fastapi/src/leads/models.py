@@ -1,12 +1,18 @@
-from pydantic import Field, ConfigDict, BaseModel
-from src.leads.schemas import LeadBase
-from typing import Literal, List
+from pydantic import Field, ConfigDict, BaseModel, create_model
+from src.leads.schemas import LeadBase, Interaction, FacetCount
+from src.serialization import dumps, shape_document
+from src.monitoring.metrics import serialization_duration_seconds, timed
+from typing import Literal, List, Optional, Dict
 from datetime import datetime
 
 # Define Lead model
 class LeadModel(LeadBase):
     score: float = Field(default=0.0,ge=0,le=100,description="A score indicating the lead's potential value (0 to 100).",example=85.0)
     category: Literal["Premium", "Hot", "Warm", "Cold"] = Field(default=None, description=" The category of the lead (hot,warm, cold, or premium)", example="Premium")
+    interaction_count: int = Field(default=0, description="Total number of interactions; `interactions` only holds the most recent ones.")
+    last_interaction_at: Optional[datetime] = Field(default=None, description="Date of the most recent interaction.")
+    score_version: Optional[str] = Field(default=None, description="Version of the scoring rule set the score was computed with.")
+    version: int = Field(default=0, description="Incremented on every change to the lead's data; send it back with an update to detect concurrent edits.")
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
 
@@ -35,6 +41,10 @@ class LeadModel(LeadBase):
                 ],
                 "score": 52,
                 "category": "Hot",
+                "interaction_count": 1,
+                "last_interaction_at": "2024-11-25T15:30:00Z",
+                "score_version": "2024-11-01",
+                "version": 3,
                 "created_at": "2024-11-30T13:14:38.895Z",
                 "updated_at": "2024-11-30T13:14:38.895Z"
                 
@@ -43,10 +53,59 @@ class LeadModel(LeadBase):
         }
     )
 
+# Define partial Lead model, for responses limited with `fields`, `exclude` or `view`
+LeadPartialModel = create_model(
+    "LeadPartialModel",
+    __config__=ConfigDict(populate_by_name=True, arbitrary_types_allowed=True),
+    **{
+        name: (Optional[field.annotation], Field(default=None, alias=field.alias, description=field.description))
+        for name, field in LeadModel.model_fields.items()
+    },
+)
+
 # Define Lead list model
 class LeadListSchema(BaseModel):
     leads: List[LeadModel]
+    next_cursor: Optional[str] = Field(default=None, description="Pass as `cursor` to fetch the next page; null on the last page")
+    facets: Optional[Dict[str, List[FacetCount]]] = Field(default=None, description="Value counts over every matching lead, for the fields asked for with `facets`")
+
+    @classmethod
+    def from_mongo_cursor(cls, cursor, next_cursor: Optional[str] = None):
+        return cls(leads=[LeadModel(**doc) for doc in cursor], next_cursor=next_cursor)
+
+    @classmethod
+    @timed(serialization_duration_seconds, "LeadListSchema")
+    def json_from_mongo_cursor(
+        cls,
+        cursor,
+        next_cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        facets: Optional[Dict[str, List[dict]]] = None,
+    ) -> bytes:
+        """Encode trusted lead documents straight to the JSON this schema would produce, without validation"""
+        response = {
+            "leads": [shape_document(doc, LeadModel, fields) for doc in cursor],
+            "next_cursor": next_cursor,
+        }
+        if facets is not None:
+            response["facets"] = facets
+        return dumps(response)
+
+# Define partial Lead list model
+class LeadPartialListSchema(BaseModel):
+    leads: List[LeadPartialModel]
+    next_cursor: Optional[str] = Field(default=None, description="Pass as `cursor` to fetch the next page; null on the last page")
+    facets: Optional[Dict[str, List[FacetCount]]] = Field(default=None, description="Value counts over every matching lead, for the fields asked for with `facets`")
+
+# Define interaction page model
+class InteractionListSchema(BaseModel):
+    interactions: List[Interaction]
+    next_cursor: Optional[str] = Field(default=None, description="Pass as `cursor` to fetch the next page; null on the last page")
 
     @classmethod
-    def from_mongo_cursor(cls, cursor):
-        return cls(leads=[LeadModel(**doc) for doc in cursor])
\ No newline at end of file
+    @timed(serialization_duration_seconds, "InteractionListSchema")
+    def json_from_mongo_cursor(cls, cursor, next_cursor: Optional[str] = None) -> bytes:
+        return dumps({
+            "interactions": [shape_document(doc, Interaction) for doc in cursor],
+            "next_cursor": next_cursor,
+        })
@@ -0,0 +1,216 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import DeleteOne, UpdateOne
+from src.config import settings
+from src.logger_config import get_logger
+from src.monitoring.metrics import lead_rescore_queue_total
+
+logger = get_logger(__name__)
+
+QUEUE_COLLECTION = "rescore_queue"
+
+# A lead id taken off the queue and the backend's token for it, handed back on completion
+Claim = Tuple[Any, Any]
+
+
+class MemoryRescoreBackend:
+    """Pending lead ids held by this worker only, lost when it restarts"""
+    durable = False
+
+    def __init__(self):
+        self._due: Dict[Any, datetime] = {}
+
+    async def add(self, lead_ids: Iterable, due: datetime):
+        for lead_id in lead_ids:
+            # the first write starts the debounce window, later ones join it
+            self._due.setdefault(lead_id, due)
+
+    async def claim(self, now: Optional[datetime], limit: int) -> List[Claim]:
+        lead_ids = [lead_id for lead_id, due in self._due.items() if now is None or due <= now][:limit]
+        for lead_id in lead_ids:
+            del self._due[lead_id]
+        return [(lead_id, None) for lead_id in lead_ids]
+
+    async def complete(self, claims: List[Claim], retry_due: datetime):
+        # claimed ids left the queue already, writes made since then queued them again
+        pass
+
+    async def next_due(self) -> Optional[datetime]:
+        return min(self._due.values(), default=None)
+
+
+class MongoRescoreBackend:
+    """
+    Pending lead ids in the rescore_queue collection, shared by every worker and kept across restarts
+
+    Workers claim due entries under a lease, so a worker that dies mid-batch leaves them to be
+    claimed again once the lease runs out. Every enqueue counts a write on the entry, and an entry
+    written to again while claimed stays queued for another round instead of being deleted.
+    """
+    durable = True
+
+    def __init__(self, collection: AsyncIOMotorCollection, lease_seconds: float):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+
+    async def add(self, lead_ids: Iterable, due: datetime):
+        operations = [
+            UpdateOne({"_id": lead_id}, {"$setOnInsert": {"due_at": due}, "$inc": {"writes": 1}}, upsert=True)
+            for lead_id in lead_ids
+        ]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    async def claim(self, now: Optional[datetime], limit: int) -> List[Claim]:
+        now = now or datetime.now(timezone.utc)
+        available = {
+            "due_at": {"$lte": now},
+            "$or": [{"claimed_until": None}, {"claimed_until": {"$lt": now}}],
+        }
+        candidates = await self.collection.find(available, {"_id": 1}).sort("due_at", 1).limit(limit).to_list(length=limit)
+        if not candidates:
+            return []
+
+        # claim what is still available, then read back which of the candidates this claim won
+        token = ObjectId()
+        lead_ids = [candidate["_id"] for candidate in candidates]
+        await self.collection.update_many(
+            {"_id": {"$in": lead_ids}, **available},
+            {"$set": {"claimed_by": token, "claimed_until": now + timedelta(seconds=self.lease_seconds)}},
+        )
+        claimed = self.collection.find({"_id": {"$in": lead_ids}, "claimed_by": token}, {"writes": 1})
+        return [(entry["_id"], (token, entry.get("writes"))) async for entry in claimed]
+
+    async def complete(self, claims: List[Claim], retry_due: datetime):
+        if not claims:
+            return
+        await self.collection.bulk_write([
+            DeleteOne({"_id": lead_id, "claimed_by": token, "writes": writes}) for lead_id, (token, writes) in claims
+        ], ordered=False)
+        # entries written to while claimed are still here, due again after another debounce window
+        await self.collection.update_many(
+            {"_id": {"$in": [lead_id for lead_id, _ in claims]}, "claimed_by": {"$in": list({token for _, (token, _) in claims})}},
+            {"$set": {"due_at": retry_due}, "$unset": {"claimed_by": "", "claimed_until": ""}},
+        )
+
+    async def next_due(self) -> Optional[datetime]:
+        # claimed entries are another worker's, their expired leases are picked up by the next poll
+        entry = await self.collection.find_one({"claimed_until": None}, {"due_at": 1}, sort=[("due_at", 1)])
+        return entry["due_at"].replace(tzinfo=timezone.utc) if entry else None
+
+
+def rescore_backend(name: str, leads_collection: AsyncIOMotorCollection):
+    """Build the backend selected by RESCORE_QUEUE_BACKEND"""
+    if name == "memory":
+        return MemoryRescoreBackend()
+    if name == "mongodb":
+        return MongoRescoreBackend(
+            leads_collection.database.get_collection(QUEUE_COLLECTION),
+            lease_seconds=settings.RESCORE_QUEUE_LEASE_SECONDS,
+        )
+    raise ValueError(f"Unknown rescore queue backend {name}")
+
+
+class RescoreQueue:
+    """
+    Coalesced rescoring of leads written with consistency=async
+
+    Such writes skip scoring and enqueue the lead id. A worker task waits out the debounce window
+    that the first enqueue of an id opened, so a burst of writes to one lead rescores it once, then
+    rescores the due leads in batches through `rescore`. That returns the ids it could not write
+    because the lead changed underneath it, which are queued again.
+    """
+    def __init__(self, debounce: float = 2.0, batch_size: int = 500, poll_interval: float = 5.0):
+        self.debounce = debounce
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.backend = None
+        self._rescore: Optional[Callable[[List], Awaitable[List]]] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, backend, rescore: Callable[[List], Awaitable[List]]):
+        if self._task is None:
+            self.backend = backend
+            self._rescore = rescore
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if not self.backend.durable:
+            # nothing else would ever rescore the ids this worker holds, so rescore them before exiting
+            try:
+                while await self.run_once(due_only=False):
+                    pass
+            except Exception as e:
+                logger.error(f"Draining the rescore queue failed: {e}")
+
+    async def enqueue(self, lead_ids: Iterable):
+        lead_ids = list(lead_ids)
+        if not lead_ids:
+            return
+        await self.backend.add(lead_ids, datetime.now(timezone.utc) + timedelta(seconds=self.debounce))
+        lead_rescore_queue_total.inc("enqueued", amount=len(lead_ids))
+        self._wakeup.set()
+
+    async def run_once(self, due_only: bool = True) -> int:
+        """Rescore one batch of due leads, or of any queued leads without `due_only`, returning its size"""
+        claims = await self.backend.claim(datetime.now(timezone.utc) if due_only else None, self.batch_size)
+        if not claims:
+            return 0
+        lead_ids = [lead_id for lead_id, _ in claims]
+        try:
+            retry = await self._rescore(lead_ids)
+        except BaseException:
+            # hand the batch back, so failing or stopping mid-batch does not lose the ids
+            await self.backend.add(lead_ids, datetime.now(timezone.utc))
+            raise
+        if retry:
+            await self.enqueue(retry)
+            lead_rescore_queue_total.inc("retried", amount=len(retry))
+        await self.backend.complete(claims, datetime.now(timezone.utc) + timedelta(seconds=self.debounce))
+        lead_rescore_queue_total.inc("rescored", amount=len(claims) - len(retry))
+        return len(claims)
+
+    async def run_forever(self):
+        while True:
+            try:
+                self._wakeup.clear()
+                if await self.run_once():
+                    continue
+                # sleep until the next window closes; other workers may enqueue into a shared backend meanwhile
+                next_due = await self.backend.next_due()
+                timeout = self.poll_interval if self.backend.durable else None
+                if next_due is not None:
+                    until_due = max((next_due - datetime.now(timezone.utc)).total_seconds(), 0)
+                    timeout = min(until_due, timeout) if timeout is not None else until_due
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Rescoring queued leads failed: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+
+rescore_queue = RescoreQueue(
+    debounce=settings.RESCORE_QUEUE_DEBOUNCE_SECONDS,
+    batch_size=settings.RESCORE_QUEUE_BATCH_SIZE,
+    poll_interval=settings.RESCORE_QUEUE_POLL_SECONDS,
+)
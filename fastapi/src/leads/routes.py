@@ -1,28 +1,86 @@
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Response, Request, HTTPException, Query, Header, status as http_status
 from motor.motor_asyncio import AsyncIOMotorCollection
-from src.leads.schemas import LeadCreateSchema, LeadUpdateSchema, LeadStatus, LeadSource, Interaction
-from src.leads.models import LeadModel, LeadListSchema
+from src.leads.schemas import LeadCreateSchema, LeadUpdateSchema, LeadStatus, LeadSource, LeadSort, LeadCountMode, LeadView, LeadConsistency, Interaction, LeadBulkResultSchema, LeadBulkRowError, CompanySuggestion, LeadStatsSchema
+from src.leads.ingest import detect_format, iter_parsed_chunks
+from src.leads.fields import parse_lead_fields, parse_facets
+from src.leads.export import EXPORT_MEDIA_TYPES, parse_export_fields, export_projection, iter_ndjson, iter_csv
+from src.config import settings
+from fastapi.responses import StreamingResponse
+from src.serialization import RawJSONResponse, dumps, shape_document
+from src.etags import weak_etag, document_etag, etag_matches, etag_headers, not_modified
+from src.markers import read_marker
+from src.leads.models import LeadModel, LeadPartialModel, LeadPartialListSchema, InteractionListSchema
 from src.database import get_leads_collection
 from src.models import PyObjectId
 from src.leads.service import LeadService
-from typing import Optional, Dict
+from typing import Optional, Dict, Literal, List
 
 leads_router = APIRouter()
 
+
+def lead_fields(
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, replacing the view's fields"),
+    exclude: Optional[str] = Query(None, description="Comma separated fields to leave out"),
+    view: LeadView = Query(LeadView.FULL, description="Named field set, `table` omits the interaction history"),
+) -> Optional[List[str]]:
+    """Response fields of a lead read, None for whole documents"""
+    try:
+        return parse_lead_fields(fields, exclude, view)
+    except ValueError as e:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 # Create CRUD path operations for Lead
 @leads_router.post("/", response_model=LeadModel, status_code=201, response_model_by_alias=False)
 async def create_lead(
      lead: LeadCreateSchema, 
+     consistency: LeadConsistency = Query(LeadConsistency.SYNC, description="`async` returns before the lead is rescored, which follows shortly in a batch"),
      leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
 ):
-    return await LeadService.create_lead(leads_collection, lead)
+    return await LeadService.create_lead(leads_collection, lead, consistency)
+
+# Bulk create or update leads from a streamed NDJSON or CSV upload
+@leads_router.post("/bulk", response_model=LeadBulkResultSchema)
+async def bulk_upsert_leads(
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = None,
+    consistency: LeadConsistency = Query(LeadConsistency.SYNC, description="`async` returns before the lead is rescored, which follows shortly in a batch"),
+    leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
+):
+    upload_format = format or detect_format(request.headers.get("content-type", ""))
+    if not upload_format:
+        raise HTTPException(
+            status_code=http_status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload must be NDJSON (application/x-ndjson) or CSV (text/csv)"
+        )
+
+    result = LeadBulkResultSchema()
+    async for chunk in iter_parsed_chunks(request.stream(), upload_format, settings.BULK_INGEST_CHUNK_SIZE):
+        chunk_result = await LeadService.bulk_upsert_leads(leads_collection, chunk, consistency)
+        result.received += chunk_result["received"]
+        result.inserted += chunk_result["inserted"]
+        result.updated += chunk_result["updated"]
+        result.failed += len(chunk_result["errors"])
+        for row_number, errors in chunk_result["errors"]:
+            # keep the response bounded however many rows fail
+            if len(result.errors) >= settings.BULK_INGEST_MAX_ERRORS:
+                result.errors_truncated = True
+                break
+            result.errors.append(LeadBulkRowError(row=row_number, errors=errors))
+
+    return result
 
 # Get all leads
-@leads_router.get("/", response_model=LeadListSchema, response_model_by_alias=False)
+@leads_router.get("/", response_model=LeadPartialListSchema, response_model_by_alias=False)
 async def get_leads(
+    request: Request,
     response: Response,
-    skip: int = 0, 
-    limit: int = 100,
+    skip: int = Query(0, ge=0, le=settings.MAX_PAGINATION_SKIP, description="Deprecated for deep pages, use cursor instead"),
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    q: Optional[str] = Query(None, description="Search across name, company and job title, ranked by relevance"),
+    cursor: Optional[str] = None,
+    sort: Optional[LeadSort] = Query(None, description="Defaults to relevance when searching with q, otherwise _id"),
+    count: LeadCountMode = LeadCountMode.ESTIMATE,
     first_name: Optional[str] = None,
     last_name: Optional[str] = None,
     email: Optional[str] = None,
@@ -31,8 +89,22 @@ async def get_leads(
     company: Optional[str] = None,
     job_title: Optional[str] = None,
     phone: Optional[str] = None,
+    fields: Optional[List[str]] = Depends(lead_fields),
+    facets: Optional[str] = Query(None, description="Comma separated fields to count values of over every matching lead: status, source, category"),
+    if_none_match: Optional[str] = Header(None),
     leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
 ):
+    try:
+        facet_fields = parse_facets(facets)
+    except ValueError as e:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # every lead write bumps the collection marker, so an unchanged marker means an unchanged page
+    marker = await read_marker(leads_collection)
+    etag = weak_etag("leads", marker, sorted(request.query_params.multi_items()))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
     leads, total_count =  await LeadService.get_leads(
         leads_collection,
         first_name=first_name,
@@ -43,20 +115,119 @@ async def get_leads(
         company=company,
         job_title=job_title,
         phone=phone,
+        q=q,
         skip=skip,
         limit=limit,
+        cursor=cursor,
+        sort=sort,
+        count=count,
+        fields=fields,
+        facets=facet_fields,
     )
 
-    response.headers["X-Total-Count"] = str(total_count)
-    return leads
+    # leads is already-encoded JSON built from the trusted documents, so skip response_model revalidation
+    headers = etag_headers(etag)
+    if total_count is not None:
+        headers["X-Total-Count"] = str(total_count)
+    return RawJSONResponse(leads, headers=headers)
+
+# Stream every lead matching the list filters as NDJSON or CSV
+@leads_router.get("/export", response_class=StreamingResponse)
+async def export_leads(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    fields: Optional[str] = Query(None, description="Comma separated columns to include, defaults to all"),
+    batch_size: int = Query(settings.EXPORT_BATCH_SIZE, ge=1, le=10000, description="Documents fetched per cursor round trip"),
+    q: Optional[str] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    email: Optional[str] = None,
+    status: Optional[LeadStatus] = None,
+    source: Optional[LeadSource] = None,
+    company: Optional[str] = None,
+    job_title: Optional[str] = None,
+    phone: Optional[str] = None,
+    leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
+):
+    try:
+        export_fields = parse_export_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=http_status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    query = LeadService.build_leads_query(
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
+        status=status,
+        source=source,
+        company=company,
+        job_title=job_title,
+        phone=phone,
+        q=q,
+    )
+    cursor = LeadService.export_leads_cursor(
+        leads_collection, query, export_projection(export_fields), batch_size=batch_size
+    )
+
+    # flush once per cursor batch so the worker only ever holds one batch in memory
+    iter_rows = iter_ndjson if format == "ndjson" else iter_csv
+    return StreamingResponse(
+        iter_rows(cursor, export_fields, flush_rows=batch_size),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="leads.{format}"'},
+    )
+
+# Suggest company names for search boxes
+@leads_router.get("/companies/autocomplete", response_model=List[CompanySuggestion])
+async def autocomplete_companies(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
+):
+    return await LeadService.autocomplete_companies(leads_collection, prefix, limit=limit)
+
+# Highest scoring leads, optionally within a category, source or status
+@leads_router.get("/top", response_model=LeadPartialListSchema, response_model_by_alias=False)
+async def get_top_leads(
+    request: Request,
+    n: int = Query(10, ge=1, le=100, description="Number of leads to return"),
+    category: Optional[str] = None,
+    source: Optional[LeadSource] = None,
+    status: Optional[LeadStatus] = None,
+    fields: Optional[List[str]] = Depends(lead_fields),
+    if_none_match: Optional[str] = Header(None),
+    leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
+):
+    marker = await read_marker(leads_collection)
+    etag = weak_etag("leads/top", marker, sorted(request.query_params.multi_items()))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    leads = await LeadService.get_top_leads(
+        leads_collection, n=n, category=category, source=source, status=status, fields=fields
+    )
+    return RawJSONResponse(leads, headers=etag_headers(etag))
+
+# Lead counts and average scores by category, status and source
+@leads_router.get("/stats", response_model=LeadStatsSchema)
+async def get_lead_stats(
+    leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
+):
+    return await LeadService.get_lead_stats(leads_collection)
 
 # Get a single lead by id
-@leads_router.get("/{lead_id}", response_model=LeadModel, response_model_by_alias=False)
+@leads_router.get("/{lead_id}", response_model=LeadPartialModel, response_model_by_alias=False)
 async def get_lead(
     lead_id: PyObjectId,
+    fields: Optional[List[str]] = Depends(lead_fields),
+    if_none_match: Optional[str] = Header(None),
     leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
 ):
-    return await LeadService.get_lead_by_id(leads_collection, lead_id)
+    lead = await LeadService.get_lead_by_id(leads_collection, lead_id, fields=fields)
+    # answer revalidations before the document is shaped and encoded, each field set is its own representation
+    etag = document_etag(lead) if fields is None else weak_etag(document_etag(lead), fields)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return RawJSONResponse(dumps(shape_document(lead, LeadModel, fields)), headers=etag_headers(etag))
     
 
 # Update lead 
@@ -64,9 +235,11 @@ async def get_lead(
 async def update_lead(
     lead_id: PyObjectId, 
     lead_update: LeadUpdateSchema,
+    consistency: LeadConsistency = Query(LeadConsistency.SYNC, description="`async` returns before the lead is rescored, which follows shortly in a batch"),
     leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
 ):
-    return await LeadService.update_lead(leads_collection, lead_id, lead_update)
+    lead = await LeadService.update_lead(leads_collection, lead_id, lead_update, consistency)
+    return RawJSONResponse(dumps(shape_document(lead, LeadModel)), headers=etag_headers(document_etag(lead)))
 
 # Delete a lead
 @leads_router.delete("/{lead_id}", response_model=Dict[str, str], response_model_by_alias=False)
@@ -81,7 +254,18 @@ async def delete_lead(
 async def add_lead_interaction(
     lead_id: PyObjectId, 
     interaction_data: Interaction,
+    consistency: LeadConsistency = Query(LeadConsistency.SYNC, description="`async` returns before the lead is rescored, which follows shortly in a batch"),
+    leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
+):
+    return await LeadService.add_lead_interaction(leads_collection, lead_id, interaction_data, consistency)
+
+# Page through a lead's interaction history, newest first
+@leads_router.get("/{lead_id}/interactions", response_model=InteractionListSchema)
+async def get_lead_interactions(
+    lead_id: PyObjectId,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
     leads_collection: AsyncIOMotorCollection = Depends(get_leads_collection)
 ):
-    return await LeadService.add_lead_interaction(leads_collection, lead_id, interaction_data)
-   
+    interactions, page_cursor = await LeadService.get_lead_interactions(leads_collection, lead_id, limit=limit, cursor=cursor)
+    return RawJSONResponse(InteractionListSchema.json_from_mongo_cursor(interactions, next_cursor=page_cursor))
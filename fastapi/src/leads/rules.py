@@ -0,0 +1,132 @@
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from src.config import settings
+from src.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+# Rule set shipped with the service, used unless SCORING_RULES_PATH points elsewhere
+DEFAULT_RULES_PATH = Path(__file__).with_name("scoring_rules.json")
+
+
+class Bands:
+    """
+    Points for a value falling at or under each ascending upper bound
+
+    `none` is what the caller awards when there is nothing to measure, `default` is awarded
+    above the last bound.
+    """
+    def __init__(self, spec: Dict[str, Any]):
+        self.none = spec["none"]
+        self.uppers = [upper for upper, _ in spec["bands"]]
+        self.points = [points for _, points in spec["bands"]]
+        self.default = spec["default"]
+        if self.uppers != sorted(self.uppers):
+            raise ValueError(f"Band upper bounds must be ascending: {self.uppers}")
+
+        self._upper_array = np.array(self.uppers, dtype=np.float64)
+        # values above every bound index the trailing default entry
+        self._point_array = np.array(self.points + [self.default], dtype=np.float64)
+
+    def points_for(self, value: float) -> float:
+        for upper, points in zip(self.uppers, self.points):
+            if value <= upper:
+                return points
+        return self.default
+
+    def points_batch(self, values: np.ndarray) -> np.ndarray:
+        return self._point_array[np.searchsorted(self._upper_array, values, side="left")]
+
+
+class ScoringRules:
+    """A versioned scoring rule set compiled into lookup tables and a single title matcher"""
+    def __init__(self, spec: Dict[str, Any]):
+        self.version = str(spec["version"])
+
+        self.status_points = {status.lower(): points for status, points in spec["status"]["points"].items()}
+        self.status_default = spec["status"]["default"]
+        self.source_points = {source.lower(): points for source, points in spec["source"]["points"].items()}
+        self.source_default = spec["source"]["default"]
+
+        # column codes used by the batch scoring path, unknown codes (-1) index the trailing default entry
+        self.status_codes = {status: code for code, status in enumerate(self.status_points)}
+        self.source_codes = {source: code for code, source in enumerate(self.source_points)}
+        self.status_lookup = np.array(list(self.status_points.values()) + [self.status_default], dtype=np.float64)
+        self.source_lookup = np.array(list(self.source_points.values()) + [self.source_default], dtype=np.float64)
+
+        self.company_size = Bands(spec["company_size"])
+        self.interactions = Bands(spec["interactions"])
+        self.recency_days = Bands(spec["recency_days"])
+
+        title = spec["job_title"]
+        self.title_keywords = tuple(keyword.lower() for keyword in title["keywords"])
+        # matched against the lowercased title, so it finds exactly what a substring check would
+        self.title_pattern = re.compile("|".join(re.escape(keyword) for keyword in self.title_keywords)) if self.title_keywords else None
+        self.title_points = (title["none"], title["other"], title["match"])
+        self.title_lookup = np.array(self.title_points, dtype=np.float64)
+
+        # a score below each bound gets that category
+        self.categories: List[Tuple[float, str]] = [(upper, name) for upper, name in spec["categories"]["bands"]]
+        self.top_category = spec["categories"]["default"]
+        self.max_score = spec.get("max_score", 100)
+
+
+def load_rules(path: Path) -> ScoringRules:
+    """Read and compile a rule set, raising on unreadable or malformed files"""
+    with open(path, encoding="utf-8") as rules_file:
+        return ScoringRules(json.load(rules_file))
+
+
+class RuleSet:
+    """
+    Holds the compiled rules in use and swaps in a new version when the rules file changes
+
+    The file's modification time is checked at most once every `check_interval` seconds, so
+    every worker picks up an edited rules file without restarting. A file that fails to compile
+    is logged and the previous rules stay in use.
+    """
+    def __init__(self, path: Path, check_interval: float = 5.0):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self._rules = load_rules(self.path)
+        self._next_check = time.monotonic() + check_interval
+
+    def current(self) -> ScoringRules:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self.reload_if_changed()
+        return self._rules
+
+    def reload_if_changed(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            logger.error(f"Cannot read scoring rules {self.path}: {e}")
+            return False
+        if mtime == self._mtime:
+            return False
+
+        self._mtime = mtime
+        try:
+            rules = load_rules(self.path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Keeping scoring rules {self._rules.version}, {self.path} failed to compile: {e}")
+            return False
+
+        self._rules = rules
+        logger.info(f"Loaded scoring rules {rules.version} from {self.path}")
+        return True
+
+
+scoring_rules = RuleSet(Path(settings.SCORING_RULES_PATH or DEFAULT_RULES_PATH), settings.SCORING_RULES_CHECK_SECONDS)
+
+
+def current_rules() -> ScoringRules:
+    return scoring_rules.current()
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import DuplicateKeyError
+from src.leads.service import LeadService, SCORING_PROJECTION
+from src.leads.rules import ScoringRules, current_rules
+from src.logger_config import get_logger
+from src.pagination import encode_cursor, cursor_filter
+
+logger = get_logger(__name__)
+
+
+STATE_COLLECTION = "scheduler_state"
+STATE_ID = "recency_rescore"
+
+# Keyset order used to walk each boundary window, backed by the (last_interaction_at, _id) index
+WINDOW_SORT = [("last_interaction_at", 1), ("_id", 1)]
+
+
+def recency_boundaries(rules: ScoringRules) -> List[timedelta]:
+    """Ages at which recency points change, one day past each band of whole days"""
+    return [timedelta(days=upper + 1) for upper in rules.recency_days.uppers]
+
+
+def boundary_windows(window_start: Optional[datetime], window_end: datetime, boundaries: List[timedelta]) -> List[Dict[str, Any]]:
+    """
+    Filters matching the leads whose recency bucket changed between two runs
+
+    A lead crosses boundary b in (start, end] when its last interaction falls in (start - b, end - b].
+    The very first run has no start, so it rescores every lead older than the first boundary once.
+    """
+    if window_start is None:
+        return [{"last_interaction_at": {"$lte": window_end - boundaries[0]}}] if boundaries else []
+    return [
+        {"last_interaction_at": {"$gt": window_start - boundary, "$lte": window_end - boundary}}
+        for boundary in boundaries
+    ]
+
+
+class RecencyRescoreScheduler:
+    """
+    Periodically rescore leads whose recency points decayed since the previous run
+
+    Progress is checkpointed in the scheduler_state collection after every batch, so a restarted
+    worker resumes the interrupted window. A lease on the same document keeps several uvicorn
+    workers from running the job at once.
+    """
+    def __init__(
+        self,
+        leads_collection: AsyncIOMotorCollection,
+        interval: float = 3600,
+        batch_size: int = 500,
+    ):
+        self.leads_collection = leads_collection
+        self.state_collection = leads_collection.database.get_collection(STATE_COLLECTION)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_forever(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Recency rescoring failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _acquire_lease(self, now: datetime) -> bool:
+        try:
+            await self.state_collection.update_one(
+                {"_id": STATE_ID, "$or": [
+                    {"lease_until": {"$exists": False}},
+                    {"lease_until": {"$lt": now}},
+                    {"lease_owner": self.owner},
+                ]},
+                {"$set": {"lease_owner": self.owner, "lease_until": now + timedelta(seconds=self.interval)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # the state document exists and another worker holds an unexpired lease
+            return False
+
+    async def run_once(self) -> Optional[Dict[str, int]]:
+        now = datetime.now(timezone.utc)
+        if not await self._acquire_lease(now):
+            return None
+
+        state = await self.state_collection.find_one({"_id": STATE_ID})
+        if state.get("window_end") and not state.get("completed"):
+            # resume the window an earlier run did not finish
+            window_start = state.get("window_start")
+            window_end = state["window_end"].replace(tzinfo=timezone.utc)
+            position = state.get("position", 0)
+            cursor = state.get("cursor")
+        else:
+            window_start = state.get("window_end")
+            window_end = now
+            position = 0
+            cursor = None
+            await self.state_collection.update_one({"_id": STATE_ID}, {"$set": {
+                "window_start": window_start,
+                "window_end": window_end,
+                "position": position,
+                "cursor": cursor,
+                "completed": False,
+            }})
+        if window_start is not None:
+            window_start = window_start.replace(tzinfo=timezone.utc)
+
+        scanned = 0
+        modified = 0
+        windows = boundary_windows(window_start, window_end, recency_boundaries(current_rules()))
+        while position < len(windows):
+            while True:
+                query = {"$and": [windows[position], cursor_filter(WINDOW_SORT, cursor)]}
+                leads = await self.leads_collection.find(query, {**SCORING_PROJECTION, "last_interaction_at": 1}) \
+                    .sort(WINDOW_SORT).limit(self.batch_size).to_list(length=self.batch_size)
+                if not leads:
+                    break
+
+                modified += await LeadService.rescore_batch(self.leads_collection, leads, window_end)
+                scanned += len(leads)
+                cursor = encode_cursor(leads[-1], WINDOW_SORT)
+                await self._checkpoint(position, cursor)
+
+            position += 1
+            cursor = None
+            await self._checkpoint(position, cursor)
+
+        await self.state_collection.update_one({"_id": STATE_ID}, {"$set": {"completed": True}})
+        logger.info(f"Recency rescoring up to {window_end.isoformat()}: {scanned} scanned, {modified} modified")
+        return {"scanned": scanned, "modified": modified}
+
+    async def _checkpoint(self, position: int, cursor: Optional[str]):
+        await self.state_collection.update_one(
+            {"_id": STATE_ID},
+            {"$set": {
+                "position": position,
+                "cursor": cursor,
+                "lease_until": datetime.now(timezone.utc) + timedelta(seconds=self.interval),
+            }}
+        )
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict, field_serializer
 from enum import Enum
-from typing import Optional, Literal, List
+from typing import Optional, Literal, List, Any
 from datetime import datetime
 from src.models import PyObjectId
 from bson.objectid import ObjectId
@@ -24,6 +24,32 @@ class LeadStatus(str, Enum):
     CLOSED_WON = "closed_won" 
     CLOSED_LOST = "closed_lost"
 
+# Define leads list sort orders
+class LeadSort(str, Enum):
+    ID = "_id"
+    UPDATED_AT = "updated_at"
+    UPDATED_AT_DESC = "-updated_at"
+    CREATED_AT = "created_at"
+    CREATED_AT_DESC = "-created_at"
+    SCORE = "score"
+    SCORE_DESC = "-score"
+
+# Define lead response field sets
+class LeadView(str, Enum):
+    FULL = "full"
+    TABLE = "table"
+
+# Define leads list total count modes
+class LeadCountMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    NONE = "none"
+
+# Define write consistency modes, async writes return before the lead is rescored
+class LeadConsistency(str, Enum):
+    SYNC = "sync"
+    ASYNC = "async"
+
 # Define interaction model
 class Interaction(BaseModel):
     date: datetime = Field(...)
@@ -114,6 +140,7 @@ class LeadUpdateSchema(BaseModel):
     phone: Optional[str] = None
     source: Optional[LeadSource] = None
     status: Optional[LeadStatus] = None
+    version: Optional[int] = Field(None, description="Version of the lead this update is based on; if the lead changed since, the update is rejected with 409.")
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -135,6 +162,44 @@ class LeadUpdateSchema(BaseModel):
         }
     )
 
+# Define company autocomplete suggestion schema
+class CompanySuggestion(BaseModel):
+    company: str
+    count: int = Field(..., description="Number of leads at the company")
+
+# Define bulk ingest row error schema
+class LeadBulkRowError(BaseModel):
+    row: int = Field(..., description="1-based row number in the upload, excluding any CSV header")
+    errors: List[Any] = Field(..., description="Validation or write errors for the row")
+
+# Define bulk ingest result schema
+class LeadBulkResultSchema(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[LeadBulkRowError] = Field(default_factory=list)
+    errors_truncated: bool = False
+
+# Define list facet value count schema
+class FacetCount(BaseModel):
+    value: Optional[str] = Field(None, description="Field value, null for leads without one")
+    count: int
+
+# Define lead stats breakdown entry schema
+class LeadStatsBucket(BaseModel):
+    value: Optional[str] = Field(None, description="Category, status or source, null for leads without one")
+    count: int
+    average_score: float
+
+# Define lead stats schema
+class LeadStatsSchema(BaseModel):
+    total: int
+    average_score: float
+    by_category: List[LeadStatsBucket]
+    by_status: List[LeadStatsBucket]
+    by_source: List[LeadStatsBucket]
+
 # # Define Lead list model
 # class LeadListSchema(BaseModel):
 #     leads: List[LeadInDB]
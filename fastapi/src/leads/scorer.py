@@ -1,15 +1,74 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timezone
-from src.leads.schemas import Interaction
-from fastapi.security import OAuth2PasswordBearer
+import numpy as np
+from src.leads.interactions import as_utc
+from src.leads.rules import ScoringRules, Bands, current_rules
+from src.monitoring.metrics import lead_scoring_duration_seconds, timed
+
+# Column codes used by the batch scoring path, status and source codes come from the rule set
+UNKNOWN_CODE = -1
+
+TITLE_NONE = 0
+TITLE_OTHER = 1
+TITLE_MATCH = 2
+
+_ONE_DAY = np.timedelta64(1, "D")
+
+
+def _status_points(status: str, rules: ScoringRules) -> float:
+    return rules.status_points.get(status.lower(), rules.status_default)
+
+def _company_size_points(size: int, rules: ScoringRules) -> float:
+    if not size:
+        return rules.company_size.none
+    return rules.company_size.points_for(size)
+
+def _interaction_points(interaction_count: int, rules: ScoringRules) -> float:
+    if not interaction_count:
+        return rules.interactions.none
+    return rules.interactions.points_for(interaction_count)
+
+def _title_code(title: Optional[str], rules: ScoringRules) -> int:
+    if not title:
+        return TITLE_NONE
+    if rules.title_pattern and rules.title_pattern.search(title.lower()):
+        return TITLE_MATCH
+    return TITLE_OTHER
+
+def _source_points(source: str, rules: ScoringRules) -> float:
+    return rules.source_points.get(source.lower(), rules.source_default)
+
+def _recency_points(most_recent: Optional[datetime], now: datetime, rules: ScoringRules) -> float:
+    if most_recent is None:
+        return rules.recency_days.none
+    return rules.recency_days.points_for((now - most_recent).days)
+
+def _interaction_summary(lead: Dict[str, Any]) -> Tuple[int, Optional[datetime]]:
+    """Interaction count and newest interaction date, read from the summary fields when the lead has them"""
+    if "interaction_count" in lead:
+        return lead["interaction_count"] or 0, as_utc(lead.get("last_interaction_at"))
+
+    # leads whose history has not been moved to buckets yet carry every interaction inline
+    interactions = lead.get('interactions', [])
+    if not interactions:
+        return 0, None
+    return len(interactions), max(as_utc(interaction['date']) for interaction in interactions)
+
 
 class LeadScorer:
+    """
+    Score leads with the rule set loaded from the scoring rules file
+
+    Every method takes an optional `rules`; callers that score in several steps should take
+    one snapshot with current_rules() and pass it along, so a reload cannot land in between.
+    """
     @staticmethod
-    def calculate_score(lead: Dict[str, Any]) -> float:
+    @timed(lead_scoring_duration_seconds, "single")
+    def calculate_score(lead: Dict[str, Any], now: Optional[datetime] = None, rules: Optional[ScoringRules] = None) -> float:
         """
         calculate lead score based on different factors
-        
-        Legend:
+
+        Legend, with the default rules:
         - Lead Status (0-30 points)
         - Company Size (0-25 points)
         - Interaction Frequency (0-20 points)
@@ -17,131 +76,207 @@ class LeadScorer:
         - Source Quality (0-5 points)
         - Recency of Interaction (0-5 points)
         """
-        
-        # lead status score
-        def lead_status_score(status: str) -> float:
-            status_ranking = {
-                "new": 5,
-                "contacted": 10,
-                "qualified": 20,
-                "negotiation": 25,
-                "closed_won": 30,
-                "close_lost": 0
-            }
-            return status_ranking.get(status.lower(), 0)
-        
-        # company size score
-        def company_size_score(size: int) -> float:
-            if not size:
-                return 0
-            if size <= 50:
-                return 5
-            elif size <= 500:
-                return 15
-            else:
-                return 25
-        
-        # interaction frequency score
-        def interaction_score(interactions: list) -> float:
-            if not interactions:
-                return 0
-            
-            interaction_count = len(interactions)
-            if interaction_count == 1:
-                return 10
-            elif interaction_count <= 3:
-                return 15
-            elif interaction_count <= 5:
-                return 18
-            else:
-                return 20
-        
-        # job title relevance score
-        def job_title_score(title: str) -> float:
-            if not title:
-                return 0
-            
-            keywords = [
-                'director', 'vp', 'ceo', 'cto', 'founder', 
-                'head of', 'president', 'chief'
-            ]
-            
-            title_lower = title.lower()
-            for keyword in keywords:
-                if keyword in title_lower:
-                    return 15
-            
-            return 10
-        
-        # source quality score
-        def source_score(source: str) -> float:
-            source_ranking = {
-                "referral": 5,
-                "conference": 4,
-                "linkedin": 3,
-                "website": 2,
-                "cold_email": 1
-            }
-            return source_ranking.get(source.lower(), 1)
-        
-        # recency score
-        def recency_score(interactions: Interaction) -> float:
-            if not interactions:
-                return 0
-            
-            # map through interactions and convert all date objects to utc timezone
-            for interaction in interactions:
-                interaction['date'] = interaction['date'].astimezone(timezone.utc)
-            
-            # sort interactions by date (most recent first)
-            sorted_interactions = sorted(
-                interactions, 
-                key=lambda x: x.get('date', datetime.min.replace(tzinfo=timezone.utc)).astimezone(timezone.utc) if x.get('date') and x.get('date').tzinfo else x.get('date', datetime.min.replace(tzinfo=timezone.utc)), 
-                reverse=True
-            )
-            
-            # check how recent the most recent interaction is
-            now = datetime.now(timezone.utc)
-            most_recent = sorted_interactions[0].get('date')
-            if isinstance(most_recent, str):
-                most_recent = datetime.fromisoformat(most_recent)
-            # harmonize datetime objects
-            if most_recent.tzinfo is not None:
-                most_recent = most_recent.astimezone(timezone.utc)
-                now = datetime.now(timezone.utc)
-            days_since_interaction = (now - most_recent).days
-            
-            if days_since_interaction <= 7:
-                return 5
-            elif days_since_interaction <= 30:
-                return 3
-            elif days_since_interaction <= 90:
-                return 1
-            else:
-                return 0
-        
+        rules = rules or current_rules()
+        now = now or datetime.now(timezone.utc)
+        interaction_count, most_recent = _interaction_summary(lead)
+
         # total score calculation
         total_score = (
-            lead_status_score(lead.get('status', 'new')) +
-            company_size_score(lead.get('company_size', 0)) +
-            interaction_score(lead.get('interactions', [])) +
-            job_title_score(lead.get('job_title', '')) +
-            source_score(lead.get('source', 'cold_email')) +
-            recency_score(lead.get('interactions', []))
+            _status_points(lead.get('status', 'new'), rules) +
+            _company_size_points(lead.get('company_size', 0), rules) +
+            _interaction_points(interaction_count, rules) +
+            rules.title_points[_title_code(lead.get('job_title', ''), rules)] +
+            _source_points(lead.get('source', 'cold_email'), rules) +
+            _recency_points(most_recent, now, rules)
         )
-        
-        return min(max(total_score, 0), 100)
-    
+
+        return min(max(total_score, 0), rules.max_score)
+
     @staticmethod
-    def categorize_lead(score: float) -> str:
+    def categorize_lead(score: float, rules: Optional[ScoringRules] = None) -> str:
         """
         Categorize lead based on score
         """
-        if score < 20:
-            return 'Cold'
-        elif score < 50:
-            return 'Warm'
-        elif score < 80:
-            return 'Hot'
+        rules = rules or current_rules()
+        for upper, category in rules.categories:
+            if score < upper:
+                return category
+        return rules.top_category
+
+    @staticmethod
+    def to_columns(leads: List[Dict[str, Any]], rules: Optional[ScoringRules] = None) -> Dict[str, np.ndarray]:
+        """
+        Encode lead documents into the columnar arrays taken by calculate_scores_batch
+
+        Status and source codes are only meaningful to the same `rules` the batch is scored with.
+        """
+        rules = rules or current_rules()
+        count = len(leads)
+        status_codes = np.empty(count, dtype=np.int16)
+        company_sizes = np.empty(count, dtype=np.int64)
+        interaction_counts = np.empty(count, dtype=np.int64)
+        last_interaction_at = np.empty(count, dtype="datetime64[us]")
+        title_matches = np.empty(count, dtype=np.int8)
+        source_codes = np.empty(count, dtype=np.int16)
+
+        for i, lead in enumerate(leads):
+            interaction_count, most_recent = _interaction_summary(lead)
+
+            status_codes[i] = rules.status_codes.get(lead.get('status', 'new').lower(), UNKNOWN_CODE)
+            company_sizes[i] = lead.get('company_size', 0) or 0
+            interaction_counts[i] = interaction_count
+            last_interaction_at[i] = (
+                np.datetime64(most_recent.replace(tzinfo=None), "us") if most_recent else np.datetime64("NaT")
+            )
+            title_matches[i] = _title_code(lead.get('job_title', ''), rules)
+            source_codes[i] = rules.source_codes.get(lead.get('source', 'cold_email').lower(), UNKNOWN_CODE)
+
+        return {
+            "status_codes": status_codes,
+            "company_sizes": company_sizes,
+            "interaction_counts": interaction_counts,
+            "last_interaction_at": last_interaction_at,
+            "title_matches": title_matches,
+            "source_codes": source_codes,
+        }
+
+    @staticmethod
+    @timed(lead_scoring_duration_seconds, "batch")
+    def calculate_scores_batch(
+        status_codes: np.ndarray,
+        company_sizes: np.ndarray,
+        interaction_counts: np.ndarray,
+        last_interaction_at: np.ndarray,
+        title_matches: np.ndarray,
+        source_codes: np.ndarray,
+        now: Optional[datetime] = None,
+        rules: Optional[ScoringRules] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score many leads in one vectorized pass
+
+        Takes parallel arrays, one entry per lead:
+        - status_codes: rules.status_codes values, UNKNOWN_CODE for anything else
+        - company_sizes: employee counts, 0 when unknown
+        - interaction_counts: number of interactions
+        - last_interaction_at: UTC datetime64 of the newest interaction, NaT when none
+        - title_matches: TITLE_NONE, TITLE_OTHER or TITLE_MATCH
+        - source_codes: rules.source_codes values, UNKNOWN_CODE for anything else
+
+        Returns the scores and categories, matching calculate_score and categorize_lead.
+        """
+        rules = rules or current_rules()
+        now = now or datetime.now(timezone.utc)
+        now64 = np.datetime64(now.astimezone(timezone.utc).replace(tzinfo=None), "us")
+
+        company_sizes = np.asarray(company_sizes)
+        interaction_counts = np.asarray(interaction_counts)
+        last_interaction_at = np.asarray(last_interaction_at, dtype="datetime64[us]")
+
+        size_points = np.where(company_sizes == 0, rules.company_size.none, rules.company_size.points_batch(company_sizes))
+        interaction_points = np.where(
+            interaction_counts == 0, rules.interactions.none, rules.interactions.points_batch(interaction_counts)
+        )
+
+        has_interaction = ~np.isnat(last_interaction_at)
+        elapsed = np.where(has_interaction, now64 - last_interaction_at, np.timedelta64(0, "us"))
+        days_since_interaction = elapsed // _ONE_DAY
+        recency_points = np.where(
+            has_interaction, rules.recency_days.points_batch(days_since_interaction), rules.recency_days.none
+        )
+
+        total_scores = (
+            rules.status_lookup[np.asarray(status_codes)] +
+            size_points +
+            interaction_points +
+            rules.title_lookup[np.asarray(title_matches)] +
+            rules.source_lookup[np.asarray(source_codes)] +
+            recency_points
+        )
+        scores = np.clip(total_scores, 0, rules.max_score)
+
+        categories = np.select(
+            [scores < upper for upper, _ in rules.categories],
+            [category for _, category in rules.categories],
+            default=rules.top_category,
+        ).astype(object)
+
+        return scores, categories
+
+    @staticmethod
+    def score_expression(now: datetime, rules: Optional[ScoringRules] = None) -> Dict[str, Any]:
+        """
+        Compile calculate_score into a MongoDB aggregation expression over the stored lead fields
+
+        Lets pipeline updates recompute the score on the server in the same operation that changes
+        the lead. MongoDB dates only keep milliseconds, so compare against a `now` truncated
+        to the millisecond when checking parity with calculate_score.
+        """
+        rules = rules or current_rules()
+
+        def lookup(value: Any, table: Dict[str, float], default: float) -> Dict[str, Any]:
+            return {"$switch": {
+                "branches": [{"case": {"$eq": [value, key]}, "then": points} for key, points in table.items()],
+                "default": default,
+            }}
+
+        def bands(value: Any, table: Bands, measured: Any) -> Dict[str, Any]:
+            return {"$cond": [
+                measured,
+                {"$switch": {
+                    "branches": [{"case": {"$lte": [value, upper]}, "then": points} for upper, points in zip(table.uppers, table.points)],
+                    "default": table.default,
+                }},
+                table.none,
+            ]}
+
+        company_size = {"$ifNull": ["$company_size", 0]}
+        # bucketed leads carry summary fields, legacy leads still embed every interaction
+        interaction_count = {"$ifNull": ["$interaction_count", {"$size": {"$ifNull": ["$interactions", []]}}]}
+        last_interaction_at = {"$ifNull": ["$last_interaction_at", {"$max": "$interactions.date"}]}
+        days_since_interaction = {"$floor": {"$divide": [{"$subtract": [now, last_interaction_at]}, 86400000]}}
+        job_title = {"$ifNull": ["$job_title", ""]}
+
+        if rules.title_pattern:
+            title_match = {"$cond": [
+                {"$regexMatch": {"input": {"$toLower": job_title}, "regex": rules.title_pattern.pattern}},
+                rules.title_points[TITLE_MATCH],
+                rules.title_points[TITLE_OTHER],
+            ]}
         else:
-            return 'Premium'
+            title_match = rules.title_points[TITLE_OTHER]
+
+        total_score = {"$add": [
+            lookup({"$toLower": {"$ifNull": ["$status", "new"]}}, rules.status_points, rules.status_default),
+            bands(company_size, rules.company_size, {"$ne": [company_size, 0]}),
+            bands(interaction_count, rules.interactions, {"$ne": [interaction_count, 0]}),
+            {"$cond": [{"$eq": [job_title, ""]}, rules.title_points[TITLE_NONE], title_match]},
+            lookup({"$toLower": {"$ifNull": ["$source", "cold_email"]}}, rules.source_points, rules.source_default),
+            bands(days_since_interaction, rules.recency_days, {"$ne": [{"$ifNull": [last_interaction_at, None]}, None]}),
+        ]}
+        return {"$min": [{"$max": [total_score, 0]}, rules.max_score]}
+
+    @staticmethod
+    def category_expression(score: Any = "$score", rules: Optional[ScoringRules] = None) -> Dict[str, Any]:
+        """Compile categorize_lead into an aggregation expression"""
+        rules = rules or current_rules()
+        return {"$switch": {
+            "branches": [{"case": {"$lt": [score, upper]}, "then": category} for upper, category in rules.categories],
+            "default": rules.top_category,
+        }}
+
+    @staticmethod
+    def scoring_stages(now: Optional[datetime] = None, rules: Optional[ScoringRules] = None) -> List[Dict[str, Any]]:
+        """Pipeline update stages that recompute score and category from the updated document"""
+        rules = rules or current_rules()
+        now = now or datetime.now(timezone.utc)
+        return [
+            {"$set": {"score": LeadScorer.score_expression(now, rules), "score_version": {"$literal": rules.version}}},
+            {"$set": {"category": LeadScorer.category_expression("$score", rules)}},
+        ]
+
+
+def score_leads(leads: List[Dict[str, Any]], now: datetime, rules: ScoringRules) -> List[Tuple[float, str]]:
+    """(score, category) of every lead, the batch scorer as a process pool task"""
+    scores, categories = LeadScorer.calculate_scores_batch(**LeadScorer.to_columns(leads, rules), now=now, rules=rules)
+    return list(zip(scores.tolist(), categories.tolist()))
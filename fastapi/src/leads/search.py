@@ -0,0 +1,99 @@
+import re
+import unicodedata
+from typing import Any, Dict, List
+
+# Lead fields indexed for search, with the tag each field's keys are stored under
+SEARCH_FIELDS = {
+    "first_name": "fn",
+    "last_name": "ln",
+    "company": "co",
+    "job_title": "jt",
+}
+
+# Relevance points for a query term matching in each field
+FIELD_WEIGHTS = {
+    "fn": 3,
+    "ln": 3,
+    "co": 2,
+    "jt": 1,
+}
+
+# Longer query terms are truncated to this length, matching the longest stored prefix
+MAX_PREFIX_LENGTH = 20
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Condition no lead satisfies, for filter values without a single word to search for
+MATCH_NOTHING = {"_id": {"$in": []}}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip accents and split text into word tokens"""
+    if not text:
+        return []
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _TOKEN_PATTERN.findall(stripped)
+
+
+def field_keys(field: str, value: str) -> List[str]:
+    """
+    Build the search keys of one field
+
+    Each token is stored as all of its prefixes, tagged with the field,
+    so "Jane" in first_name becomes "fn:j", "fn:ja", "fn:jan" and "fn:jane".
+    """
+    tag = SEARCH_FIELDS[field]
+    keys = set()
+    for token in tokenize(value or ""):
+        for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+            keys.add(f"{tag}:{token[:length]}")
+    return sorted(keys)
+
+
+def build_search_keys(lead: Dict[str, Any]) -> List[str]:
+    """Build the indexed search keys of a lead"""
+    return sorted(key for field in SEARCH_FIELDS for key in field_keys(field, lead.get(field)))
+
+
+def replace_keys_expression(changes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aggregation expression swapping the stored keys of the changed fields for freshly built ones
+
+    Lets a pipeline update keep search_keys current without reading the rest of the lead first.
+    """
+    changed_tags = [f"{SEARCH_FIELDS[field]}:" for field in changes if field in SEARCH_FIELDS]
+    return {"$concatArrays": [
+        {"$filter": {
+            "input": {"$ifNull": ["$search_keys", []]},
+            "cond": {"$not": [{"$in": [{"$substrCP": ["$$this", 0, 3]}, changed_tags]}]},
+        }},
+        {"$literal": [key for field, value in changes.items() if field in SEARCH_FIELDS for key in field_keys(field, value)]},
+    ]}
+
+
+def query_terms(text: str) -> List[str]:
+    return [token[:MAX_PREFIX_LENGTH] for token in tokenize(text)]
+
+
+def field_filter(field: str, value: str) -> List[Dict[str, Any]]:
+    """Match leads where every term of `value` prefixes a token of `field`, and none if it has no terms"""
+    tag = SEARCH_FIELDS[field]
+    return [{"search_keys": f"{tag}:{term}"} for term in query_terms(value)] or [MATCH_NOTHING]
+
+
+def search_filter(text: str) -> List[Dict[str, Any]]:
+    """Match leads where every term of `text` prefixes a token of any searchable field, and none if it has no terms"""
+    return [
+        {"search_keys": {"$in": [f"{tag}:{term}" for tag in FIELD_WEIGHTS]}}
+        for term in query_terms(text)
+    ] or [MATCH_NOTHING]
+
+
+def relevance_expression(text: str) -> Dict[str, Any]:
+    """Aggregation expression summing the field weights of every matched query term"""
+    return {"$add": [
+        {"$cond": [{"$in": [f"{tag}:{term}", {"$ifNull": ["$search_keys", []]}]}, weight, 0]}
+        for term in query_terms(text)
+        for tag, weight in FIELD_WEIGHTS.items()
+    ]}
@@ -1,66 +1,252 @@
 from fastapi import HTTPException, status
 from motor.motor_asyncio import AsyncIOMotorCollection
-from src.leads.schemas import LeadCreateSchema, LeadUpdateSchema, LeadStatus, LeadSource, Interaction
+from src.leads.schemas import LeadCreateSchema, LeadUpdateSchema, LeadStatus, LeadSource, LeadSort, LeadCountMode, LeadConsistency, Interaction
+from src.leads.ingest import ParsedRow, validate_rows
 from src.leads.models import LeadModel, LeadListSchema
-from typing import Optional
+from typing import Optional, List, Iterable
 from src.models import PyObjectId
 from src.leads.exceptions import LeadAlreadyExistsException
-from src.leads.scorer import LeadScorer
-from pymongo.errors import DuplicateKeyError
-from datetime import datetime
+from src.leads.scorer import LeadScorer, score_leads
+from src.leads.rules import current_rules
+from src.leads.search import build_search_keys, replace_keys_expression, field_filter, search_filter, relevance_expression, query_terms, SEARCH_FIELDS
+from src.leads.fields import lead_projection
+from src.leads.stats import snapshot_stage, pipeline_transition, record_transitions, read_stats
+from src.leads.rescoring import rescore_queue
+from src.leads.interactions import is_bucketed, summary_fields, append_update, append_stage, merge_stage, record_interactions, list_interactions
+from src.pagination import ID_SORT, cursor_filter, next_cursor
+from src.cache import TTLCache, ReadThroughCache, cache_backend
+from src.markers import bump_marker
+from src.etags import ETAG_FIELDS
+from src.offload import process_pool
+from src.config import settings
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+import asyncio
+from datetime import datetime, timezone
+
+# Keyset sort orders for lead listings, each backed by a compound index created in DatabaseManager
+LEAD_SORTS = {
+    LeadSort.ID: ID_SORT,
+    LeadSort.UPDATED_AT: [("updated_at", 1), ("_id", 1)],
+    LeadSort.UPDATED_AT_DESC: [("updated_at", -1), ("_id", -1)],
+    LeadSort.CREATED_AT: [("created_at", 1), ("_id", 1)],
+    LeadSort.CREATED_AT_DESC: [("created_at", -1), ("_id", -1)],
+    LeadSort.SCORE: [("score", 1), ("_id", 1)],
+    LeadSort.SCORE_DESC: [("score", -1), ("_id", -1)],
+}
+
+# Order of the top leads leaderboard, walked straight off the (filter..., score desc, _id desc) indexes
+TOP_SORT = [("score", -1), ("_id", -1)]
+
+# Default order of full-text style `q` searches, best match first
+RELEVANCE_SORT = [("_relevance", -1), ("_id", 1)]
+
+# Filtered lead counts keyed by normalized query, cleared by every write that can change a filtered field
+lead_count_cache = TTLCache(ttl=settings.LEAD_COUNT_CACHE_TTL, max_entries=settings.LEAD_COUNT_CACHE_MAX_ENTRIES)
+
+# Lead documents by id, read through by get_lead_by_id and invalidated by every lead write
+lead_cache = ReadThroughCache("leads", cache_backend(settings.DETAIL_CACHE_BACKEND))
+
+# Fields read by the scorer, used to keep rescoring reads small, plus the version rescores are guarded by
+SCORING_PROJECTION = {
+    "status": 1,
+    "company_size": 1,
+    "interactions": 1,
+    "interaction_count": 1,
+    "last_interaction_at": 1,
+    "job_title": 1,
+    "source": 1,
+    "score": 1,
+    "category": 1,
+    "score_version": 1,
+    "version": 1,
+}
+
+# Pipeline expression bumping the optimistic concurrency version of a lead on every change to its data
+NEXT_VERSION = {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+
+
+def defer_scoring(consistency: LeadConsistency) -> bool:
+    """Whether a write leaves scoring to the rescore queue"""
+    # without a running queue, as in CLI jobs, async writes score inline like sync ones
+    return consistency == LeadConsistency.ASYNC and rescore_queue.running
+
+
+def facet_stages(field: str) -> List[dict]:
+    """$facet sub-pipeline counting the leads per value of `field`, most common first"""
+    return [
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+    ]
+
 
 # Define business logic for LeadService
 class LeadService:
     @staticmethod
     async def create_lead(
         leads_collection: AsyncIOMotorCollection,
-        lead: LeadCreateSchema
+        lead: LeadCreateSchema,
+        consistency: LeadConsistency = LeadConsistency.SYNC,
     ):
         lead_dict = lead.model_dump(exclude="id", exclude_unset=True)
+        deferred = defer_scoring(consistency)
+        new_interactions = lead_dict.pop("interactions", None)
 
         now = datetime.now()
         lead_dict["updated_at"] = now
-    
-        try:
-            existing_lead = await leads_collection.find_one({"$or": [
-                {"email": lead.email},
-                {"phone": lead.phone}
-            ]})
-    
-            if existing_lead:
-                # merge existing lead data with updat data to calculate the lead score and category
-                lead_for_scoring = {**existing_lead, **lead_dict}
-                # print(f"lead for scoring create {lead_for_scoring}")
-                # print(f"existing lead {existing_lead}")
-                # print(f"update lead {lead_dict}")   
-                score = LeadScorer.calculate_score(lead_for_scoring)
-                lead_dict["score"] = score
-                lead_dict["category"] = LeadScorer.categorize_lead(score)
-                
-                # Update lead if already existing for data integrity reasons
+
+        # an existing lead with the same email, or the same phone when one is given, is updated for data integrity reasons
+        match = [{"email": lead.email}]
+        if lead.phone:
+            match.append({"phone": lead.phone})
+
+        # create or merge, rescore and reindex in one conditional upsert
+        pipeline = [
+            snapshot_stage(),
+            merge_stage(new_interactions),
+            {"$set": {
+                **{field: {"$literal": value} for field, value in lead_dict.items()},
+                "created_at": {"$ifNull": ["$created_at", now]},
+                "version": NEXT_VERSION,
+            }},
+            {"$set": {"search_keys": replace_keys_expression(lead_dict)}},
+            *([] if deferred else LeadScorer.scoring_stages()),
+        ]
+
+        for attempt in range(2):
+            try:
                 result = await leads_collection.find_one_and_update(
-                    {"_id": existing_lead["_id"]},
-                    {"$set": lead_dict},
+                    {"$or": match},
+                    pipeline,
+                    upsert=True,
                     return_document=True
                 )
-                updated_lead = LeadModel(**result)
-                updated_lead.id = result["_id"]
-                return updated_lead
-            else:
-                # Create a new lead
-                lead_dict["created_at"] = now
-                score = LeadScorer.calculate_score(lead_dict)
-                lead_dict["score"] = score
-                lead_dict["category"] = LeadScorer.categorize_lead(score)
-
-
-                result = await leads_collection.insert_one(lead_dict)
-                lead_dict["id"] = result.inserted_id
-                return LeadModel(**lead_dict)
-        except DuplicateKeyError as e:
-            raise LeadAlreadyExistsException(f"Lead with email {lead.email} already exists")
+                break
+            except DuplicateKeyError:
+                # a concurrent create inserted the same contact first, so the retry merges into it
+                if attempt:
+                    raise LeadAlreadyExistsException(f"Lead with email {lead.email} already exists")
+
+        if new_interactions and is_bucketed(result):
+            await record_interactions(leads_collection, {result["_id"]: new_interactions})
+        await record_transitions(leads_collection, [pipeline_transition(result)])
+        await LeadService.leads_changed(leads_collection, [result["_id"]])
+        if deferred:
+            await rescore_queue.enqueue([result["_id"]])
+        return LeadModel(**result)
         
     
+    @staticmethod
+    async def bulk_upsert_leads(
+        leads_collection: AsyncIOMotorCollection,
+        rows: List[ParsedRow],
+        consistency: LeadConsistency = LeadConsistency.SYNC,
+    ):
+        """Validate, score and upsert one chunk of uploaded rows with a single bulk_write"""
+        validated = await process_pool.map_chunks(validate_rows, rows)
+        errors = [(row_number, row_errors) for row_number, _, row_errors in validated if row_errors is not None]
+        valid_rows = [(row_number, lead_dict) for row_number, lead_dict, row_errors in validated if row_errors is None]
+
+        result = {"received": len(rows), "inserted": 0, "updated": 0, "errors": errors}
+        if not valid_rows:
+            return result
+
+        # fetch the existing leads for the whole chunk in one round trip so rows merge like create_lead
+        emails = [lead_dict["email"] for _, lead_dict in valid_rows]
+        phones = [lead_dict["phone"] for _, lead_dict in valid_rows if lead_dict.get("phone")]
+        existing_by_email = {}
+        existing_by_phone = {}
+        async for existing_lead in leads_collection.find({"$or": [
+            {"email": {"$in": emails}},
+            {"phone": {"$in": phones}}
+        ]}):
+            existing_by_email[existing_lead.get("email")] = existing_lead
+            if existing_lead.get("phone"):
+                existing_by_phone[existing_lead["phone"]] = existing_lead
+
+        now = datetime.now()
+        existing_leads = []
+        leads_for_scoring = []
+        row_interactions = []
+        for _, lead_dict in valid_rows:
+            lead_dict["updated_at"] = now
+            existing_lead = existing_by_email.get(lead_dict["email"]) or existing_by_phone.get(lead_dict.get("phone"))
+            existing_leads.append(existing_lead)
+
+            # interactions go to buckets, except on legacy leads that still embed their full history
+            new_interactions = []
+            if not existing_lead or is_bucketed(existing_lead):
+                new_interactions = lead_dict.pop("interactions", None) or []
+            row_interactions.append(new_interactions)
+
+            if not existing_lead:
+                lead_dict.update(summary_fields(new_interactions))
+                leads_for_scoring.append(lead_dict)
+            else:
+                lead_for_scoring = {**existing_lead, **lead_dict}
+                if new_interactions:
+                    lead_for_scoring.update(summary_fields(new_interactions, existing_lead))
+                leads_for_scoring.append(lead_for_scoring)
+
+        deferred = defer_scoring(consistency)
+        rules = current_rules()
+        if deferred:
+            scored = [None] * len(leads_for_scoring)
+        else:
+            scored = await process_pool.map_chunks(score_leads, leads_for_scoring, datetime.now(timezone.utc), rules)
+
+        operations = []
+        for (_, lead_dict), existing_lead, lead_for_scoring, new_interactions, score in zip(
+            valid_rows, existing_leads, leads_for_scoring, row_interactions, scored
+        ):
+            if score is not None:
+                lead_dict["score"], lead_dict["category"] = score
+                lead_dict["score_version"] = rules.version
+            lead_dict["search_keys"] = build_search_keys(lead_for_scoring)
+            if existing_lead:
+                update = {"$set": lead_dict, **append_update(new_interactions)}
+                update.setdefault("$inc", {})["version"] = 1
+                operations.append(UpdateOne({"_id": existing_lead["_id"]}, update))
+            else:
+                operations.append(UpdateOne(
+                    {"email": lead_dict["email"]},
+                    {"$set": lead_dict, "$setOnInsert": {"created_at": now}, "$inc": {"version": 1}},
+                    upsert=True
+                ))
+
+        try:
+            write_result = (await leads_collection.bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            # unordered writes keep going past failed rows, so report them and count the rest
+            write_result = e.details
+            for write_error in write_result["writeErrors"]:
+                errors.append((valid_rows[write_error["index"]][0], [write_error["errmsg"]]))
+
+        # append the interactions of every row that was written to its lead's buckets
+        failed = {write_error["index"] for write_error in write_result.get("writeErrors", [])}
+        upserted_ids = {upsert["index"]: upsert["_id"] for upsert in write_result.get("upserted", [])}
+        interactions_by_lead = {}
+        transitions = []
+        written_ids = []
+        for index, (existing_lead, new_interactions, (_, lead_dict)) in enumerate(zip(existing_leads, row_interactions, valid_rows)):
+            lead_id = existing_lead["_id"] if existing_lead else upserted_ids.get(index)
+            if index in failed or lead_id is None:
+                continue
+            if new_interactions:
+                interactions_by_lead.setdefault(lead_id, []).extend(new_interactions)
+            transitions.append((existing_lead, {**(existing_lead or {}), **lead_dict}))
+            written_ids.append(lead_id)
+        await record_interactions(leads_collection, interactions_by_lead)
+        await record_transitions(leads_collection, transitions)
+
+        await LeadService.leads_changed(leads_collection, [existing_lead["_id"] for existing_lead in existing_leads if existing_lead])
+        if deferred:
+            await rescore_queue.enqueue(written_ids)
+        result["inserted"] = write_result["nUpserted"]
+        result["updated"] = write_result["nMatched"]
+        return result
+
     @staticmethod
     async def get_leads(
         lead_collection: AsyncIOMotorCollection,
@@ -74,41 +260,256 @@ class LeadService:
         company: Optional[str] = None,
         job_title: Optional[str] = None,
         phone: Optional[str] = None,
+        q: Optional[str] = None,
+        cursor: Optional[str] = None,
+        sort: Optional[LeadSort] = None,
+        count: LeadCountMode = LeadCountMode.ESTIMATE,
+        fields: Optional[List[str]] = None,
+        facets: Optional[List[str]] = None,
     ):
-        
-        # query filters
+        query = LeadService.build_leads_query(
+            first_name=first_name,
+            last_name=last_name,
+            email=email,
+            status=status,
+            source=source,
+            company=company,
+            job_title=job_title,
+            phone=phone,
+            q=q,
+        )
+
+        # searches rank by relevance unless another order is asked for
+        if sort is None:
+            sort_spec = RELEVANCE_SORT if q else ID_SORT
+        else:
+            sort_spec = LEAD_SORTS[sort]
+
+        # a cursor continues after the last lead of the previous page, so skip only applies without one
+        try:
+            after_cursor = cursor_filter(sort_spec, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        # sparse fieldsets still read the sort keys, the next page cursor is built from them
+        projection = lead_projection(fields, keep=[field for field, _ in sort_spec])
+
+        # stages cutting the page out of the matched leads, for the relevance and faceted aggregations
+        page_stages = []
+        if sort_spec is RELEVANCE_SORT:
+            page_stages.append({"$addFields": {"_relevance": relevance_expression(q)}})
+        if after_cursor:
+            page_stages.append({"$match": after_cursor})
+        page_stages.append({"$sort": dict(sort_spec)})
+        if not cursor and skip:
+            page_stages.append({"$skip": skip})
+        page_stages.append({"$limit": limit + 1})
+
+        facet_counts = None
+        if facets:
+            # page, total and value counts in one round trip; only the leading $match can use an index,
+            # the page is sorted in memory from the matched leads. The page holds just its sort keys,
+            # whole leads could push the single $facet result document past the 16MB limit
+            key_projection = {field: 1 for field, _ in sort_spec}
+            facet = {"page": [*page_stages, {"$project": key_projection}], **{field: facet_stages(field) for field in facets}}
+            if count != LeadCountMode.NONE:
+                facet["total"] = [{"$count": "count"}]
+            (result,) = await lead_collection.aggregate([{"$match": query}, {"$facet": facet}]).to_list(length=1)
+            page_keys = result["page"]
+            page_cursor = next_cursor(page_keys, limit, sort_spec)
+            found = {
+                lead["_id"]: lead
+                async for lead in lead_collection.find({"_id": {"$in": [keys["_id"] for keys in page_keys]}}, projection)
+            }
+            # back in page order, skipping leads deleted since the aggregation
+            leads = [found[keys["_id"]] for keys in page_keys if keys["_id"] in found]
+            total_count = None
+            if count != LeadCountMode.NONE:
+                total_count = result["total"][0]["count"] if result["total"] else 0
+            facet_counts = {
+                field: [{"value": bucket["_id"], "count": bucket["count"]} for bucket in result[field]]
+                for field in facets
+            }
+        else:
+            if sort_spec is RELEVANCE_SORT:
+                if projection:
+                    page_stages.append({"$project": projection})
+                leads_cursor = lead_collection.aggregate([{"$match": query}, *page_stages])
+            else:
+                page_query = {"$and": [query, after_cursor]} if after_cursor else query
+                leads_cursor = lead_collection.find(page_query, projection).sort(sort_spec).limit(limit + 1)
+                if not cursor:
+                    leads_cursor = leads_cursor.skip(skip)
+
+            # run the count alongside the page fetch instead of before it
+            leads, total_count = await asyncio.gather(
+                leads_cursor.to_list(length=limit + 1),
+                LeadService.count_leads(lead_collection, query, count),
+            )
+            page_cursor = next_cursor(leads, limit, sort_spec)
+
+        return LeadListSchema.json_from_mongo_cursor(leads, next_cursor=page_cursor, fields=fields, facets=facet_counts), total_count
+    
+    @staticmethod
+    def build_top_query(
+        category: Optional[str] = None,
+        source: Optional[LeadSource] = None,
+        status: Optional[LeadStatus] = None,
+    ) -> dict:
+        """Build the MongoDB filter of the top leads leaderboard"""
+        query = {}
+        if category:
+            query["category"] = category
+        if source:
+            query["source"] = source
+        if status:
+            query["status"] = status
+        return query
+
+    @staticmethod
+    async def get_top_leads(
+        lead_collection: AsyncIOMotorCollection,
+        n: int = 10,
+        category: Optional[str] = None,
+        source: Optional[LeadSource] = None,
+        status: Optional[LeadStatus] = None,
+        fields: Optional[List[str]] = None,
+    ):
+        """Highest scoring leads, read in index order so only `n` leads are ever fetched"""
+        query = LeadService.build_top_query(category=category, source=source, status=status)
+        leads = await lead_collection.find(query, lead_projection(fields)).sort(TOP_SORT).limit(n).to_list(length=n)
+        return LeadListSchema.json_from_mongo_cursor(leads, fields=fields)
+
+    @staticmethod
+    def build_leads_query(
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None,
+        email: Optional[str] = None,
+        status: Optional[LeadStatus] = None,
+        source: Optional[LeadSource] = None,
+        company: Optional[str] = None,
+        job_title: Optional[str] = None,
+        phone: Optional[str] = None,
+        q: Optional[str] = None,
+    ) -> dict:
+        """Build the MongoDB filter for the lead list filters"""
         query = {}
-        if first_name:
-            query["first_name"] = {"$regex": first_name, "$options": "i"}
-        if last_name:
-            query["last_name"] = {"$regex": last_name, "$options": "i"}
         if email:
             query["email"] = email
         if status:
             query["status"] = status
         if source:
             query["source"] = source
-        if company:
-            query["company"] = {"$regex": company, "$options": "i"}
-        if job_title:
-            query["job_title"] = {"$regex": job_title, "$options": "i"}
         if phone:
             query["phone"] = phone
 
-        total_count = await lead_collection.count_documents(query)
-        
-        leads_cursor = lead_collection.find(query).skip(skip).limit(limit)
-        leads = await leads_cursor.to_list(length=limit)
+        # text filters match word prefixes through the indexed search keys
+        search_conditions = []
+        for field, value in (
+            ("first_name", first_name),
+            ("last_name", last_name),
+            ("company", company),
+            ("job_title", job_title),
+        ):
+            if value:
+                search_conditions += field_filter(field, value)
+        if q:
+            search_conditions += search_filter(q)
+        if search_conditions:
+            query["$and"] = search_conditions
+
+        return query
+
+    @staticmethod
+    def export_leads_cursor(
+        lead_collection: AsyncIOMotorCollection,
+        query: dict,
+        projection: dict,
+        batch_size: int = 1000,
+    ):
+        """Open a raw cursor over every matching lead, in _id order, for streaming exports"""
+        return lead_collection.find(query, projection, batch_size=batch_size).sort(ID_SORT)
+
+    @staticmethod
+    async def autocomplete_companies(
+        lead_collection: AsyncIOMotorCollection,
+        prefix: str,
+        limit: int = 10,
+    ):
+        """Suggest company names whose words start with the terms of `prefix`, most common first"""
+        if not query_terms(prefix):
+            return []
+
+        pipeline = [
+            {"$match": {"$and": field_filter("company", prefix)}},
+            {"$group": {"_id": "$company", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": limit},
+        ]
+        return [
+            {"company": suggestion["_id"], "count": suggestion["count"]}
+            async for suggestion in lead_collection.aggregate(pipeline)
+        ]
+
+    @staticmethod
+    async def count_leads(
+        lead_collection: AsyncIOMotorCollection,
+        query: dict,
+        count: LeadCountMode = LeadCountMode.ESTIMATE,
+    ) -> Optional[int]:
+        """
+        Count the leads matching a list query
+
+        - exact: always runs count_documents
+        - estimate: collection metadata when unfiltered, otherwise a count cached for LEAD_COUNT_CACHE_TTL seconds
+        - none: skips counting and returns None
+        """
+        if count == LeadCountMode.NONE:
+            return None
+        if count == LeadCountMode.EXACT:
+            return await lead_collection.count_documents(query)
+        if not query:
+            return await lead_collection.estimated_document_count()
+
+        cache_key = json_util.dumps(query, sort_keys=True)
+        total_count = lead_count_cache.get(cache_key)
+        if total_count is None:
+            total_count = await lead_collection.count_documents(query)
+            lead_count_cache.set(cache_key, total_count)
+        return total_count
+
+    @staticmethod
+    async def leads_changed(leads_collection: AsyncIOMotorCollection, lead_ids: Iterable = ()):
+        """Invalidate derived lead data after a write that may add, remove or re-filter leads"""
+        await bump_marker(leads_collection)
+        await LeadService.invalidate_cached(lead_ids)
+
+    @staticmethod
+    async def invalidate_cached(lead_ids: Iterable = ()):
+        """Drop this worker's cached counts and lead documents, without marking the collection changed"""
+        lead_count_cache.clear()
+        await lead_cache.invalidate(*lead_ids)
+
+    @staticmethod
+    async def get_lead_stats(leads_collection: AsyncIOMotorCollection):
+        """Lead counts and average scores by category, status and source, from the rollup buckets"""
+        return await read_stats(leads_collection)
 
-        return LeadListSchema.from_mongo_cursor(leads), total_count
-    
     @staticmethod
     async def get_lead_by_id(
         leads_collection: AsyncIOMotorCollection,
         lead_id: PyObjectId,
+        fields: Optional[List[str]] = None,
     ):
-        lead = await leads_collection.find_one({"_id": lead_id})
-        
+        if fields is None:
+            lead = await lead_cache.get_or_load(lead_id, lambda: leads_collection.find_one({"_id": lead_id}))
+        else:
+            # a cached full document already holds every field, otherwise read only the requested ones
+            # plus what the ETag is built from, without caching the partial document
+            lead = await lead_cache.peek(lead_id) or await leads_collection.find_one(
+                {"_id": lead_id}, lead_projection(fields, keep=ETAG_FIELDS)
+            )
+
         if not lead:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found")
         
@@ -118,38 +519,49 @@ class LeadService:
     async def update_lead(
         leads_collection: AsyncIOMotorCollection,
         lead_id: PyObjectId,
-        lead_update: LeadUpdateSchema
+        lead_update: LeadUpdateSchema,
+        consistency: LeadConsistency = LeadConsistency.SYNC,
     ):
         lead_data = lead_update.model_dump(exclude_unset=True)
+        expected_version = lead_data.pop("version", None)
 
-        now = datetime.now()
-        lead_data["updated_at"] = now
-        
         if not lead_data:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No update fields provided")
-        
-        existing_lead = await leads_collection.find_one({"_id": lead_id})
-        if not existing_lead:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Lead not found.")
-        
-        # merge existing lead data with updat data to calculate the lead score and category
-        lead_for_scoring = {**existing_lead, **lead_data}
-        # print(f"lead for scoring update {lead_for_scoring}")
-        # print(f"existing lead {existing_lead}")
-        # print(f"update lead {lead_data}")
-        score = LeadScorer.calculate_score(lead_for_scoring)
-        lead_data["score"] = score
-        lead_data["category"] = LeadScorer.categorize_lead(score)
-        
+
+        now = datetime.now()
+        lead_data["updated_at"] = now
+
+        # compare-and-set against the version the client read, leads written before versioning read as 0
+        query = {"_id": lead_id}
+        if expected_version is not None:
+            query["version"] = {"$in": [0, None]} if expected_version == 0 else expected_version
+
+        # apply the changes and rescore from the updated document in one server-side pipeline update
+        pipeline = [snapshot_stage(), {"$set": {
+            **{field: {"$literal": value} for field, value in lead_data.items()},
+            "version": NEXT_VERSION,
+        }}]
+        if SEARCH_FIELDS.keys() & lead_data.keys():
+            pipeline.append({"$set": {"search_keys": replace_keys_expression(lead_data)}})
+        deferred = defer_scoring(consistency)
+        if not deferred:
+            pipeline += LeadScorer.scoring_stages()
+
         result = await leads_collection.find_one_and_update(
-            {"_id": lead_id},
-            {"$set": lead_data},
+            query,
+            pipeline,
             return_document=True
         )
         
         if not result:
+            if expected_version is not None and await leads_collection.find_one({"_id": lead_id}, {"_id": 1}):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Lead was modified by another request, reload it and retry")
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found")
-        
+
+        await record_transitions(leads_collection, [pipeline_transition(result)])
+        await LeadService.leads_changed(leads_collection, [lead_id])
+        if deferred:
+            await rescore_queue.enqueue([lead_id])
         return result
 
     @staticmethod
@@ -161,14 +573,17 @@ class LeadService:
         
         if not result:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found or already deleted")
-        
+
+        await record_transitions(leads_collection, [(result, None)])
+        await LeadService.leads_changed(leads_collection, [lead_id])
         return {"detail": "Lead deleted successfully"}
     
     @staticmethod
     async def add_lead_interaction(
         leads_collection: AsyncIOMotorCollection, 
         lead_id: PyObjectId, 
-        interaction_data: Interaction
+        interaction_data: Interaction,
+        consistency: LeadConsistency = LeadConsistency.SYNC,
     ):
         interaction_dict = interaction_data.model_dump(exclude_unset=True)
 
@@ -177,30 +592,218 @@ class LeadService:
         
         now = datetime.now()
 
-        existing_lead = await leads_collection.find_one({"_id": lead_id})
-        if not existing_lead:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Lead not found.")
-        
-        # merge existing lead data with updat data to calculate the lead score and category
-        # lead_for_scoring = {**existing_lead, **interaction_data}
-        lead_for_scoring = existing_lead.copy()
-        lead_for_scoring["interactions"] = existing_lead.get("interactions", []) + [interaction_dict]
-        # print(f"lead for scoring update {lead_for_scoring}")
-        # print(f"existing lead {existing_lead}")
-        # print(f"update lead {lead_data}")
-        score = LeadScorer.calculate_score(lead_for_scoring)
-        category = LeadScorer.categorize_lead(score)
-
+        # append the interaction and rescore in one pipeline update, so concurrent appends cannot drop each other's score
+        append = append_stage(interaction_dict)
+        append["$set"]["updated_at"] = now
+        append["$set"]["version"] = NEXT_VERSION
+        deferred = defer_scoring(consistency)
         result = await leads_collection.find_one_and_update(
             {"_id": lead_id},
-            {
-                "$push": {"interactions": interaction_dict}, 
-                "$set": {"score": score, "category": category, "updated_at": now}
-            },
+            [snapshot_stage(), append, *([] if deferred else LeadScorer.scoring_stages())],
             return_document=True
         )
 
         if not result:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found")
 
-        return LeadModel(**result)
\ No newline at end of file
+        if is_bucketed(result):
+            await record_interactions(leads_collection, {lead_id: [interaction_dict]})
+        await record_transitions(leads_collection, [pipeline_transition(result)])
+        await LeadService.leads_changed(leads_collection, [lead_id])
+        if deferred:
+            await rescore_queue.enqueue([lead_id])
+        return LeadModel(**result)
+
+    @staticmethod
+    async def get_lead_interactions(
+        leads_collection: AsyncIOMotorCollection,
+        lead_id: PyObjectId,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ):
+        lead = await leads_collection.find_one({"_id": lead_id}, {"interactions": 1, "interaction_count": 1})
+        if not lead:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found")
+
+        # legacy leads still hold their whole history inline
+        if not is_bucketed(lead):
+            interactions = sorted(lead.get("interactions") or [], key=lambda interaction: interaction["date"], reverse=True)
+            offset = int(cursor) if cursor and cursor.isdigit() else 0
+            page = interactions[offset:offset + limit]
+            has_more = offset + limit < len(interactions)
+            return page, str(offset + limit) if has_more else None
+
+        try:
+            return await list_interactions(leads_collection, lead_id, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    @staticmethod
+    async def rescore_leads(
+        leads_collection: AsyncIOMotorCollection,
+        query: Optional[dict] = None,
+        batch_size: int = 1000,
+        stale_only: bool = False,
+    ):
+        """
+        Stream leads through the batch scorer and write back changed scores
+
+        With `stale_only`, only leads scored by an older rule set than the current one are read.
+        """
+        now = datetime.now(timezone.utc)
+        scanned = 0
+        modified = 0
+
+        query = query or {}
+        if stale_only:
+            query = {**query, "score_version": {"$ne": current_rules().version}}
+
+        cursor = leads_collection.find(query, SCORING_PROJECTION, batch_size=batch_size)
+        chunk = []
+        async for lead in cursor:
+            chunk.append(lead)
+            if len(chunk) >= batch_size:
+                modified += await LeadService.rescore_batch(leads_collection, chunk, now)
+                scanned += len(chunk)
+                chunk = []
+
+        if chunk:
+            modified += await LeadService.rescore_batch(leads_collection, chunk, now)
+            scanned += len(chunk)
+
+        return {"scanned": scanned, "modified": modified}
+
+    @staticmethod
+    async def rescore_batch(
+        leads_collection: AsyncIOMotorCollection,
+        leads: list,
+        now: datetime,
+    ):
+        """
+        Score a batch of leads read with SCORING_PROJECTION and write back the ones that changed
+
+        Leads written to since they were read are skipped, their writer scored or queued them already.
+        """
+        modified, _ = await LeadService.write_scores(leads_collection, leads, now)
+        return modified
+
+    @staticmethod
+    async def rescore_queued(
+        leads_collection: AsyncIOMotorCollection,
+        lead_ids: list,
+    ):
+        """Rescore a batch of leads taken off the rescore queue and return the ids to queue again"""
+        leads = await leads_collection.find({"_id": {"$in": lead_ids}}, SCORING_PROJECTION).to_list(length=None)
+        _, moved = await LeadService.write_scores(leads_collection, leads, datetime.now(timezone.utc))
+        return moved
+
+    @staticmethod
+    async def write_scores(
+        leads_collection: AsyncIOMotorCollection,
+        leads: list,
+        now: datetime,
+    ):
+        """
+        Score leads read with SCORING_PROJECTION and write the changed scores in one bulk_write
+
+        A score is only written while the lead still has the version it was scored from, so a batch
+        never overwrites a newer write. Returns the number of leads written and the ids of the
+        leads that were written to in between, left as they are.
+        """
+        rules = current_rules()
+        scored = await process_pool.map_chunks(score_leads, leads, now, rules)
+
+        # only write leads whose score, category or rule set version actually moved
+        changed = [
+            (lead, score, category)
+            for lead, (score, category) in zip(leads, scored)
+            if lead.get("score") != score or lead.get("category") != category or lead.get("score_version") != rules.version
+        ]
+        if not changed:
+            return 0, []
+
+        # leads written before versioning match a missing version as None
+        result = await leads_collection.bulk_write([
+            UpdateOne(
+                {"_id": lead["_id"], "version": lead.get("version")},
+                {"$set": {"score": score, "category": category, "score_version": rules.version}},
+            )
+            for lead, score, category in changed
+        ], ordered=False)
+
+        moved = []
+        if result.matched_count < len(changed):
+            # versions only grow, so a lead whose version moved is one this batch did not write
+            versions = {
+                lead["_id"]: lead.get("version")
+                async for lead in leads_collection.find({"_id": {"$in": [lead["_id"] for lead, _, _ in changed]}}, {"version": 1})
+            }
+            moved = [lead["_id"] for lead, _, _ in changed if lead["_id"] in versions and versions[lead["_id"]] != lead.get("version")]
+            changed = [
+                (lead, score, category) for lead, score, category in changed
+                if lead["_id"] in versions and versions[lead["_id"]] == lead.get("version")
+            ]
+
+        await record_transitions(leads_collection, [
+            (lead, {**lead, "score": score, "category": category}) for lead, score, category in changed
+        ])
+        if changed:
+            await bump_marker(leads_collection)
+            await lead_cache.invalidate(*(lead["_id"] for lead, _, _ in changed))
+        return len(changed), moved
+
+    @staticmethod
+    async def backfill_search_keys(
+        leads_collection: AsyncIOMotorCollection,
+        batch_size: int = 1000,
+    ):
+        """Store search keys on leads written before search was indexed"""
+        projection = {field: 1 for field in SEARCH_FIELDS}
+        cursor = leads_collection.find({"search_keys": {"$exists": False}}, projection, batch_size=batch_size)
+        updated = 0
+        operations = []
+        async for lead in cursor:
+            operations.append(UpdateOne({"_id": lead["_id"]}, {"$set": {"search_keys": build_search_keys(lead)}}))
+            if len(operations) >= batch_size:
+                updated += (await leads_collection.bulk_write(operations, ordered=False)).modified_count
+                operations = []
+
+        if operations:
+            updated += (await leads_collection.bulk_write(operations, ordered=False)).modified_count
+        if updated:
+            await bump_marker(leads_collection)
+        return updated
+
+    @staticmethod
+    async def check_scoring_parity(
+        leads_collection: AsyncIOMotorCollection,
+        sample_size: int = 1000,
+    ):
+        """Score a random sample on the server with the compiled pipeline and compare it with LeadScorer"""
+        # server dates only hold milliseconds, so both sides score against the same truncated instant
+        now = datetime.now(timezone.utc)
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        rules = current_rules()
+        score = LeadScorer.score_expression(now, rules)
+        pipeline = [
+            {"$sample": {"size": sample_size}},
+            {"$project": {
+                **SCORING_PROJECTION,
+                "server_score": score,
+                "server_category": LeadScorer.category_expression(score, rules),
+            }},
+        ]
+
+        checked = 0
+        mismatches = []
+        async for lead in leads_collection.aggregate(pipeline):
+            checked += 1
+            expected = LeadScorer.calculate_score(lead, now=now, rules=rules)
+            expected_category = LeadScorer.categorize_lead(expected, rules)
+            if lead["server_score"] != expected or lead["server_category"] != expected_category:
+                mismatches.append({
+                    "id": str(lead["_id"]),
+                    "server": [lead["server_score"], lead["server_category"]],
+                    "python": [expected, expected_category],
+                })
+        return {"checked": checked, "mismatches": mismatches}
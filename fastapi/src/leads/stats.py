@@ -0,0 +1,118 @@
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+
+# Lead counts and score sums per (category, status, source) bucket, kept current by every lead write
+STATS_COLLECTION = "lead_stats"
+
+# Dimensions of a rollup bucket, in the order of the bucket _id fields
+ROLLUP_FIELDS = ("category", "status", "source")
+
+# Field where pipeline updates leave the lead's rollup values from before the update, so the
+# returned document carries both sides of the change; overwritten by the next pipeline update,
+# and never part of a response or export, which only hold the lead model's fields
+ROLLUP_BEFORE = "rollup_before"
+
+# A lead's part of the rollups, None for a lead that does not exist
+Transition = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+def stats_collection(leads_collection: AsyncIOMotorCollection) -> AsyncIOMotorCollection:
+    return leads_collection.database.get_collection(STATS_COLLECTION)
+
+
+def _plain(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def rollup_key(lead: Dict[str, Any]) -> Tuple:
+    # leads created without a status are new, as the scorer reads them
+    return (_plain(lead.get("category")), _plain(lead.get("status") or "new"), _plain(lead.get("source")))
+
+
+def snapshot_stage() -> Dict[str, Any]:
+    """First stage of a pipeline update, saving the rollup values the update starts from"""
+    # an expression rather than an embedded document, which $set would merge into the previous snapshot
+    return {"$set": {ROLLUP_BEFORE: {"$mergeObjects": [{field: f"${field}" for field in (*ROLLUP_FIELDS, "score")}]}}}
+
+
+def pipeline_transition(result: Dict[str, Any]) -> Transition:
+    """Transition of a lead returned by a pipeline update that started with snapshot_stage, taking the snapshot out of it"""
+    # a document inserted by the update had no fields to snapshot
+    return result.pop(ROLLUP_BEFORE, None) or None, result
+
+
+def rollup_deltas(transitions: Iterable[Transition]) -> Dict[Tuple, List[float]]:
+    """Net [count, score sum] change of every bucket touched by `transitions`"""
+    deltas: Dict[Tuple, List[float]] = {}
+    for before, after in transitions:
+        for lead, sign in ((before, -1), (after, 1)):
+            if lead is None:
+                continue
+            delta = deltas.setdefault(rollup_key(lead), [0, 0.0])
+            delta[0] += sign
+            delta[1] += sign * (lead.get("score") or 0.0)
+    return {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+
+
+async def record_transitions(leads_collection: AsyncIOMotorCollection, transitions: Iterable[Transition]):
+    """Apply the rollup deltas of lead writes as $inc updates, one per changed bucket"""
+    operations = [
+        UpdateOne(
+            {"_id": dict(zip(ROLLUP_FIELDS, key))},
+            {"$inc": {"count": count, "score_sum": score_sum}},
+            upsert=True,
+        )
+        for key, (count, score_sum) in rollup_deltas(transitions).items()
+    ]
+    if operations:
+        await stats_collection(leads_collection).bulk_write(operations, ordered=False)
+
+
+async def rebuild_stats(leads_collection: AsyncIOMotorCollection) -> int:
+    """
+    Recompute every bucket from the leads and replace the rollup collection with the result
+
+    $out swaps the collection in atomically, but deltas recorded while the aggregation runs can be
+    lost, so this is meant to run periodically and correct whatever drift built up. Returns the bucket count.
+    """
+    await leads_collection.aggregate([
+        {"$group": {
+            "_id": {
+                "category": {"$ifNull": ["$category", None]},
+                "status": {"$ifNull": ["$status", "new"]},
+                "source": {"$ifNull": ["$source", None]},
+            },
+            "count": {"$sum": 1},
+            "score_sum": {"$sum": {"$ifNull": ["$score", 0]}},
+        }},
+        {"$out": STATS_COLLECTION},
+    ]).to_list(length=None)
+    return await stats_collection(leads_collection).count_documents({})
+
+
+def _breakdown(totals: Dict[Any, List[float]]) -> List[Dict[str, Any]]:
+    return [
+        {"value": value, "count": int(count), "average_score": score_sum / count}
+        for value, (count, score_sum) in sorted(totals.items(), key=lambda item: -item[1][0])
+    ]
+
+
+async def read_stats(leads_collection: AsyncIOMotorCollection) -> Dict[str, Any]:
+    """Totals and per category, status and source breakdowns, read from the rollup buckets only"""
+    total = [0, 0.0]
+    by_field: Dict[str, Dict[Any, List[float]]] = {field: {} for field in ROLLUP_FIELDS}
+    async for bucket in stats_collection(leads_collection).find({"count": {"$gt": 0}}):
+        total[0] += bucket["count"]
+        total[1] += bucket["score_sum"]
+        for field in ROLLUP_FIELDS:
+            value_totals = by_field[field].setdefault(bucket["_id"].get(field), [0, 0.0])
+            value_totals[0] += bucket["count"]
+            value_totals[1] += bucket["score_sum"]
+
+    return {
+        "total": int(total[0]),
+        "average_score": total[1] / total[0] if total[0] else 0.0,
+        **{f"by_{field}": _breakdown(by_field[field]) for field in ROLLUP_FIELDS},
+    }
@@ -2,6 +2,8 @@ from fastapi import FastAPI, Depends
 from src.database import db_lifespan
 from src.users.routes import users_router
 from src.leads.routes import leads_router
+from src.monitoring.routes import monitoring_router, metrics_router
+from src.monitoring.middleware import MetricsMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
 version  = "v1"
@@ -21,8 +23,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Total-Count"],
 )
 
+# added last so it wraps every other middleware and times the whole request
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(
     users_router, 
     prefix=f"/api/{version}/users", tags=["users"], 
@@ -31,4 +37,14 @@ app.include_router(
 app.include_router(
     leads_router, 
     prefix=f"/api/{version}/leads", tags=["leads"], 
+)
+
+app.include_router(
+    monitoring_router,
+    prefix="/internal", tags=["internal"], include_in_schema=False,
+)
+
+app.include_router(
+    metrics_router,
+    tags=["internal"], include_in_schema=False,
 )
\ No newline at end of file
@@ -0,0 +1,23 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import DuplicateKeyError
+
+# One tiny document per collection whose version is bumped by every write to that collection
+MARKERS_COLLECTION = "collection_markers"
+
+
+def _markers(collection: AsyncIOMotorCollection) -> AsyncIOMotorCollection:
+    return collection.database.get_collection(MARKERS_COLLECTION)
+
+
+async def bump_marker(collection: AsyncIOMotorCollection):
+    """Record that documents of `collection` changed, invalidating every list ETag built on it"""
+    try:
+        await _markers(collection).update_one({"_id": collection.name}, {"$inc": {"version": 1}}, upsert=True)
+    except DuplicateKeyError:
+        # two first-ever bumps raced to insert the marker, the other one created it
+        await _markers(collection).update_one({"_id": collection.name}, {"$inc": {"version": 1}})
+
+
+async def read_marker(collection: AsyncIOMotorCollection) -> int:
+    marker = await _markers(collection).find_one({"_id": collection.name}, {"version": 1})
+    return marker["version"] if marker else 0
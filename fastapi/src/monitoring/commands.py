@@ -0,0 +1,37 @@
+from pymongo import monitoring
+from src.monitoring.metrics import mongodb_command_duration_seconds, mongodb_command_failures_total
+
+
+def command_collection(command_name: str, command) -> str:
+    """Collection a command targets, empty for database and admin commands"""
+    if command_name == "getMore":
+        return command.get("collection", "")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Command listener recording MongoDB latency per collection and command
+
+    Only started events carry the command document, so the collection is remembered by request id
+    until the command finishes. Each request id is written and removed by one thread, which keeps
+    the shared dict safe without a lock.
+    """
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[(event.connection_id, event.request_id)] = command_collection(event.command_name, event.command)
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongodb_command_duration_seconds.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongodb_command_duration_seconds.observe(event.duration_micros / 1e6, collection, event.command_name)
+        mongodb_command_failures_total.inc(collection, event.command_name)
+
+
+command_metrics = CommandMetrics()
@@ -0,0 +1,219 @@
+import functools
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds, request and database latencies
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds in seconds for in-process work such as scoring and serialization
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Metric:
+    """
+    Base of the per-thread sharded metrics
+
+    Each thread only ever writes to its own shard, so recording never takes a lock; a scrape
+    copies and sums every shard. Shards are registered under a lock once per thread.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _label_text(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def expose(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values: str, amount: float = 1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def totals(self) -> Dict[Tuple[str, ...], float]:
+        totals = {}
+        for shard in list(self._shards):
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {value}" for key, value in sorted(self.totals().items())]
+
+
+class Gauge(Counter):
+    """A counter that can go down, summed over the per-thread deltas"""
+    kind = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values: str):
+        shard = self._shard()
+        # one slot per bucket plus +Inf, then the sum
+        series = shard.get(label_values)
+        if series is None:
+            series = shard[label_values] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *label_values: str) -> "_Timer":
+        return _Timer(self, label_values)
+
+    def totals(self) -> Dict[Tuple[str, ...], List[float]]:
+        totals = {}
+        for shard in list(self._shards):
+            for key, series in shard.copy().items():
+                series = list(series)
+                total = totals.get(key)
+                totals[key] = series if total is None else [a + b for a, b in zip(total, series)]
+        return totals
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, series in sorted(self.totals().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{self._label_text(key, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram: Histogram, label_values: Tuple[str, ...]):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(perf_counter() - self.start, *self.label_values)
+
+
+def timed(histogram: Histogram, *label_values: str) -> Callable:
+    """Decorate a function to observe its duration in `histogram`"""
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start, *label_values)
+        return wrapper
+    return decorator
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: Optional[Tuple[float, ...]] = None) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets or LATENCY_BUCKETS))
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Add a callback producing exposition lines computed at scrape time"""
+        self._collectors.append(collector)
+
+    def expose(self) -> bytes:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.expose())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return ("\n".join(lines) + "\n").encode()
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP responses by route and status code", ("method", "route", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+)
+mongodb_command_duration_seconds = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command", ("collection", "command")
+)
+mongodb_command_failures_total = registry.counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection and command", ("collection", "command")
+)
+lead_scoring_duration_seconds = registry.histogram(
+    "lead_scoring_duration_seconds", "Time spent scoring leads, per call", ("mode",), buckets=FAST_BUCKETS
+)
+serialization_duration_seconds = registry.histogram(
+    "serialization_duration_seconds", "Time spent encoding response bodies, per call", ("schema",), buckets=FAST_BUCKETS
+)
+cache_requests_total = registry.counter(
+    "cache_requests_total", "Read-through cache lookups by cache and result", ("cache", "result")
+)
+offload_tasks_total = registry.counter(
+    "offload_tasks_total", "CPU-bound tasks by function and where they ran, inline or in the process pool", ("function", "mode")
+)
+lead_rescore_queue_total = registry.counter(
+    "lead_rescore_queue_total", "Lead ids enqueued, rescored and queued again by the rescore queue", ("event",)
+)
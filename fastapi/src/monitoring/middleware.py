@@ -0,0 +1,38 @@
+from time import perf_counter
+from src.monitoring.metrics import http_requests_total, http_request_duration_seconds, http_requests_in_flight
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and in-flight counts of every HTTP request
+
+    Requests are labelled with their route template rather than the raw path, so lead ids do not
+    blow up the number of series. Streaming responses are timed until their last body chunk.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = "500"
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - start
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            http_request_duration_seconds.observe(elapsed, scope["method"], route_path)
+            http_requests_total.inc(scope["method"], route_path, status_code)
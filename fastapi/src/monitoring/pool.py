@@ -0,0 +1,139 @@
+import threading
+from typing import Any, Dict, List
+from pymongo import monitoring
+from src.monitoring.metrics import registry
+
+
+class _PoolStats:
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.clears = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        waited = self.checkouts + sum(self.checkout_failures.values())
+        return {
+            "open_connections": self.open_connections,
+            "checked_out": self.checked_out,
+            "max_checked_out": self.max_checked_out,
+            "checkouts": self.checkouts,
+            "checkout_failures": dict(self.checkout_failures),
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+            "wait_seconds_avg": self.wait_seconds_total / waited if waited else 0.0,
+            "clears": self.clears,
+        }
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener counting checked out connections, checkout waits and failures per server
+
+    Motor runs pymongo on a thread pool, so events arrive from several threads and every update
+    takes the lock.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, _PoolStats] = {}
+
+    def _stats(self, address) -> _PoolStats:
+        key = f"{address[0]}:{address[1]}"
+        stats = self._pools.get(key)
+        if stats is None:
+            stats = self._pools[key] = _PoolStats()
+        return stats
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {address: stats.snapshot() for address, stats in self._pools.items()}
+
+    def samples(self) -> List[str]:
+        """Prometheus exposition lines of the pool stats, computed at scrape time"""
+        lines = [
+            "# HELP mongodb_pool_open_connections Open connections per server",
+            "# TYPE mongodb_pool_open_connections gauge",
+            "# HELP mongodb_pool_checked_out_connections Connections checked out per server",
+            "# TYPE mongodb_pool_checked_out_connections gauge",
+            "# HELP mongodb_pool_checkouts_total Successful connection checkouts per server",
+            "# TYPE mongodb_pool_checkouts_total counter",
+            "# HELP mongodb_pool_checkout_wait_seconds_total Time spent waiting for connections per server",
+            "# TYPE mongodb_pool_checkout_wait_seconds_total counter",
+            "# HELP mongodb_pool_checkout_failures_total Failed connection checkouts per server and reason",
+            "# TYPE mongodb_pool_checkout_failures_total counter",
+        ]
+        for address, stats in sorted(self.snapshot().items()):
+            lines.append(f'mongodb_pool_open_connections{{address="{address}"}} {stats["open_connections"]}')
+            lines.append(f'mongodb_pool_checked_out_connections{{address="{address}"}} {stats["checked_out"]}')
+            lines.append(f'mongodb_pool_checkouts_total{{address="{address}"}} {stats["checkouts"]}')
+            lines.append(f'mongodb_pool_checkout_wait_seconds_total{{address="{address}"}} {stats["wait_seconds_total"]}')
+            for reason, count in sorted(stats["checkout_failures"].items()):
+                lines.append(f'mongodb_pool_checkout_failures_total{{address="{address}",reason="{reason}"}} {count}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._pools.clear()
+
+    def pool_created(self, event):
+        with self._lock:
+            self._stats(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._stats(event.address).clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._stats(event.address).open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._stats(event.address).open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.checkout_failures[event.reason] = stats.checkout_failures.get(event.reason, 0) + 1
+            self._record_wait(stats, event.duration)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.checkouts += 1
+            stats.checked_out += 1
+            stats.max_checked_out = max(stats.max_checked_out, stats.checked_out)
+            self._record_wait(stats, event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._stats(event.address).checked_out -= 1
+
+    @staticmethod
+    def _record_wait(stats: _PoolStats, duration):
+        # duration is the time spent waiting for the pool, including establishing a new connection
+        if duration is None:
+            return
+        stats.wait_seconds_total += duration
+        stats.wait_seconds_max = max(stats.wait_seconds_max, duration)
+
+
+pool_metrics = PoolMetrics()
+registry.add_collector(pool_metrics.samples)
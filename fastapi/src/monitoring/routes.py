@@ -0,0 +1,55 @@
+import os
+import secrets
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from typing import Optional
+from src.config import settings
+from src.monitoring.pool import pool_metrics
+from src.monitoring.metrics import registry, CONTENT_TYPE
+from src.monitoring.slow_queries import slow_query_recorder
+
+
+def require_internal_access(x_internal_token: Optional[str] = Header(None)):
+    """Guard internal endpoints with INTERNAL_API_TOKEN, hiding them entirely while none is configured"""
+    if not settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not secrets.compare_digest(x_internal_token or "", settings.INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid internal token")
+
+
+monitoring_router = APIRouter(dependencies=[Depends(require_internal_access)])
+metrics_router = APIRouter(dependencies=[Depends(require_internal_access)])
+
+# Prometheus scrape endpoint, covering this worker process only
+@metrics_router.get("/metrics")
+async def get_metrics():
+    return Response(registry.expose(), media_type=CONTENT_TYPE)
+
+# Connection pool usage of this worker process, for sizing the pool per uvicorn worker
+@monitoring_router.get("/pool")
+async def get_pool_metrics():
+    return {
+        "pid": os.getpid(),
+        "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+        "min_pool_size": settings.MONGO_MIN_POOL_SIZE,
+        "pools": pool_metrics.snapshot(),
+    }
+
+# Recent commands slower than SLOW_QUERY_THRESHOLD_MS in this worker, with sampled explain results
+@monitoring_router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    flagged: bool = Query(False, description="Only return queries whose explain flagged a COLLSCAN or a high examined ratio"),
+):
+    entries = slow_query_recorder.recent(settings.SLOW_QUERY_LOG_SIZE if flagged else limit)
+    if flagged:
+        entries = [entry for entry in entries if entry["explain"] and entry["explain"].get("flags")][:limit]
+    return {
+        "pid": os.getpid(),
+        "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+        "entries": entries,
+    }
+
+@monitoring_router.delete("/slow-queries")
+async def clear_slow_queries():
+    slow_query_recorder.clear()
+    return {"detail": "Slow query log cleared"}
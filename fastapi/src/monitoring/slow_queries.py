@@ -0,0 +1,218 @@
+import asyncio
+import random
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+from src.config import settings
+from src.logger_config import get_logger
+from src.monitoring.commands import command_collection
+
+logger = get_logger(__name__)
+
+# Commands MongoDB can explain, everything else is only logged
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+# Command fields that are not part of the query itself, dropped from shapes and explains
+_SESSION_FIELDS = {"lsid", "txnNumber", "readConcern", "writeConcern", "autocommit", "startTransaction"}
+
+
+def query_shape(value: Any) -> Any:
+    """Replace the literal values of a command with "?", keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def _command_body(command: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in command.items() if not key.startswith("$") and key not in _SESSION_FIELDS}
+
+
+def _plan_stages(explain: Any, stages: List[str]) -> List[str]:
+    if isinstance(explain, dict):
+        if isinstance(explain.get("stage"), str):
+            stages.append(explain["stage"])
+        for key, value in explain.items():
+            # rejected plans were never run, only the winning plan matters
+            if key != "rejectedPlans":
+                _plan_stages(value, stages)
+    elif isinstance(explain, list):
+        for item in explain:
+            _plan_stages(item, stages)
+    return stages
+
+
+def _execution_stats(explain: Any) -> Optional[Dict[str, Any]]:
+    if isinstance(explain, dict):
+        stats = explain.get("executionStats")
+        if isinstance(stats, dict) and "totalDocsExamined" in stats:
+            return stats
+        for value in explain.values():
+            stats = _execution_stats(value)
+            if stats:
+                return stats
+    elif isinstance(explain, list):
+        for item in explain:
+            stats = _execution_stats(item)
+            if stats:
+                return stats
+    return None
+
+
+def analyze_explain(explain: Dict[str, Any], max_examined_ratio: float) -> Dict[str, Any]:
+    """Summarize an executionStats explain and flag collection scans and wasteful index use"""
+    stages = _plan_stages(explain, [])
+    stats = _execution_stats(explain) or {}
+    docs_examined = stats.get("totalDocsExamined", 0)
+    returned = stats.get("nReturned", 0)
+    ratio = docs_examined / max(returned, 1)
+
+    flags = []
+    if "COLLSCAN" in stages:
+        flags.append("COLLSCAN")
+    if ratio > max_examined_ratio:
+        flags.append("HIGH_EXAMINED_RATIO")
+    return {
+        "stages": sorted(set(stages)),
+        "docs_examined": docs_examined,
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "returned": returned,
+        "examined_ratio": ratio,
+        "flags": flags,
+    }
+
+
+async def explain_command(database, command: Dict[str, Any]) -> Dict[str, Any]:
+    return await database.command({"explain": _command_body(command), "verbosity": "executionStats"})
+
+
+class SlowQueryRecorder(monitoring.CommandListener):
+    """
+    Command listener keeping the most recent commands slower than SLOW_QUERY_THRESHOLD_MS
+
+    The listener runs on the driver's threads and must not issue commands itself, so a sample
+    of the slow queries is queued and explained by an asyncio task started with the app.
+    """
+    def __init__(self):
+        self.entries = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+        self._pending = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+        self._commands = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def started(self, event):
+        if settings.SLOW_QUERY_ENABLED and event.command_name != "explain":
+            self._commands[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        started = self._commands.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+            return
+
+        database_name, command = started
+        body = _command_body(command)
+        body.pop("documents", None)
+        shape = query_shape(body)
+        # the target collection and sort directions are part of the shape, not literal values
+        shape[event.command_name] = command_collection(event.command_name, command)
+        if "sort" in body:
+            shape["sort"] = body["sort"]
+        entry = {
+            "at": datetime.now(timezone.utc),
+            "database": database_name,
+            "collection": shape[event.command_name],
+            "command": event.command_name,
+            "duration_ms": duration_ms,
+            "failed": isinstance(event, monitoring.CommandFailedEvent),
+            "shape": shape,
+            "explain": None,
+        }
+        self.entries.append(entry)
+        if event.command_name in EXPLAINABLE_COMMANDS and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+            self._pending.append((entry, database_name, command))
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Slow commands, newest first"""
+        return list(self.entries)[::-1][:limit]
+
+    def clear(self):
+        self.entries.clear()
+        self._pending.clear()
+
+    def start(self, client: AsyncIOMotorClient):
+        if self._task is None:
+            self._task = asyncio.create_task(self._explain_forever(client))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _explain_forever(self, client: AsyncIOMotorClient):
+        while True:
+            while self._pending:
+                entry, database_name, command = self._pending.popleft()
+                try:
+                    explain = await explain_command(client[database_name], command)
+                    entry["explain"] = analyze_explain(explain, settings.SLOW_QUERY_MAX_EXAMINED_RATIO)
+                except PyMongoError as e:
+                    entry["explain"] = {"error": str(e)}
+                    continue
+                if entry["explain"]["flags"]:
+                    logger.warning(
+                        f"Slow {entry['command']} on {entry['collection']} ({entry['duration_ms']:.0f} ms) "
+                        f"flagged {', '.join(entry['explain']['flags'])}: {entry['shape']}"
+                    )
+            await asyncio.sleep(1)
+
+
+slow_query_recorder = SlowQueryRecorder()
+
+
+async def assert_index_used(
+    collection: AsyncIOMotorCollection,
+    query: Dict[str, Any],
+    sort: Optional[List] = None,
+    max_examined_ratio: Optional[float] = None,
+    limit: Optional[int] = None,
+    allow_sort: bool = True,
+) -> Dict[str, Any]:
+    """
+    Explain a find and raise AssertionError when it scans the collection
+
+    With `max_examined_ratio`, also fail when the plan examines more documents per returned one,
+    and with `allow_sort=False` when the results are sorted in memory instead of read in index order.
+    Meant for checks and test suites that pin list query shapes to their indexes.
+    """
+    command = {"find": collection.name, "filter": query}
+    if sort:
+        command["sort"] = dict(sort)
+    if limit:
+        command["limit"] = limit
+    explain = await explain_command(collection.database, command)
+    analysis = analyze_explain(explain, max_examined_ratio if max_examined_ratio is not None else float("inf"))
+    flags = list(analysis["flags"])
+    if not allow_sort and "SORT" in analysis["stages"]:
+        flags.append("IN_MEMORY_SORT")
+    if flags:
+        raise AssertionError(f"{collection.name} query {query_shape(query)} sorted by {sort}: {', '.join(flags)}")
+    return analysis
@@ -0,0 +1,83 @@
+import asyncio
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, TypeVar
+from src.monitoring.metrics import offload_tasks_total
+from src.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Modules holding the pool tasks, imported by each worker as it starts rather than by its first task
+TASK_MODULES = ("src.leads.ingest", "src.leads.scorer")
+
+
+def _import_task_modules():
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+
+
+class ProcessPool:
+    """
+    Worker processes for CPU-bound work that would otherwise hold up the event loop
+
+    Started and stopped by the app lifespan. Work below `min_items` runs inline, where sending it
+    to another process costs more than it saves, and so does all work while the pool is not
+    running, as in CLI jobs. Functions and arguments sent to the pool must be picklable, so
+    they are module level functions taking plain data.
+    """
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.min_items = 0
+        self.chunk_size = 1
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self, size: int, min_items: int, chunk_size: int):
+        if self._executor is not None or size <= 0:
+            return
+        self.min_items = min_items
+        self.chunk_size = max(chunk_size, 1)
+        # spawned rather than forked, forking a process running the event loop and driver threads is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_import_task_modules,
+        )
+        # the first submission spawns every worker, so they warm up now instead of during the first request
+        self._executor.submit(int)
+        logger.info(f"Started process pool with {size} workers")
+
+    async def stop(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+            logger.info("Stopped process pool")
+
+    async def run(self, function: Callable[..., T], *args: Any, items: int) -> T:
+        """Call `function(*args)` in a worker process, or inline when `items` is below the threshold"""
+        if self._executor is None or items < self.min_items:
+            offload_tasks_total.inc(function.__name__, "inline")
+            return function(*args)
+        offload_tasks_total.inc(function.__name__, "process")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def map_chunks(self, function: Callable[..., List[T]], items: Sequence[Any], *args: Any) -> List[T]:
+        """
+        Call `function(chunk, *args)` on chunks of `items` across the workers, concatenating the results
+
+        `function` returns one result per item of its chunk, so the output lines up with `items`.
+        """
+        if self._executor is None or len(items) < self.min_items or len(items) <= self.chunk_size:
+            return await self.run(function, items, *args, items=len(items))
+        chunks = [items[start:start + self.chunk_size] for start in range(0, len(items), self.chunk_size)]
+        # sized as the whole job, so a short trailing chunk is not pulled back inline
+        results = await asyncio.gather(*(self.run(function, chunk, *args, items=len(items)) for chunk in chunks))
+        return [result for chunk_results in results for result in chunk_results]
+
+
+process_pool = ProcessPool()
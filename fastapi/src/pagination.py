@@ -0,0 +1,91 @@
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+from bson import json_util
+
+# A sort key as (field, direction) pairs, always ending in _id so the order is total
+SortSpec = List[Tuple[str, int]]
+
+ID_SORT: SortSpec = [("_id", 1)]
+
+
+def encode_cursor(document: Dict[str, Any], sort_spec: SortSpec) -> str:
+    """Build an opaque cursor pointing just after `document` in `sort_spec` order"""
+    payload = {
+        "k": [field for field, _ in sort_spec],
+        "v": [document.get(field) for field, _ in sort_spec],
+    }
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_spec: SortSpec) -> List[Any]:
+    """Return the sort key values stored in a cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Malformed pagination cursor") from e
+
+    if not isinstance(payload, dict) or payload.get("k") != [field for field, _ in sort_spec]:
+        raise ValueError("Pagination cursor does not match the requested sort order")
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(sort_spec):
+        raise ValueError("Malformed pagination cursor")
+    return values
+
+
+def keyset_filter(sort_spec: SortSpec, values: List[Any]) -> Dict[str, Any]:
+    """
+    Match the documents that come after `values` in `sort_spec` order
+
+    For a (score desc, _id desc) key this is
+    {"$or": [{"score": {"$lt": s}}, {"score": s, "_id": {"$lt": id}}]}
+    which a compound index on the same fields answers without scanning earlier pages. Null and
+    missing values sort before every other value, which range operators never match, so they
+    are matched explicitly, as for a lead with no score yet.
+    """
+    clauses = []
+    for position, (field, direction) in enumerate(sort_spec):
+        value = values[position]
+        if value is None and direction == -1:
+            # nothing sorts after null in descending order
+            continue
+        clause = {prefix_field: values[i] for i, (prefix_field, _) in enumerate(sort_spec[:position])}
+        if value is None:
+            clause[field] = {"$ne": None}
+        elif direction == 1:
+            clause[field] = {"$gt": value}
+        else:
+            clause["$or"] = [{field: {"$lt": value}}, {field: None}]
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def cursor_filter(sort_spec: SortSpec, cursor: Optional[str]) -> Dict[str, Any]:
+    """Keyset condition of a cursor, or an empty filter when there is no cursor"""
+    if not cursor:
+        return {}
+    return keyset_filter(sort_spec, decode_cursor(cursor, sort_spec))
+
+
+def apply_keyset(query: Dict[str, Any], sort_spec: SortSpec, cursor: Optional[str]) -> Dict[str, Any]:
+    """Combine a filter query with the keyset condition of a cursor, if any"""
+    after = cursor_filter(sort_spec, cursor)
+    if not after:
+        return query
+    return {"$and": [query, after]} if query else after
+
+
+def next_cursor(documents: List[Dict[str, Any]], limit: int, sort_spec: SortSpec) -> Optional[str]:
+    """
+    Trim a page fetched with limit + 1 and return the cursor for the following page
+
+    Mutates `documents` down to `limit` entries.
+    """
+    if limit < 1:
+        documents.clear()
+        return None
+    if len(documents) <= limit:
+        return None
+    del documents[limit:]
+    return encode_cursor(documents[-1], sort_spec)
@@ -0,0 +1,101 @@
+import typing
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+import orjson
+from bson.objectid import ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+_MISSING = object()
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Encode to JSON bytes with native datetime, enum and ObjectId support"""
+    return orjson.dumps(value, default=_default)
+
+
+class RawJSONResponse(Response):
+    """JSON response for bodies that are already encoded, skipping response_model validation"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+# A field plan entry: (output name, document key, default factory, value converter)
+FieldPlan = List[Tuple[str, str, Callable[[], Any], Optional[Callable[[Any], Any]]]]
+
+_plans: Dict[Type[BaseModel], FieldPlan] = {}
+
+
+def _unwrap_optional(annotation: Any) -> Any:
+    if typing.get_origin(annotation) is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _converter(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    annotation = _unwrap_optional(annotation)
+    if annotation is float:
+        return lambda value: float(value) if value is not None else None
+    if isinstance(annotation, type) and issubclass(annotation, ObjectId):
+        return lambda value: str(value) if value else None
+    if typing.get_origin(annotation) in (list, List):
+        (item_annotation,) = typing.get_args(annotation)
+        if isinstance(item_annotation, type) and issubclass(item_annotation, BaseModel):
+            return lambda items: [shape_document(item, item_annotation) for item in items] if items is not None else None
+    return None
+
+
+def _default_factory(field) -> Callable[[], Any]:
+    if field.default_factory is not None:
+        return field.default_factory
+    default = None if field.default is PydanticUndefined else field.default
+    return lambda: default
+
+
+def field_plan(model: Type[BaseModel]) -> FieldPlan:
+    plan = _plans.get(model)
+    if plan is None:
+        plan = [
+            (name, field.alias or name, _default_factory(field), _converter(field.annotation))
+            for name, field in model.model_fields.items()
+        ]
+        _plans[model] = plan
+    return plan
+
+
+def shape_document(
+    document: Dict[str, Any],
+    model: Type[BaseModel],
+    fields: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Reshape a trusted MongoDB document into the JSON form `model` would serialize it to
+
+    Skips validation entirely, so only use it on documents this service wrote itself.
+    Extra keys are dropped, missing keys get the field default and `fields` limits the output.
+    """
+    wanted = set(fields) if fields is not None else None
+    shaped = {}
+    for name, key, default, convert in field_plan(model):
+        if wanted is not None and name not in wanted:
+            continue
+        value = document[key] if key in document else document.get(name, _MISSING)
+        if value is _MISSING:
+            value = default()
+        elif convert is not None:
+            value = convert(value)
+        shaped[name] = value
+    return shaped
+
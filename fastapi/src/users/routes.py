@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorCollection
 from src.users.models import PyObjectId
 from src.users.schemas import UserBase, UserCreateSchema, UserUpdateSchema, UserListSchema
 from src.database import get_users_collection
 from src.users.service import UserService
+from src.config import settings
 from typing import Optional, Dict
 
 users_router = APIRouter()
@@ -19,16 +20,18 @@ async def create_user(
 # Get all users
 @users_router.get("/", response_model=UserListSchema, response_model_by_alias=False)
 async def get_users(
-    skip: int = 0, 
-    limit: int = 100,
+    skip: int = Query(0, ge=0, le=settings.MAX_PAGINATION_SKIP, description="Deprecated for deep pages, use cursor instead"),
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
     min_age: Optional[int] = None,
+    cursor: Optional[str] = None,
     users_collection = Depends(get_users_collection)
 ):
     return await UserService.get_users(
         users_collection,
         skip=skip,
         limit=limit,
-        min_age=min_age
+        min_age=min_age,
+        cursor=cursor
     )
 
 # Get a single user by id
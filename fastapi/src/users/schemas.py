@@ -51,7 +51,8 @@ class UserUpdateSchema(BaseModel):
 # Define User list model
 class UserListSchema(BaseModel):
     users: List[UserBase]
+    next_cursor: Optional[str] = Field(default=None, description="Pass as `cursor` to fetch the next page; null on the last page")
 
     @classmethod
-    def from_mongo_cursor(cls, cursor):
-        return cls(users=[UserBase(**doc) for doc in cursor])
\ No newline at end of file
+    def from_mongo_cursor(cls, cursor, next_cursor: Optional[str] = None):
+        return cls(users=[UserBase(**doc) for doc in cursor], next_cursor=next_cursor)
\ No newline at end of file
@@ -5,6 +5,12 @@ from typing import Optional
 from src.users.models import PyObjectId
 from src.users.exceptions import UserAlreadyExistsException
 from pymongo.errors import DuplicateKeyError
+from src.pagination import ID_SORT, apply_keyset, next_cursor
+from src.cache import ReadThroughCache, cache_backend
+from src.config import settings
+
+# User documents by id, read through by get_user_by_id and invalidated by every user write
+user_cache = ReadThroughCache("users", cache_backend(settings.DETAIL_CACHE_BACKEND))
 
 # Define business logic for UserService
 class UserService:
@@ -33,23 +39,33 @@ class UserService:
         user_collection: AsyncIOMotorCollection,
         skip: int = 0,
         limit: int = 100,
-        min_age: Optional[int] = None
+        min_age: Optional[int] = None,
+        cursor: Optional[str] = None,
     ):
         query = {}
         if min_age is not None:
             query["age"] = {"$gte": min_age}
-        
-        users_cursor = user_collection.find(query).skip(skip).limit(limit)
-        users = await users_cursor.to_list(length=limit)
 
-        return UserListSchema.from_mongo_cursor(users)
+        # a cursor continues after the last user of the previous page, so skip only applies without one
+        try:
+            page_query = apply_keyset(query, ID_SORT, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        users_cursor = user_collection.find(page_query).sort(ID_SORT).limit(limit + 1)
+        if not cursor:
+            users_cursor = users_cursor.skip(skip)
+        users = await users_cursor.to_list(length=limit + 1)
+        page_cursor = next_cursor(users, limit, ID_SORT)
+
+        return UserListSchema.from_mongo_cursor(users, next_cursor=page_cursor)
     
     @staticmethod
     async def get_user_by_id(
         users_collection: AsyncIOMotorCollection,
         user_id: PyObjectId,
     ):
-        user = await users_collection.find_one({"_id": user_id})
+        user = await user_cache.get_or_load(user_id, lambda: users_collection.find_one({"_id": user_id}))
         
         if not user:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -76,6 +92,7 @@ class UserService:
         if not result:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         
+        await user_cache.invalidate(user_id)
         return result
 
     @staticmethod
@@ -88,5 +105,6 @@ class UserService:
         if not result:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found or already deleted")
         
+        await user_cache.invalidate(user_id)
         return {"detail": "User deleted successfully"}
         
\ No newline at end of file
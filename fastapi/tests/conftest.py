@@ -0,0 +1,17 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+# src.config requires a MongoDB URI at import time, tests that need a real server read TEST_MONGO_URI
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/saltra_test")
+
+from src.database import DatabaseManager  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Client for the app over an in-memory database, without running the lifespan"""
+    monkeypatch.setattr(DatabaseManager, "db", AsyncMongoMockClient()["saltra_test"])
+    return TestClient(app)
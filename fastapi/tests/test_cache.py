@@ -0,0 +1,122 @@
+"""TTLCache and cache backend eviction, and ReadThroughCache's guard against invalidation races"""
+import asyncio
+import pytest
+from src import cache
+from src.cache import CacheBackend, MemoryCacheBackend, ReadThroughCache, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def registered(monkeypatch):
+    # keep the caches built here out of the app's metrics
+    monkeypatch.setattr(cache, "caches", {})
+
+
+def test_ttl_cache_entries_expire(clock):
+    ttl_cache = TTLCache(ttl=10)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2, ttl=30)
+    clock.now += 9.9
+    assert (ttl_cache.get("a"), ttl_cache.get("b")) == (1, 2)
+    clock.now += 0.1
+    assert (ttl_cache.get("a", "gone"), ttl_cache.get("b")) == ("gone", 2)
+    assert len(ttl_cache) == 1
+
+
+def test_ttl_cache_evicts_the_oldest_insert(clock):
+    ttl_cache = TTLCache(ttl=10, max_entries=2)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    # setting a key again makes it the newest insert
+    ttl_cache.set("a", 3)
+    ttl_cache.set("c", 4)
+    assert (ttl_cache.get("a"), ttl_cache.get("b"), ttl_cache.get("c")) == (3, None, 4)
+    ttl_cache.clear()
+    assert len(ttl_cache) == 0
+
+
+def test_memory_backend_evicts_least_recently_used(clock):
+    async def main():
+        backend = MemoryCacheBackend(ttl=10, max_entries=2)
+        await backend.set("a", {"n": 1})
+        await backend.set("b", {"n": 2})
+        await backend.get("a")
+        await backend.set("c", {"n": 3})
+        return [await backend.get(key) for key in "abc"], backend.stats()["evictions"]
+    values, evictions = asyncio.run(main())
+    assert values == [{"n": 1}, cache._MISSING, {"n": 3}]
+    assert evictions == 1
+
+
+def test_memory_backend_byte_limit_and_ttl(clock):
+    async def main():
+        backend = MemoryCacheBackend(ttl=10, max_bytes=100, size_of=len)
+        await backend.set("big", "x" * 101)
+        await backend.set("a", "x" * 60)
+        await backend.set("b", "x" * 60)
+        held = [await backend.get(key) is not cache._MISSING for key in ("big", "a", "b")]
+        clock.now += 10
+        expired = await backend.get("b")
+        return held, expired, backend.stats()
+    held, expired, stats = asyncio.run(main())
+    assert held == [False, False, True]
+    assert expired is cache._MISSING
+    assert (stats["entries"], stats["bytes"]) == (0, 0)
+
+
+def test_backends_must_implement_every_operation():
+    class GetOnly(CacheBackend):
+        async def get(self, key):
+            return cache._MISSING
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_load_racing_an_invalidation_is_not_stored(clock, registered):
+    async def main():
+        read_through = ReadThroughCache("test_race", MemoryCacheBackend(ttl=10))
+
+        async def stale_load():
+            # a write lands and invalidates the key while this read is in flight
+            await read_through.invalidate("lead")
+            return {"version": 1}
+
+        async def fresh_load():
+            return {"version": 2}
+
+        first = await read_through.get_or_load("lead", stale_load)
+        cached_after_race = await read_through.peek("lead")
+        second = await read_through.get_or_load("lead", fresh_load)
+        third = await read_through.get_or_load("lead", stale_load)
+        return first, cached_after_race, second, third
+    assert asyncio.run(main()) == ({"version": 1}, None, {"version": 2}, {"version": 2})
+
+
+def test_missing_documents_are_not_cached(clock, registered):
+    async def main():
+        read_through = ReadThroughCache("test_missing", MemoryCacheBackend(ttl=10))
+        loads = []
+
+        async def load():
+            loads.append(1)
+            return None
+
+        await read_through.get_or_load("lead", load)
+        await read_through.get_or_load("lead", load)
+        return len(loads)
+    assert asyncio.run(main()) == 2
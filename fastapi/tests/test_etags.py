@@ -0,0 +1,83 @@
+"""ETag matching, and the list and detail ETags changing with lead writes"""
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from bson import ObjectId
+from src.database import DatabaseManager
+from src.etags import document_etag, etag_matches
+from src.leads.service import LeadService, SCORING_PROJECTION
+
+ETAG = 'W/"0123abcd"'
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ("", False),
+    (ETAG, True),
+    ('"0123abcd"', True),
+    ("*", True),
+    (" * ", True),
+    ('W/"other", W/"0123abcd"', True),
+    ('"other",W/"0123abcd" ', True),
+    ('W/"other", "another"', False),
+    ('W/"0123abcd-gzip"', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, ETAG) is expected
+    # the comparison is weak, so a strong tag matches the same value too
+    assert etag_matches(if_none_match, ETAG.removeprefix("W/")) is expected
+
+
+def test_document_etag_follows_the_fields_it_is_built_from():
+    lead = {"_id": ObjectId(), "version": 1, "updated_at": datetime(2024, 12, 1), "score": 50.0, "score_version": "v1"}
+    changes = [{"version": 2}, {"updated_at": datetime(2024, 12, 2)}, {"score": 55.0}, {"score_version": "v2"}]
+    etags = {document_etag(lead), *(document_etag({**lead, **change}) for change in changes)}
+    assert len(etags) == len(changes) + 1
+    assert document_etag(lead) == document_etag({**lead, "company": "renamed"})
+
+
+def insert_leads(*emails):
+    lead = {
+        "first_name": "Jane", "last_name": "Doe", "company": "Tech Corp", "company_size": 500,
+        "job_title": "CTO", "source": "referral", "status": "qualified", "score": 0.0, "version": 1,
+    }
+    result = asyncio.run(DatabaseManager.db.get_collection("leads").insert_many([{**lead, "email": email} for email in emails]))
+    return [str(lead_id) for lead_id in result.inserted_ids]
+
+
+def rescore(lead_id):
+    async def main():
+        leads_collection = DatabaseManager.db.get_collection("leads")
+        leads = await leads_collection.find({"_id": ObjectId(lead_id)}, SCORING_PROJECTION).to_list(length=None)
+        return await LeadService.rescore_batch(leads_collection, leads, datetime.now(timezone.utc))
+    assert asyncio.run(main()) == 1
+
+
+def revalidate(api, path, params=None):
+    """Status of a conditional GET sent with the ETag of an earlier GET, and that ETag"""
+    etag = api.get(path, params=params).headers["ETag"]
+    return api.get(path, params=params, headers={"If-None-Match": etag}).status_code, etag
+
+
+def test_list_etag_changes_with_a_lead_write(api):
+    _, other_id = insert_leads("jane@example.com", "john@example.com")
+    status, etag = revalidate(api, "/api/v1/leads/", {"limit": 10})
+    assert status == 304
+
+    assert api.delete(f"/api/v1/leads/{other_id}").status_code == 200
+    response = api.get("/api/v1/leads/", params={"limit": 10}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("params", [None, {"fields": "first_name,email"}], ids=["full", "fields"])
+def test_detail_etag_changes_when_a_lead_is_rescored(api, params):
+    (lead_id,) = insert_leads("jane@example.com")
+    path = f"/api/v1/leads/{lead_id}"
+    status, etag = revalidate(api, path, params)
+    assert status == 304
+
+    rescore(lead_id)
+    response = api.get(path, params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
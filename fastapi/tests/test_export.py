@@ -0,0 +1,46 @@
+"""Lead exports through the API, over an in-memory database"""
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+from src.database import DatabaseManager
+
+LEAD = {
+    "first_name": "Jane",
+    "last_name": "Doe",
+    "company": "Tech Corp",
+    "email": "jane@example.com",
+    "interactions": [{"type": "email", "date": datetime(2024, 11, 30, 9, 0), "notes": "follow up"}],
+    "interaction_count": 42,
+    "last_interaction_at": datetime(2024, 11, 30, 9, 0),
+    "score": 61.5,
+    "score_version": "v3",
+    "version": 7,
+}
+
+
+def insert_lead():
+    asyncio.run(DatabaseManager.db.get_collection("leads").insert_one(dict(LEAD)))
+
+
+def test_csv_export_keeps_the_interaction_summary(api):
+    insert_lead()
+    response = api.get("/api/v1/leads/export", params={"format": "csv"})
+    (row,) = csv.DictReader(io.StringIO(response.text))
+    assert row["interaction_count"] == "42"
+    assert row["last_interaction_at"] == "2024-11-30T09:00:00"
+    assert (row["score_version"], row["version"]) == ("v3", "7")
+    assert len(json.loads(row["interactions"])) == 1
+
+
+def test_ndjson_export_of_selected_columns(api):
+    insert_lead()
+    response = api.get("/api/v1/leads/export", params={"fields": "email,interaction_count,version"})
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"email": "jane@example.com", "interaction_count": 42, "version": 7},
+    ]
+
+
+def test_unknown_columns_are_rejected(api):
+    assert api.get("/api/v1/leads/export", params={"fields": "email,rollup_before"}).status_code == 400
@@ -0,0 +1,109 @@
+"""
+Pin the lead list and top leads query shapes to their indexes with assert_index_used
+
+Explains need a real MongoDB server: set TEST_MONGO_URI to a throwaway database to run the
+index tests, which drop it when done. The assertion itself is also checked on canned plans.
+"""
+import asyncio
+import os
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from mongomock_motor import AsyncMongoMockClient
+from bench.data import LeadGenerator
+from src.config import settings
+from src.database import DatabaseManager
+from src.leads.jobs import LIST_FILTERS, TOP_FILTERS
+from src.leads.rules import current_rules
+from src.leads.scorer import LeadScorer
+from src.leads.service import LeadService, LEAD_SORTS, TOP_SORT
+from src.monitoring import slow_queries
+from src.monitoring.slow_queries import assert_index_used
+
+TEST_MONGO_URI = os.environ.get("TEST_MONGO_URI")
+
+requires_mongo = pytest.mark.skipif(not TEST_MONGO_URI, reason="TEST_MONGO_URI is not set")
+
+
+def run_with_leads(check):
+    """Run `check(leads_collection)` against TEST_MONGO_URI, on a client bound to this event loop"""
+    async def main():
+        DatabaseManager.client = AsyncIOMotorClient(TEST_MONGO_URI)
+        DatabaseManager.db = DatabaseManager.client.get_default_database()
+        try:
+            return await check(DatabaseManager.db.get_collection("leads"))
+        finally:
+            DatabaseManager.client.close()
+    return asyncio.run(main())
+
+
+@pytest.fixture(scope="module")
+def seeded_leads():
+    async def seed(leads_collection):
+        await leads_collection.drop()
+        await DatabaseManager.create_leads_indexes()
+        rules = current_rules()
+        leads = [lead for lead, _ in LeadGenerator(seed=7, max_interactions=20).documents(500)]
+        scores, categories = LeadScorer.calculate_scores_batch(**LeadScorer.to_columns(leads, rules), rules=rules)
+        for lead, score, category in zip(leads, scores.tolist(), categories.tolist()):
+            lead.update(score=score, category=category, score_version=rules.version)
+        await leads_collection.insert_many(leads)
+
+    run_with_leads(seed)
+    yield
+    run_with_leads(lambda leads_collection: leads_collection.database.client.drop_database(leads_collection.database.name))
+
+
+@requires_mongo
+@pytest.mark.parametrize("filter_name", list(TOP_FILTERS))
+def test_top_queries_read_score_order_off_an_index(filter_name, seeded_leads):
+    query = LeadService.build_top_query(**TOP_FILTERS[filter_name])
+    run_with_leads(lambda leads_collection: assert_index_used(leads_collection, query, TOP_SORT, limit=100, allow_sort=False))
+
+
+@requires_mongo
+@pytest.mark.parametrize("sort", list(LEAD_SORTS), ids=lambda sort: sort.value)
+@pytest.mark.parametrize("filter_name", list(LIST_FILTERS))
+def test_list_queries_use_an_index(filter_name, sort, seeded_leads):
+    query = LeadService.build_leads_query(**LIST_FILTERS[filter_name])
+    run_with_leads(lambda leads_collection: assert_index_used(
+        leads_collection, query, LEAD_SORTS[sort], max_examined_ratio=settings.SLOW_QUERY_MAX_EXAMINED_RATIO
+    ))
+
+
+def explain_with(monkeypatch, winning_plan, docs_examined=1, returned=1):
+    async def explain_command(database, command):
+        return {
+            "queryPlanner": {"winningPlan": winning_plan, "rejectedPlans": [{"stage": "COLLSCAN"}]},
+            "executionStats": {"totalDocsExamined": docs_examined, "totalKeysExamined": docs_examined, "nReturned": returned},
+        }
+    monkeypatch.setattr(slow_queries, "explain_command", explain_command)
+
+
+def assert_on_mock(**kwargs):
+    collection = AsyncMongoMockClient()["test"]["leads"]
+    return asyncio.run(assert_index_used(collection, {"category": "Hot"}, TOP_SORT, **kwargs))
+
+
+def test_index_scan_passes(monkeypatch):
+    explain_with(monkeypatch, {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}})
+    assert assert_on_mock(allow_sort=False)["stages"] == ["FETCH", "IXSCAN", "LIMIT"]
+
+
+def test_collection_scan_fails(monkeypatch):
+    explain_with(monkeypatch, {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}})
+    with pytest.raises(AssertionError, match="COLLSCAN"):
+        assert_on_mock()
+
+
+def test_in_memory_sort_fails_only_when_disallowed(monkeypatch):
+    explain_with(monkeypatch, {"stage": "SORT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}})
+    assert_on_mock()
+    with pytest.raises(AssertionError, match="IN_MEMORY_SORT"):
+        assert_on_mock(allow_sort=False)
+
+
+def test_examined_ratio_fails_above_the_limit(monkeypatch):
+    explain_with(monkeypatch, {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}, docs_examined=500, returned=2)
+    assert_on_mock(max_examined_ratio=250)
+    with pytest.raises(AssertionError, match="HIGH_EXAMINED_RATIO"):
+        assert_on_mock(max_examined_ratio=100)
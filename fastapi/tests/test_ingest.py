@@ -0,0 +1,106 @@
+"""Bulk upload parsing: record splitting, chunked parsing and row validation, all without a database"""
+import asyncio
+from src.leads.ingest import LINE_TOO_LONG, iter_csv_records, iter_lines, iter_parsed_chunks, validate_rows
+
+HEADER = "first_name,last_name,company,company_size,email,source"
+
+
+async def byte_stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def collect(iterator):
+    async def main():
+        return [item async for item in iterator]
+    return asyncio.run(main())
+
+
+def csv_records(text: str, max_length: int = 1000, max_lines: int = 5, chunk_size: int = 7):
+    data = text.encode()
+    chunks = [data[start:start + chunk_size] for start in range(0, len(data), chunk_size)]
+    return collect(iter_csv_records(byte_stream(*chunks), max_length, max_lines))
+
+
+def parsed_rows(upload_format: str, text: str, chunk_size: int = 2, **limits):
+    chunks = collect(iter_parsed_chunks(byte_stream(text.encode()), upload_format, chunk_size, **limits))
+    return [row for chunk in chunks for row in chunk]
+
+
+def test_lines_split_across_chunks():
+    data = "café\r\nnaïve\n\nlast".encode("utf-8-sig")
+    # one byte at a time splits the BOM and the multibyte characters too
+    lines = collect(iter_lines(byte_stream(*(data[i:i + 1] for i in range(len(data)))), 100))
+    assert lines == ["café", "naïve", "", "last"]
+
+
+def test_lines_over_the_limit_are_dropped_alone():
+    lines = collect(iter_lines(byte_stream(b"short\n", b"x" * 8, b"x" * 8, b"x\nnext\n", b"y" * 20), 10))
+    assert lines == ["short", None, "next", None]
+
+
+def test_csv_records_join_quoted_line_breaks():
+    records = csv_records(f'{HEADER}\nJane,Doe,"Tech\nCorp",10,jane@example.com,website\n\nJohn,Smith,Acme,5,john@example.com,referral\n')
+    assert records == [
+        (0, HEADER),
+        (1, 'Jane,Doe,"Tech\nCorp",10,jane@example.com,website'),
+        (2, "John,Smith,Acme,5,john@example.com,referral"),
+    ]
+
+
+def test_stray_quote_fails_only_its_row():
+    rows = [f"Lead{i},Doe,Acme,5,lead{i}@example.com,website" for i in range(12)]
+    rows[3] = 'Lead3,Doe,Acme 5" Displays,5,lead3@example.com,website'
+    records = csv_records("\n".join([HEADER, *rows]))
+    assert [text for _, text in records[1:]] == rows
+    assert [row_number for row_number, _ in records] == list(range(13))
+
+
+def test_stray_quote_resyncs_within_the_length_limit():
+    rows = ['Acme 5" Displays', "a" * 30, "b" * 30, "c"]
+    assert csv_records("\n".join(rows), max_length=50) == list(enumerate(rows))
+
+
+def test_stray_quote_in_the_last_rows():
+    assert csv_records('one\ntwo "\nthree\nfour') == [(0, "one"), (1, 'two "'), (2, "three"), (3, "four")]
+
+
+def test_long_lines_become_records_of_their_own():
+    assert csv_records(f'ok\n{"x" * 50}\n"open\n{"y" * 50}\nafter', max_length=20) == [
+        (0, "ok"), (1, None), (2, '"open'), (3, None), (4, "after"),
+    ]
+
+
+def test_parsed_csv_rows():
+    rows = parsed_rows("csv", "\n".join([
+        HEADER,
+        "Jane,Doe,Tech Corp,10,jane@example.com,website",
+        "John,Smith",
+        'Ann,Lee,"Big "" Co",,ann@example.com,referral',
+        'Bob,Ray,5" Displays,5,bob@example.com,website',
+    ]))
+    assert rows == [
+        (1, {"first_name": "Jane", "last_name": "Doe", "company": "Tech Corp", "company_size": "10", "email": "jane@example.com", "source": "website"}),
+        (2, "Expected 6 columns, got 2"),
+        (3, {"first_name": "Ann", "last_name": "Lee", "company": 'Big " Co', "email": "ann@example.com", "source": "referral"}),
+        (4, "Unterminated quoted field"),
+    ]
+
+
+def test_parsed_ndjson_rows():
+    rows = parsed_rows("ndjson", '{"first_name": "Jane"}\n\n[1, 2]\nnot json\n{"company": "' + "x" * 40 + '"}\n', max_record_length=30)
+    assert rows[0] == (1, {"first_name": "Jane"})
+    assert rows[1] == (2, "Each line must be a JSON object")
+    assert rows[2][0] == 3 and rows[2][1].startswith("Invalid JSON")
+    assert rows[3] == (4, LINE_TOO_LONG)
+
+
+def test_validate_rows():
+    lead = {"first_name": "Jane", "last_name": "Doe", "company": "Tech Corp", "company_size": "10", "email": "jane@example.com", "source": "website"}
+    validated = validate_rows([(1, lead), (2, {**lead, "company_size": "0"}), (3, "Unterminated quoted field")])
+
+    assert validated[0] == (1, {**lead, "company_size": 10}, None)
+    row_number, fields, errors = validated[1]
+    assert (row_number, fields) == (2, None)
+    assert [error["loc"] for error in errors] == [["company_size"]]
+    assert validated[2] == (3, None, ["Unterminated quoted field"])
@@ -0,0 +1,35 @@
+"""Recent interaction summaries built server side, checked against summary_fields"""
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+from src.config import settings
+from src.leads.interactions import recent_expression, summary_fields
+
+START = datetime(2024, 12, 1, 12, 0)
+
+
+def interaction(days: int, notes: str = "") -> dict:
+    return {"type": "email", "date": START + timedelta(days=days), "notes": notes or f"day {days}"}
+
+
+def server_recent(existing, new):
+    collection = mongomock.MongoClient().db.leads
+    collection.insert_one({"_id": 1, "interactions": existing})
+    (lead,) = collection.aggregate([{"$project": {"interactions": recent_expression("$interactions", new)}}])
+    return lead["interactions"]
+
+
+@pytest.mark.parametrize("existing_days, new_days", [
+    ([], [3]),
+    ([], [5, 1, 3]),
+    ([1, 2, 3], [4]),
+    ([1, 4, 6], [5, 0, 7]),
+    ([1, 2], [2]),
+    (list(range(settings.RECENT_INTERACTIONS)), [-1]),
+    (list(range(settings.RECENT_INTERACTIONS)), [100, 3, -5]),
+])
+def test_recent_matches_summary_fields(existing_days, new_days):
+    existing = summary_fields([interaction(day) for day in existing_days])["interactions"]
+    new = [interaction(day, f"new {day}") for day in new_days]
+    expected = summary_fields(new, {"interactions": existing})["interactions"]
+    assert [entry["date"] for entry in server_recent(existing, new)] == [entry["date"] for entry in expected]
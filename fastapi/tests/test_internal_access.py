@@ -0,0 +1,25 @@
+"""Access to /metrics and /internal/*, which need INTERNAL_API_TOKEN"""
+import pytest
+from src.config import settings
+
+PATHS = ["/metrics", "/internal/pool", "/internal/slow-queries"]
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_hidden_without_a_configured_token(api, monkeypatch, path):
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", None)
+    assert api.get(path).status_code == 404
+    assert api.get(path, headers={"X-Internal-Token": ""}).status_code == 404
+
+
+def test_clearing_slow_queries_needs_the_token(api, monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", None)
+    assert api.delete("/internal/slow-queries").status_code == 404
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_token_checked_when_configured(api, monkeypatch, path):
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "secret")
+    assert api.get(path).status_code == 403
+    assert api.get(path, headers={"X-Internal-Token": "wrong"}).status_code == 403
+    assert api.get(path, headers={"X-Internal-Token": "secret"}).status_code == 200
@@ -0,0 +1,44 @@
+"""Lead list counts per count mode, and the cached filtered counts cleared by lead writes"""
+import asyncio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from src.leads.schemas import LeadCountMode
+from src.leads.service import LeadService, lead_count_cache
+
+NEW = {"status": "new"}
+
+
+@pytest.fixture
+def leads():
+    lead_count_cache.clear()
+    collection = AsyncMongoMockClient()["saltra_test"].get_collection("leads")
+    asyncio.run(collection.insert_many([{"status": "new"}, {"status": "new"}, {"status": "lost"}]))
+    yield collection
+    lead_count_cache.clear()
+
+
+def count(leads, query, mode=LeadCountMode.ESTIMATE):
+    return asyncio.run(LeadService.count_leads(leads, query, mode))
+
+
+def test_estimate_serves_the_cached_count(leads):
+    assert count(leads, NEW) == 2
+    # written without going through the service, so nothing clears the cached count
+    asyncio.run(leads.insert_one({"status": "new"}))
+    assert count(leads, NEW) == 2
+    assert count(leads, NEW, LeadCountMode.EXACT) == 3
+    assert count(leads, {"status": "lost"}) == 1
+
+
+def test_leads_changed_clears_cached_counts(leads):
+    assert count(leads, NEW) == 2
+    asyncio.run(leads.insert_one({"status": "new"}))
+    asyncio.run(LeadService.leads_changed(leads))
+    assert len(lead_count_cache) == 0
+    assert count(leads, NEW) == 3
+
+
+def test_unfiltered_and_skipped_counts(leads):
+    assert count(leads, {}) == 3
+    assert count(leads, NEW, LeadCountMode.NONE) is None
+    assert len(lead_count_cache) == 0
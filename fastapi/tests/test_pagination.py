@@ -0,0 +1,64 @@
+"""Keyset pagination over every lead sort order, including leads whose sort field is null"""
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+from bson import ObjectId
+from src.leads.service import LEAD_SORTS, TOP_SORT
+from src.pagination import ID_SORT, apply_keyset, encode_cursor, next_cursor
+
+START = datetime(2024, 12, 1, 12, 0)
+
+
+@pytest.fixture(scope="module")
+def leads():
+    collection = mongomock.MongoClient().db.leads
+    documents = []
+    for i in range(23):
+        document = {"_id": ObjectId(), "created_at": START + timedelta(minutes=i), "updated_at": START}
+        # unscored leads, ties and a lead missing the field entirely
+        if i % 4:
+            document["score"] = float(i % 5 * 10)
+        elif i % 8:
+            document["score"] = None
+        documents.append(document)
+    collection.insert_many(documents)
+    return collection
+
+
+def paginate(collection, sort_spec, limit):
+    pages, cursor = [], None
+    while True:
+        query = apply_keyset({}, sort_spec, cursor)
+        page = list(collection.find(query).sort(sort_spec).limit(limit + 1))
+        cursor = next_cursor(page, limit, sort_spec)
+        pages.extend(document["_id"] for document in page)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("sort_spec", [*LEAD_SORTS.values(), TOP_SORT], ids=str)
+@pytest.mark.parametrize("limit", [1, 3, 7])
+def test_pages_cover_every_lead_once(leads, sort_spec, limit):
+    expected = [document["_id"] for document in leads.find().sort(sort_spec)]
+    assert paginate(leads, sort_spec, limit) == expected
+
+
+def test_null_cursor_values_round_trip(leads):
+    last_unscored = list(leads.find({"score": None}).sort(TOP_SORT))[-1]
+    cursor = encode_cursor(last_unscored, TOP_SORT)
+    after = list(leads.find(apply_keyset({}, TOP_SORT, cursor)).sort(TOP_SORT))
+    # nulls sort last in descending order, so only unscored leads with a lower _id follow
+    assert all(document.get("score") is None and document["_id"] < last_unscored["_id"] for document in after)
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_next_cursor_without_a_page(limit):
+    documents = [{"_id": ObjectId()} for _ in range(2)]
+    assert next_cursor(documents, limit, ID_SORT) is None
+    assert documents == []
+
+
+@pytest.mark.parametrize("path", ["/api/v1/leads/", "/api/v1/users/"])
+@pytest.mark.parametrize("limit", [0, -1, 100000])
+def test_routes_reject_page_sizes_out_of_bounds(api, path, limit):
+    assert api.get(path, params={"limit": limit}).status_code == 422
@@ -0,0 +1,147 @@
+"""RescoreQueue coalescing, retries and draining with a stub rescore, and the leases of the MongoDB backend"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from src.leads.rescoring import MemoryRescoreBackend, MongoRescoreBackend, RescoreQueue
+
+NOW = datetime(2024, 12, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class StubRescore:
+    """Records every batch, failing the first `failures` calls and asking to retry the ids in `moved` once"""
+    def __init__(self, failures: int = 0, moved=()):
+        self.batches = []
+        self.failures = failures
+        self.moved = set(moved)
+
+    async def __call__(self, lead_ids):
+        self.batches.append(sorted(lead_ids))
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("rescore failed")
+        retry, self.moved = [lead_id for lead_id in lead_ids if lead_id in self.moved], set()
+        return retry
+
+
+def queue_with(rescore, debounce: float = 60.0) -> RescoreQueue:
+    queue = RescoreQueue(debounce=debounce, batch_size=10, poll_interval=0.01)
+    # set up as start() would, without the worker task, so each test drives run_once itself
+    queue.backend = MemoryRescoreBackend()
+    queue._rescore = rescore
+    return queue
+
+
+def test_duplicate_enqueues_rescore_once():
+    async def main():
+        rescore = StubRescore()
+        queue = queue_with(rescore)
+        await queue.enqueue(["a", "b", "a"])
+        await queue.enqueue(["a"])
+        assert await queue.run_once(due_only=False) == 2
+        assert await queue.run_once(due_only=False) == 0
+        return rescore.batches
+    assert asyncio.run(main()) == [["a", "b"]]
+
+
+def test_leads_wait_out_the_debounce_window():
+    async def main():
+        rescore = StubRescore()
+        queue = queue_with(rescore, debounce=0.05)
+        await queue.enqueue(["a"])
+        before = await queue.run_once()
+        await asyncio.sleep(0.06)
+        return before, await queue.run_once(), rescore.batches
+    assert asyncio.run(main()) == (0, 1, [["a"]])
+
+
+def test_later_writes_join_the_first_window():
+    async def main():
+        backend = MemoryRescoreBackend()
+        queue = queue_with(StubRescore())
+        queue.backend = backend
+        await queue.enqueue(["a"])
+        first_due = await backend.next_due()
+        await asyncio.sleep(0.01)
+        await queue.enqueue(["a"])
+        return first_due, await backend.next_due()
+    first_due, next_due = asyncio.run(main())
+    assert next_due == first_due
+
+
+def test_failed_batch_is_queued_again():
+    async def main():
+        rescore = StubRescore(failures=1)
+        queue = queue_with(rescore)
+        await queue.enqueue(["a", "b"])
+        with pytest.raises(RuntimeError):
+            await queue.run_once(due_only=False)
+        # handed back as due now, so the retry does not wait out another window
+        assert await queue.run_once() == 2
+        return rescore.batches
+    assert asyncio.run(main()) == [["a", "b"], ["a", "b"]]
+
+
+def test_moved_leads_are_retried():
+    async def main():
+        rescore = StubRescore(moved=["b"])
+        queue = queue_with(rescore, debounce=0)
+        await queue.enqueue(["a", "b"])
+        assert await queue.run_once() == 2
+        assert await queue.run_once() == 1
+        return rescore.batches
+    assert asyncio.run(main()) == [["a", "b"], ["b"]]
+
+
+def test_stop_drains_pending_leads():
+    async def main():
+        rescore = StubRescore()
+        queue = RescoreQueue(debounce=60.0, batch_size=1, poll_interval=0.01)
+        queue.start(MemoryRescoreBackend(), rescore)
+        await queue.enqueue(["a", "b"])
+        await asyncio.sleep(0.01)
+        # nothing is due yet, only stopping rescores them
+        assert rescore.batches == []
+        await queue.stop()
+        return queue.running, rescore.batches, await queue.backend.next_due()
+    assert asyncio.run(main()) == (False, [["a"], ["b"]], None)
+
+
+def test_worker_rescores_due_leads():
+    async def main():
+        rescore = StubRescore()
+        queue = RescoreQueue(debounce=0.01, batch_size=10, poll_interval=0.01)
+        queue.start(MemoryRescoreBackend(), rescore)
+        await queue.enqueue(["a", "b"])
+        await asyncio.sleep(0.1)
+        await queue.stop()
+        return rescore.batches
+    assert asyncio.run(main()) == [["a", "b"]]
+
+
+def mongo_backend(lease_seconds: float = 60.0) -> MongoRescoreBackend:
+    return MongoRescoreBackend(AsyncMongoMockClient()["saltra_test"].get_collection("rescore_queue"), lease_seconds)
+
+
+def test_claims_are_leased_to_one_worker():
+    async def main():
+        backend = mongo_backend()
+        await backend.add(["a", "b"], NOW)
+        first = await backend.claim(NOW, 10)
+        second = await backend.claim(NOW, 10)
+        # once the lease runs out another worker can claim the entries
+        expired = await backend.claim(NOW + timedelta(seconds=61), 10)
+        return [lead_id for lead_id, _ in first], second, [lead_id for lead_id, _ in expired]
+    assert asyncio.run(main()) == (["a", "b"], [], ["a", "b"])
+
+
+def test_entries_written_while_claimed_stay_queued():
+    async def main():
+        backend = mongo_backend()
+        await backend.add(["a", "b"], NOW)
+        claims = await backend.claim(NOW, 10)
+        await backend.add(["b"], NOW)
+        await backend.complete(claims, NOW + timedelta(seconds=5))
+        remaining = await backend.collection.find({}, {"due_at": 1, "claimed_by": 1}).to_list(length=None)
+        return [(entry["_id"], entry["due_at"], "claimed_by" in entry) for entry in remaining]
+    assert asyncio.run(main()) == [("b", (NOW + timedelta(seconds=5)).replace(tzinfo=None), False)]
@@ -0,0 +1,108 @@
+"""
+Parity of the three scoring paths on fixed leads: calculate_score, calculate_scores_batch and the
+score_expression / scoring_stages pipeline, evaluated by mongomock
+"""
+from datetime import datetime, timedelta, timezone
+import mongomock
+import pytest
+from src.leads.rules import current_rules
+from src.leads.scorer import LeadScorer
+
+# Whole milliseconds, MongoDB dates keep no finer precision
+NOW = datetime(2024, 12, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def days_ago(days: float) -> datetime:
+    return NOW - timedelta(days=days)
+
+
+LEADS = {
+    "empty": {},
+    "no_interactions_bucketed": {"status": "new", "source": "website", "interaction_count": 0, "last_interaction_at": None},
+    "no_interactions_legacy": {"status": "contacted", "source": "linkedin", "interactions": []},
+    "missing_company_size": {"status": "qualified", "source": "referral", "job_title": "CTO"},
+    "null_company_size": {"status": "qualified", "company_size": None, "job_title": "Engineer"},
+    "zero_company_size": {"status": "qualified", "company_size": 0},
+    "company_size_at_first_band": {"company_size": 50},
+    "company_size_past_first_band": {"company_size": 51},
+    "company_size_at_last_band": {"company_size": 500},
+    "company_size_past_last_band": {"company_size": 501},
+    "one_interaction": {"interaction_count": 1, "last_interaction_at": days_ago(1)},
+    "interactions_at_band": {"interaction_count": 3, "last_interaction_at": days_ago(2)},
+    "interactions_past_last_band": {"interaction_count": 6, "last_interaction_at": days_ago(3)},
+    "recency_at_week": {"interaction_count": 2, "last_interaction_at": days_ago(7)},
+    "recency_past_week": {"interaction_count": 2, "last_interaction_at": days_ago(8)},
+    "recency_at_month": {"interaction_count": 2, "last_interaction_at": days_ago(30)},
+    "recency_past_month": {"interaction_count": 2, "last_interaction_at": days_ago(31)},
+    "recency_at_quarter": {"interaction_count": 2, "last_interaction_at": days_ago(90)},
+    "recency_past_quarter": {"interaction_count": 2, "last_interaction_at": days_ago(91)},
+    "recency_just_under_a_day": {"interaction_count": 2, "last_interaction_at": days_ago(7.99)},
+    "legacy_interactions": {
+        "status": "negotiation",
+        "interactions": [{"date": days_ago(40), "type": "call"}, {"date": days_ago(5), "type": "email"}],
+    },
+    "mixed_case_status_and_source": {"status": "Closed_Won", "source": "Conference"},
+    "unknown_status_and_source": {"status": "close_lost", "source": "Other"},
+    "title_keyword_in_phrase": {"job_title": "Chief Revenue Officer"},
+    "title_without_keyword": {"job_title": "Account Manager"},
+    "empty_title": {"job_title": ""},
+    "top_score": {
+        "status": "closed_won",
+        "company_size": 10_000,
+        "interaction_count": 20,
+        "last_interaction_at": days_ago(0),
+        "job_title": "Founder",
+        "source": "referral",
+    },
+}
+
+
+def server_scores(leads):
+    """Scores and categories computed by the scoring pipeline stages, keyed by lead name"""
+    collection = mongomock.MongoClient().db.leads
+    collection.insert_many([{"_id": name, **lead} for name, lead in leads.items()])
+    # mongomock hands dates back naive, as pymongo does without tz_aware, so `now` is naive UTC too
+    stages = LeadScorer.scoring_stages(now=NOW.replace(tzinfo=None), rules=current_rules())
+    return {lead["_id"]: (lead["score"], lead["category"]) for lead in collection.aggregate(stages)}
+
+
+def batch_scores(leads):
+    rules = current_rules()
+    scores, categories = LeadScorer.calculate_scores_batch(**LeadScorer.to_columns(list(leads.values()), rules), now=NOW, rules=rules)
+    return dict(zip(leads, zip(scores.tolist(), categories.tolist())))
+
+
+@pytest.fixture(scope="module")
+def scored():
+    return server_scores(LEADS), batch_scores(LEADS)
+
+
+@pytest.mark.parametrize("name", list(LEADS))
+def test_scoring_paths_agree(name, scored):
+    server, batch = scored
+    score = LeadScorer.calculate_score(LEADS[name], now=NOW)
+    category = LeadScorer.categorize_lead(score)
+    assert batch[name] == pytest.approx((score, category))
+    assert server[name] == pytest.approx((score, category))
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("empty", 6),
+    ("company_size_at_first_band", 11),
+    ("company_size_past_first_band", 21),
+    ("company_size_past_last_band", 31),
+    ("recency_at_week", 26),
+    ("recency_past_week", 24),
+    ("recency_past_quarter", 21),
+    ("top_score", 100),
+])
+def test_band_boundaries(name, expected):
+    assert LeadScorer.calculate_score(LEADS[name], now=NOW) == expected
+
+
+@pytest.mark.parametrize("score", [0, 19.5, 20, 49.99, 50, 79, 80, 100])
+def test_category_boundaries(score):
+    collection = mongomock.MongoClient().db.scores
+    collection.insert_one({"score": score})
+    (document,) = collection.aggregate([{"$set": {"category": LeadScorer.category_expression("$score")}}])
+    assert document["category"] == LeadScorer.categorize_lead(score)
@@ -0,0 +1,37 @@
+"""Lead list text filters built by build_leads_query, run against an in-memory collection"""
+import mongomock
+import pytest
+from src.leads.search import build_search_keys
+from src.leads.service import LeadService
+
+LEADS = [
+    {"first_name": "Jane", "last_name": "Doe", "company": "Tech Corp", "job_title": "CTO"},
+    {"first_name": "John", "last_name": "Smith", "company": "Acme", "job_title": "Sales Manager"},
+]
+
+
+@pytest.fixture(scope="module")
+def leads():
+    collection = mongomock.MongoClient().db.leads
+    collection.insert_many([{**lead, "search_keys": build_search_keys(lead)} for lead in LEADS])
+    return collection
+
+
+def matched(collection, **filters):
+    return sorted(lead["first_name"] for lead in collection.find(LeadService.build_leads_query(**filters)))
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({}, ["Jane", "John"]),
+    ({"company": "tech"}, ["Jane"]),
+    ({"first_name": "j"}, ["Jane", "John"]),
+    ({"q": "sales jo"}, ["John"]),
+    ({"q": "doe acme"}, []),
+])
+def test_text_filters(leads, filters, expected):
+    assert matched(leads, **filters) == expected
+
+
+@pytest.mark.parametrize("filters", [{"company": "--"}, {"job_title": "  "}, {"q": "!?"}, {"first_name": "jane", "q": "-"}])
+def test_values_without_terms_match_nothing(leads, filters):
+    assert matched(leads, **filters) == []
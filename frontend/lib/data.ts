@@ -1,6 +1,6 @@
 import { useToast } from "@/hooks/use-toast";
 import { unstable_noStore as noStore } from "next/cache";
-import { LeadListSchema } from "./definitions";
+import { LeadTableSchema } from "./definitions";
 
 const BASE_URL =
   process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api/v1";
@@ -50,7 +50,7 @@ export async function getDashboardStats() {
 // get all leads
 export async function getAllLeads() {
   noStore();
-  const { leads } = await fetchData<LeadListSchema>("/leads");
+  const { leads } = await fetchData<LeadTableSchema>("/leads?view=table");
   return leads;
 }
 
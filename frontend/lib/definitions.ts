@@ -80,6 +80,26 @@ export interface LeadListSchema {
   leads: LeadModel[];
 }
 
+// columns returned by GET /leads?view=table
+export type LeadTableRow = Pick<
+  LeadModel,
+  | "id"
+  | "first_name"
+  | "last_name"
+  | "company"
+  | "email"
+  | "status"
+  | "source"
+  | "score"
+  | "category"
+  | "updated_at"
+>;
+
+export interface LeadTableSchema {
+  leads: LeadTableRow[];
+  next_cursor?: string | null;
+}
+
 export const LeadValidation = {
   firstName: {
     minLength: 2,